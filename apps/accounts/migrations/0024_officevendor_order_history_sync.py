@@ -0,0 +1,23 @@
+# Generated by Django 4.2.1 on 2026-10-17 21:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0023_officevendor_account_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="officevendor",
+            name="order_history_reconciled_on",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="officevendor",
+            name="order_history_synced_on",
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
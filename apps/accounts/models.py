@@ -229,6 +229,10 @@ class OfficeVendor(TimeStampedModel):
     default_shipping_option = models.ForeignKey(
         ShippingMethod, related_name="ov_default_shipping_option", on_delete=models.SET_NULL, null=True, blank=True
     )
+    # order history is synced up to this date, later syncs only request the orders after it
+    order_history_synced_on = models.DateField(null=True, blank=True)
+    # last sync that requested the full order history from the vendor
+    order_history_reconciled_on = models.DateField(null=True, blank=True)
 
     class Meta:
         ordering = ("vendor__name",)
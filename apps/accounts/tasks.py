@@ -32,6 +32,10 @@ from apps.orders.helpers import (
 from apps.orders.models import OfficeProductCategory, OrderStatus, VendorOrder
 from apps.orders.product_updater import update_vendor_products_by_api
 from apps.orders.products_updater.net32_updater import update_net32_products
+from apps.orders.services.order_history import (
+    get_order_history_window,
+    mark_order_history_synced,
+)
 from apps.orders.updater import fetch_for_vendor
 from apps.scrapers.errors import ScraperException
 from apps.types.accounts import CompanyInvite
@@ -181,17 +185,21 @@ def fetch_order_history(self, vendor_slug, office_id, consider_recent=False):
         self.update_state(state=states.FAILURE, meta="Cancelled due to failed authentication earlier")
         return
 
-    order_id_field = "vendor_order_reference" if vendor_slug == "henry_schein" else "vendor_order_id"
-    completed_order_ids = list(
-        VendorOrder.objects.filter(
-            vendor=office_vendor.vendor, order__office=office_vendor.office, status=OrderStatus.CLOSED
-        ).values_list(order_id_field, flat=True)
-    )
-    asyncio.run(
+    # recent syncs only request the orders after the sync watermark of the office vendor
+    window = get_order_history_window(office_vendor, full_reconcile=not consider_recent)
+    failed_order_count = asyncio.run(
         OrderHelper.fetch_orders_and_update(
-            office_vendor=office_vendor, completed_order_ids=completed_order_ids, consider_recent=consider_recent
+            office_vendor=office_vendor,
+            completed_order_ids=window.completed_order_ids,
+            from_date=window.from_date,
+            to_date=window.to_date,
         )
     )
+    if failed_order_count:
+        # the failed orders are requested again by the next sync
+        logger.warning("%s orders of office vendor %s failed to sync", failed_order_count, office_vendor.id)
+    else:
+        mark_order_history_synced(office_vendor, window)
 
 
 @app.task
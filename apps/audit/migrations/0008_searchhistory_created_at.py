@@ -0,0 +1,19 @@
+# Generated by Django 4.2.1 on 2026-10-17 21:57
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audit", "0007_ordertasks"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="searchhistory",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,6 +1,7 @@
 import uuid
 
 from django.db import models
+from django.utils import timezone
 
 from apps.accounts.models import User
 
@@ -19,7 +20,8 @@ class RollbackInformation(models.Model):
 
 
 class SearchHistory(models.Model):
-    created_at = models.DateTimeField(auto_now_add=True)
+    # set from the buffered search, the rows are written later in batches
+    created_at = models.DateTimeField(default=timezone.now)
     query = models.CharField(max_length=1024)
     user = models.ForeignKey(User, on_delete=models.PROTECT)
 
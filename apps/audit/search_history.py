@@ -0,0 +1,77 @@
+import json
+import logging
+from typing import Optional
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.audit.models import SearchHistory
+from apps.common.utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+SEARCH_HISTORY_BUFFER_KEY = "search_history:buffer"
+SEARCH_HISTORY_LOCK_KEY = "search_history:flush_lock"
+SEARCH_HISTORY_LOCK_TIMEOUT = 5 * 60
+FLUSH_BATCH_SIZE = 1000
+
+
+def record_search(user_id: int, query: str, redis_url: Optional[str] = None):
+    """
+    Queue a search for SearchHistory, the rows are written in batches by the flush_search_history task.
+    Without Redis the row is written right away.
+    """
+    redis_url = redis_url or settings.REDIS_URL
+    if redis_url:
+        search = {"user": user_id, "query": query, "created_at": timezone.now().isoformat()}
+        try:
+            get_redis_client(redis_url).rpush(SEARCH_HISTORY_BUFFER_KEY, json.dumps(search))
+            return
+        except redis.RedisError:
+            logger.exception("Could not queue search history")
+    SearchHistory.objects.create(user_id=user_id, query=query)
+
+
+def to_search_history(search: dict) -> SearchHistory:
+    created_at = search.get("created_at")
+    return SearchHistory(
+        user_id=search["user"],
+        query=search["query"][:1024],
+        created_at=parse_datetime(created_at) if created_at else timezone.now(),
+    )
+
+
+def flush_search_history(batch_size: int = FLUSH_BATCH_SIZE, redis_url: Optional[str] = None) -> int:
+    """
+    Write the queued searches to SearchHistory, return the number of written rows.
+    A batch is only removed from the buffer once it is saved, so a failed write is retried by the next flush.
+    """
+    redis_url = redis_url or settings.REDIS_URL
+    if not redis_url:
+        return 0
+
+    client = get_redis_client(redis_url)
+    # only one flush at a time, it removes the batches it has read from the head of the buffer
+    lock = client.lock(SEARCH_HISTORY_LOCK_KEY, timeout=SEARCH_HISTORY_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        logger.info("Search history is already being flushed")
+        return 0
+
+    written = 0
+    try:
+        while True:
+            items = client.lrange(SEARCH_HISTORY_BUFFER_KEY, 0, batch_size - 1)
+            if not items:
+                break
+
+            SearchHistory.objects.bulk_create([to_search_history(json.loads(item)) for item in items])
+            # new searches are pushed to the tail, the head still holds the saved batch
+            client.ltrim(SEARCH_HISTORY_BUFFER_KEY, len(items), -1)
+            written += len(items)
+            if len(items) < batch_size:
+                break
+    finally:
+        lock.release()
+    return written
@@ -0,0 +1,13 @@
+import logging
+
+from apps.audit import search_history
+from config.celery import app
+
+logger = logging.getLogger(__name__)
+
+
+@app.task
+def flush_search_history():
+    written = search_history.flush_search_history()
+    if written:
+        logger.info("Saved %s searches", written)
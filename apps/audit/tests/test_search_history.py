@@ -0,0 +1,49 @@
+import datetime
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.accounts.tests.factories import UserFactory
+from apps.audit.models import SearchHistory
+from apps.audit.search_history import (
+    SEARCH_HISTORY_BUFFER_KEY,
+    flush_search_history,
+    record_search,
+)
+from apps.common.testing import is_redis_available
+from apps.common.utils import get_redis_client
+
+
+@skipUnless(is_redis_available(), "Redis is not available")
+class FlushSearchHistoryTests(TestCase):
+    def setUp(self) -> None:
+        self.redis = get_redis_client(settings.REDIS_URL)
+        self.redis.delete(SEARCH_HISTORY_BUFFER_KEY)
+        self.user = UserFactory()
+
+    def tearDown(self) -> None:
+        self.redis.delete(SEARCH_HISTORY_BUFFER_KEY)
+
+    def test_rows_keep_the_search_time(self):
+        searched_at = timezone.now() - datetime.timedelta(hours=1)
+        with mock.patch("apps.audit.search_history.timezone.now", return_value=searched_at):
+            record_search(self.user.pk, "gloves")
+
+        assert flush_search_history() == 1
+        assert SearchHistory.objects.get(query="gloves").created_at == searched_at
+
+    def test_failed_write_keeps_the_buffer(self):
+        record_search(self.user.pk, "gloves")
+        record_search(self.user.pk, "masks")
+
+        with mock.patch.object(SearchHistory.objects, "bulk_create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                flush_search_history(batch_size=1)
+        assert self.redis.llen(SEARCH_HISTORY_BUFFER_KEY) == 2
+
+        assert flush_search_history(batch_size=1) == 2
+        assert list(SearchHistory.objects.order_by("id").values_list("query", flat=True)) == ["gloves", "masks"]
+        assert self.redis.llen(SEARCH_HISTORY_BUFFER_KEY) == 0
@@ -1,7 +1,24 @@
+import base64
+import json
+from typing import Any, List
+
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
 
+def encode_cursor(position: List[Any]) -> str:
+    """Opaque cursor for keyset pagination, position is the list of the ordering values of the last row"""
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Raise ValueError when the cursor was not made by encode_cursor"""
+    position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(position, list):
+        raise ValueError("Invalid cursor")
+    return position
+
+
 class SearchProductV2Pagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = "per_page"
@@ -0,0 +1,115 @@
+import hashlib
+import hmac
+import logging
+from http.cookies import SimpleCookie
+from typing import Dict, Optional
+
+from aiohttp import ClientSession
+from django.conf import settings
+from django.core.cache import cache
+from yarl import URL
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_TTL = 20 * 60
+
+
+def get_cookie_domain(url: str) -> str:
+    """The domain of the vendor cookies, e.g. henryschein.com for https://www.henryschein.com/login"""
+    host = URL(url).host or ""
+    return ".".join(host.split(".")[-2:])
+
+
+def is_domain_cookie(morsel, domain: str) -> bool:
+    cookie_domain = morsel["domain"].lstrip(".")
+    return cookie_domain == domain or cookie_domain.endswith(f".{domain}")
+
+
+class SessionCache:
+    """
+    Authenticated vendor sessions (cookies and session headers) shared across tasks and workers.
+
+    Entries are keyed by vendor and username. A digest of the password is part of the key too,
+    so a cached session is never used to "validate" a different password.
+    The client session can be shared by several vendors, so an entry only holds the cookies of the vendor
+    domain and the headers added by the vendor login.
+    """
+
+    key_prefix = "vendor_session"
+
+    def __init__(self, vendor_slug: str, username: str, password: Optional[str], ttl: int = DEFAULT_SESSION_TTL):
+        self.vendor_slug = vendor_slug
+        self.username = username
+        self.ttl = ttl
+        credentials_digest = hmac.new(
+            settings.SECRET_KEY.encode(), f"{username}:{password or ''}".encode(), hashlib.sha256
+        ).hexdigest()
+        self.key = f"{self.key_prefix}:{vendor_slug}:{credentials_digest}"
+        self.domain: Optional[str] = None
+        self.headers: Dict[str, str] = {}
+
+    @staticmethod
+    def dump_session(session: ClientSession, domain: str, headers: Dict[str, str]) -> dict:
+        cookies = [
+            {
+                "name": morsel.key,
+                "value": morsel.value,
+                "domain": morsel["domain"],
+                "path": morsel["path"],
+                "secure": bool(morsel["secure"]),
+            }
+            for morsel in session.cookie_jar
+            if is_domain_cookie(morsel, domain)
+        ]
+        return {"domain": domain, "cookies": cookies, "headers": headers}
+
+    @staticmethod
+    def load_session(session: ClientSession, data: dict):
+        for cookie in data["cookies"]:
+            simple_cookie = SimpleCookie()
+            simple_cookie[cookie["name"]] = cookie["value"]
+            morsel = simple_cookie[cookie["name"]]
+            morsel["domain"] = cookie["domain"]
+            morsel["path"] = cookie["path"] or "/"
+            if cookie["secure"]:
+                morsel["secure"] = True
+            domain = cookie["domain"].lstrip(".")
+            session.cookie_jar.update_cookies(simple_cookie, response_url=URL(f"https://{domain}/"))
+        session.headers.update(data["headers"])
+
+    async def restore(self, session: ClientSession) -> bool:
+        """Load the cached session into the given one, return False when there is nothing cached"""
+        try:
+            data = await cache.aget(self.key)
+        except Exception:
+            logger.exception("Could not read cached session for %s", self.vendor_slug)
+            return False
+        if not data:
+            return False
+        self.load_session(session, data)
+        self.domain, self.headers = data["domain"], data["headers"]
+        logger.debug("Restored %s session for %s", self.vendor_slug, self.username)
+        return True
+
+    async def save(self, session: ClientSession, login_url: str, session_headers: Dict[str, str]):
+        """
+        Cache the cookies of the domain of login_url and the headers that are not in session_headers,
+        the headers of the session before the login.
+        """
+        self.domain = get_cookie_domain(login_url)
+        self.headers = {name: value for name, value in session.headers.items() if session_headers.get(name) != value}
+        try:
+            await cache.aset(self.key, self.dump_session(session, self.domain, self.headers), timeout=self.ttl)
+        except Exception:
+            logger.exception("Could not cache session for %s", self.vendor_slug)
+
+    async def invalidate(self, session: Optional[ClientSession] = None):
+        """Drop the cached entry and remove the restored vendor cookies and headers from the session"""
+        if session is not None and self.domain:
+            session.cookie_jar.clear(lambda morsel: is_domain_cookie(morsel, self.domain))
+            for name in self.headers:
+                session.headers.pop(name, None)
+        try:
+            await cache.adelete(self.key)
+        except Exception:
+            logger.exception("Could not invalidate cached session for %s", self.vendor_slug)
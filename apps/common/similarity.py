@@ -0,0 +1,105 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import FrozenSet, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+EXCLUDED_WORDS = frozenset({"of", "and", "with"})
+NUMERIC_VALUE_PATTERN = re.compile(r"\w*[\d]+\w*")
+WORD_PATTERN = re.compile(r"\w+")
+TOKENS_CACHE_SIZE = 2**17
+# Below this number of rows a process pool costs more than it saves
+MIN_ROWS_PER_PROCESS = 256
+
+
+class ProductTokens(NamedTuple):
+    words: FrozenSet[str]
+    numeric_values: FrozenSet[str]
+
+    @property
+    def all(self) -> FrozenSet[str]:
+        return self.words | self.numeric_values
+
+
+@lru_cache(maxsize=TOKENS_CACHE_SIZE)
+def tokenize_name(name: str) -> ProductTokens:
+    """Split a product name into the word and numeric token sets used for similarity scoring"""
+    numeric_values = frozenset(value.lower() for value in NUMERIC_VALUE_PATTERN.findall(name))
+    words = frozenset(word.lower() for word in WORD_PATTERN.findall(name)) - numeric_values - EXCLUDED_WORDS
+    return ProductTokens(words=words, numeric_values=numeric_values)
+
+
+def similarity_from_sets(
+    matched_words: FrozenSet[str],
+    total_words: FrozenSet[str],
+    matched_numeric_values: FrozenSet[str],
+    total_numeric_values: FrozenSet[str],
+) -> float:
+    words_ratio = len(matched_words) / len(total_words) if total_words else 0
+    if total_numeric_values:
+        return 0.4 * words_ratio + 0.6 * len(matched_numeric_values) / len(total_numeric_values)
+    return words_ratio
+
+
+def get_tokens_similarity(*tokens_list: ProductTokens) -> float:
+    matched_words = frozenset.intersection(*(tokens.words for tokens in tokens_list))
+    total_words = frozenset.union(*(tokens.words for tokens in tokens_list))
+    matched_numeric_values = frozenset.intersection(*(tokens.numeric_values for tokens in tokens_list))
+    total_numeric_values = frozenset.union(*(tokens.numeric_values for tokens in tokens_list))
+    return similarity_from_sets(matched_words, total_words, matched_numeric_values, total_numeric_values)
+
+
+def get_names_similarity(*names: str) -> float:
+    """Similarity of product names, the names are tokenized once and cached"""
+    return get_tokens_similarity(*(tokenize_name(name or "") for name in names))
+
+
+def _to_matrix(token_sets: List[FrozenSet[str]], vocabulary: dict) -> np.ndarray:
+    matrix = np.zeros((len(token_sets), len(vocabulary)), dtype=np.float64)
+    for row, tokens in enumerate(token_sets):
+        matrix[row, [vocabulary[token] for token in tokens]] = 1
+    return matrix
+
+
+def _ratio_matrix(token_sets: List[FrozenSet[str]], other_token_sets: List[FrozenSet[str]]):
+    """Return |a & b| / |a | b| for every pair and whether the union is empty"""
+    vocabulary = {}
+    for tokens in (*token_sets, *other_token_sets):
+        for token in tokens:
+            vocabulary.setdefault(token, len(vocabulary))
+    matrix, other_matrix = _to_matrix(token_sets, vocabulary), _to_matrix(other_token_sets, vocabulary)
+    intersections = matrix @ other_matrix.T
+    unions = matrix.sum(axis=1)[:, None] + other_matrix.sum(axis=1)[None, :] - intersections
+    ratios = np.divide(intersections, unions, out=np.zeros_like(intersections), where=unions > 0)
+    return ratios, unions > 0
+
+
+def _get_similarity_matrix(names: Sequence[str], other_names: Sequence[str]) -> np.ndarray:
+    tokens = [tokenize_name(name or "") for name in names]
+    other_tokens = [tokenize_name(name or "") for name in other_names]
+    words_ratios, _ = _ratio_matrix([t.words for t in tokens], [t.words for t in other_tokens])
+    numeric_ratios, has_numeric_values = _ratio_matrix(
+        [t.numeric_values for t in tokens], [t.numeric_values for t in other_tokens]
+    )
+    return np.where(has_numeric_values, 0.4 * words_ratios + 0.6 * numeric_ratios, words_ratios)
+
+
+def get_similarity_matrix(
+    names: Sequence[str], other_names: Sequence[str], processes: Optional[int] = None
+) -> np.ndarray:
+    """
+    Score every name against every other name at once.
+    Token sets are turned into 0/1 matrices over the vocabulary so that intersections of all the pairs
+    are a single matrix product. With processes, rows are split across a process pool.
+    """
+    if not names or not other_names:
+        return np.zeros((len(names), len(other_names)), dtype=np.float64)
+    if not processes or processes < 2 or len(names) < 2 * MIN_ROWS_PER_PROCESS:
+        return _get_similarity_matrix(names, other_names)
+
+    chunk_size = max(MIN_ROWS_PER_PROCESS, -(-len(names) // processes))
+    chunks = [names[i : i + chunk_size] for i in range(0, len(names), chunk_size)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = executor.map(_get_similarity_matrix, chunks, [other_names] * len(chunks))
+        return np.vstack(list(results))
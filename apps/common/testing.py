@@ -0,0 +1,12 @@
+import redis
+from django.conf import settings
+
+
+def is_redis_available() -> bool:
+    """Tests that need a real Redis server are skipped when REDIS_URL is not set or not reachable"""
+    if not settings.REDIS_URL:
+        return False
+    try:
+        return redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1).ping()
+    except redis.RedisError:
+        return False
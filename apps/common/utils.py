@@ -1,16 +1,23 @@
 import datetime
 import itertools
+import json
 import os
 import re
 import uuid
 from decimal import Decimal
+from functools import lru_cache
 from typing import Any, List, Optional, Tuple, Type, Union
 
+import numpy as np
 import pandas as pd
+import redis
 from dateutil.relativedelta import relativedelta
-from django.db.models import Model
+from django.db import connection
+from django.db.models import Model, QuerySet
 from django.utils import timezone
 
+from apps.common.similarity import get_names_similarity, get_similarity_matrix
+
 CUSTOM_DATE_FILTER = (
     ("thisMonth", "this month"),
     ("lastMonth", "last month"),
@@ -25,34 +32,15 @@ def generate_token():
     return uuid.uuid4().hex + uuid.uuid4().hex
 
 
-def get_similarity(*products, key=None):
-    total_words = set()
-    matched_words = set()
-    total_numeric_values = set()
-    matched_numeric_values = set()
-
-    for product_i, product in enumerate(products):
-        product_name = product if isinstance(product, str) else getattr(product, key)
-        product_numeric_values = set(map(str.lower, re.findall(r"\w*[\d]+\w*", product_name)))
-        product_words = set(map(str.lower, re.findall(r"\w+", product_name)))
-        product_words = product_words - product_numeric_values
-        product_words -= {"of", "and", "with"}
-        total_words.update(product_words)
-        total_numeric_values.update(product_numeric_values)
-        if product_i == 0:
-            matched_words = product_words
-            matched_numeric_values = product_numeric_values
-        else:
-            matched_words &= product_words
-            matched_numeric_values &= product_numeric_values
+@lru_cache(maxsize=None)
+def get_redis_client(redis_url: str) -> redis.Redis:
+    return redis.Redis.from_url(redis_url)
 
-    if len(total_numeric_values):
-        percentage = 0.4 * len(matched_words) / len(total_words) + 0.6 * len(matched_numeric_values) / len(
-            total_numeric_values
-        )
-    else:
-        percentage = len(matched_words) / len(total_words)
-    return percentage
+
+def get_similarity(*products, key=None):
+    return get_names_similarity(
+        *(product if isinstance(product, str) else getattr(product, key) for product in products)
+    )
 
 
 def group_products(vendors_search_result_products, model=False):
@@ -67,6 +55,18 @@ def group_products(vendors_search_result_products, model=False):
     while n_similarity <= search_result_vendors_count:
         vendors_products_combinations = itertools.combinations(vendors_search_result_products, n_similarity)
         for vendors_products_combination in vendors_products_combinations:
+            if n_similarity == 2:
+                # score all the pairs of the 2 vendors at once
+                first_products, second_products = map(list, vendors_products_combination)
+                similarities = get_similarity_matrix(
+                    [product.name for product in first_products], [product.name for product in second_products]
+                )
+                for i, j in zip(*np.nonzero(similarities > threshold)):
+                    vendor_products = (first_products[i], second_products[j])
+                    similar_candidate_products.append((f"{similarities[i, j]:.2f}", *vendor_products))
+                    well_matching_pairs.add(vendor_products)
+                continue
+
             for vendor_products in itertools.product(*vendors_products_combination):
                 # when finding more than 3-length similar products we need to check that
                 # sub-set of products belongs to well matching pairs. If well matching set contains subset of products
@@ -272,6 +272,72 @@ def bulk_update(model_class: Type[Model], objs: List[Model], fields: List[str],
         model_class.objects.bulk_update(batch, fields, batch_size)
 
 
+UPDATE_FROM_VALUES_SQL = """
+UPDATE {table} AS t
+SET {assignments}
+FROM (VALUES {values}) AS v({columns})
+WHERE {conditions}
+"""
+
+
+def bulk_update_from_values(
+    model_class: Type[Model],
+    key_field: str,
+    fields: List[str],
+    rows: List[Tuple],
+    batch_size: int = 1000,
+    only_changed: bool = True,
+    where: str = "",
+) -> int:
+    """
+    Update many rows with different values in a single statement per batch:
+        UPDATE table AS t SET field = v.field, ... FROM (VALUES (...), ...) AS v(key, field, ...)
+        WHERE t.key = v.key
+    rows: tuples of (key value, *field values) in the same order as fields
+    only_changed: skip rows whose values are already the same
+    where: extra SQL condition on the updated table, aliased as "t"
+    Return the number of updated rows
+    """
+    opts = model_class._meta
+    columns = [opts.get_field(name) for name in (key_field, *fields)]
+    column_names = [connection.ops.quote_name(column.column) for column in columns]
+    placeholders = "({})".format(", ".join(f"%s::{column.db_type(connection)}" for column in columns))
+    key_column, *field_columns = column_names
+
+    conditions = [f"t.{key_column} = v.{key_column}"]
+    if only_changed:
+        conditions.append(
+            "({})".format(" OR ".join(f"t.{column} IS DISTINCT FROM v.{column}" for column in field_columns))
+        )
+    if where:
+        conditions.append(f"({where})")
+
+    updated = 0
+    with connection.cursor() as cursor:
+        for batch in batched(rows, batch_size):
+            sql = UPDATE_FROM_VALUES_SQL.format(
+                table=connection.ops.quote_name(opts.db_table),
+                assignments=", ".join(f"{column} = v.{column}" for column in field_columns),
+                values=", ".join([placeholders] * len(batch)),
+                columns=", ".join(column_names),
+                conditions=" AND ".join(conditions),
+            )
+            cursor.execute(sql, [value for row in batch for value in row])
+            updated += cursor.rowcount
+    return updated
+
+
+def estimate_count(queryset: QuerySet) -> int:
+    """Number of rows of the queryset as estimated by the query planner, without running COUNT(*)"""
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
 def find_numeric_values_from_string(s):
     return re.findall(r"\w*[\d]+\w*", s)
 
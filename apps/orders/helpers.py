@@ -1,7 +1,6 @@
 import asyncio as aio
 import csv
 import datetime
-import itertools
 import logging
 import traceback
 from collections import defaultdict
@@ -9,20 +8,23 @@ from decimal import Decimal
 from functools import reduce
 from itertools import chain
 from operator import or_
-from typing import Dict, List, Optional, TypedDict, Union
+from typing import Dict, Iterable, List, Optional, TypedDict, Union
 
 import pandas as pd
 from aiohttp import ClientSession, ClientTimeout
 from asgiref.sync import sync_to_async
 from dateutil import rrule
 from django.conf import settings
-from django.contrib.postgres.search import SearchQuery, SearchVectorField
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.search import SearchQuery
+from django.db import transaction
 from django.db.models import (
     BooleanField,
     Case,
     Count,
     Exists,
     F,
+    FilteredRelation,
     Model,
     OuterRef,
     Prefetch,
@@ -32,8 +34,8 @@ from django.db.models import (
     Value,
     When,
 )
-from django.db.models.expressions import ExpressionWrapper, Func, RawSQL
-from django.db.models.functions import Coalesce
+from django.db.models.expressions import ExpressionWrapper
+from django.db.models.functions import Coalesce, Length
 from django.utils import timezone
 from slugify import slugify
 
@@ -44,20 +46,21 @@ from apps.api_clients.factory import APIClientFactory
 from apps.common import messages as msgs
 from apps.common.choices import OrderStatus, OrderType, ProductStatus
 from apps.common.query import Replacer
+from apps.common.similarity import get_names_similarity
 from apps.common.utils import (
     batched,
     bulk_create,
     bulk_update,
+    bulk_update_from_values,
     concatenate_list_as_string,
     concatenate_strings,
     convert_string_to_price,
-    find_numeric_values_from_string,
-    find_words_from_string,
     get_file_name_and_ext,
     remove_dash_between_numerics,
     sort_and_write_to_csv,
 )
 from apps.orders.models import OfficeProduct as OfficeProductModel
+from apps.orders.models import OfficeProductCatalog as OfficeProductCatalogModel
 from apps.orders.models import OfficeProductCategory as OfficeProductCategoryModel
 from apps.orders.models import Order as OrderModel
 from apps.orders.models import Procedure as ProcedureModel
@@ -67,6 +70,9 @@ from apps.orders.models import ProductCategory as ProductCategoryModel
 from apps.orders.models import ProductImage as ProductImageModel
 from apps.orders.models import VendorOrder as VendorOrderModel
 from apps.orders.models import VendorOrderProduct as VendorOrderProductModel
+from apps.orders.services.grouping import group_products_by_name
+from apps.orders.services.pricing import resolve_prices, to_product_prices
+from apps.orders.services.search_cache import bump_catalog_version
 from apps.scrapers.errors import VendorAuthenticationFailed as VendorAuthFailed
 from apps.scrapers.scraper_factory import ScraperFactory
 from apps.types.orders import CartProduct
@@ -81,6 +87,8 @@ SmartID = Union[int, str]
 ProductID = SmartID
 ProductIDs = List[ProductID]
 CSV_DELIMITER = "!@#$%"
+# A vendor that doesn't finish placing an order in time is marked as timed out, the others are not held back
+VENDOR_ORDER_PLACEMENT_TIMEOUT = 5 * 60
 
 logger = logging.getLogger(__name__)
 
@@ -237,13 +245,16 @@ class OfficeProductHelper:
             office_id = office
 
         product_prices_from_db = await OfficeProductHelper.get_products_prices_from_db(products, office_id)
+        if from_api:
+            return product_prices_from_db
+
         products_to_be_fetched = {}
 
         for product_id, product in products.items():
             products_to_be_fetched[product_id] = product.to_dict(include_images=False)
 
         print(f"==== Number of products to fetch from their sites: {len(products_to_be_fetched)} ====")
-        if not from_api and products_to_be_fetched:
+        if products_to_be_fetched:
             product_prices_from_vendors = await OfficeProductHelper.get_product_prices_from_vendors(
                 products_to_be_fetched, office_id
             )
@@ -260,35 +271,7 @@ class OfficeProductHelper:
     async def get_products_prices_from_db(
         products: Dict[str, ProductModel], office_id: str
     ) -> Dict[str, ProductPrice]:
-        product_ids_from_formula_vendors = []
-        product_ids_from_non_formula_vendors = []
-        for product_id, product in products.items():
-            if product.vendor.slug in settings.FORMULA_VENDORS:
-                product_ids_from_formula_vendors.append(product_id)
-            else:
-                product_ids_from_non_formula_vendors.append(product_id)
-
-        product_prices = defaultdict(dict)
-
-        # get prices of products from formula vendors
-        office_products = OfficeProductModel.objects.filter(
-            product_id__in=product_ids_from_formula_vendors, office_id=office_id
-        ).values("product_id", "price", "product_vendor_status")
-
-        async for office_product in office_products:
-            product_prices[office_product["product_id"]]["price"] = office_product["price"]
-            product_prices[office_product["product_id"]]["product_vendor_status"] = office_product[
-                "product_vendor_status"
-            ]
-
-        # get prices of products from non-formula vendors
-        for product_id in product_ids_from_non_formula_vendors:
-            recent_price = products[product_id].recent_price
-            if recent_price:
-                product_prices[product_id]["price"] = recent_price
-                product_prices[product_id]["product_vendor_status"] = ""
-
-        return product_prices
+        return to_product_prices(await resolve_prices(office_id, products.keys()))
 
     @staticmethod
     async def get_product_prices_from_vendors(products: Dict[str, Product], office_id: str) -> Dict[str, ProductPrice]:
@@ -371,6 +354,8 @@ class VendorHelper:
                 username=username,
                 password=password,
             )
+            # credentials are being verified, always perform a real login
+            vendor_client.use_session_cache = False
             await vendor_client.login()
             return True
         except VendorAuthenticationFailed:
@@ -644,66 +629,111 @@ class ProductHelper:
             df_index += batch_size
 
     @staticmethod
-    def group_products_by_manufacturer_numbers(since: Optional[datetime.datetime] = None, vendor_id=-1):
-        """group products by using manufacturer_number. this number is identical for products"""
-        products = ProductModel.objects.filter(manufacturer_number__isnull=False)
+    def group_products_by_manufacturer_numbers(
+        since: Optional[datetime.datetime] = None, vendor_id=-1, batch_size: int = 1000
+    ) -> Dict[str, int]:
+        """
+        group products by using manufacturer_number. this number is identical for products
+
+        This works on sets instead of looping over manufacturer numbers:
+        1. one aggregated query computes every manufacturer number group and its existing parents
+        2. groups with exactly one parent keep it, groups with several parents get them deleted
+        3. missing parents are bulk created, named after the shortest product name of the group
+        4. children parent_id are updated in batches with UPDATE ... FROM (VALUES ...)
+        When since is given, only manufacturer numbers of products updated after that time are touched.
+        """
+        products = ProductModel.objects.filter(manufacturer_number__isnull=False).exclude(manufacturer_number="")
         if since:
             products = products.filter(updated_at__gt=since)
         if vendor_id != -1:
             products = products.filter(vendor_id=vendor_id)
-        manufacturer_numbers = set(
-            products.order_by("manufacturer_number")
+        manufacturer_numbers = products.order_by().values("manufacturer_number").distinct()
+
+        groups = (
+            ProductModel.objects.filter(vendor__isnull=False, manufacturer_number__in=Subquery(manufacturer_numbers))
+            .order_by()
             .values("manufacturer_number")
-            .annotate(products_count=Count("vendor"))
-            .values_list("manufacturer_number", flat=True)
-        )
-        products_to_be_updated = []
-        # parent_products_to_be_created = []
-        for i, manufacturer_number in enumerate(manufacturer_numbers):
-            if len(manufacturer_number) < 1:
-                continue
-            print(f"Calculating {i}th: {manufacturer_number}")
-            similar_products = ProductModel.objects.filter(
-                manufacturer_number=manufacturer_number, vendor__isnull=False
+            .annotate(
+                parents_count=Count("parent_id", distinct=True),
+                parent_ids=ArrayAgg("parent_id", distinct=True, filter=Q(parent_id__isnull=False), default=[]),
             )
+        )
 
-            # remove already existing parent products
-            similar_product_ids = similar_products.values_list("id", flat=True)
-            parent_products = ProductModel.objects.filter(child__id__in=similar_product_ids).distinct()
-            product_names = sorted(list(similar_products.values_list("name", flat=True)), key=lambda x: len(x))
-            display_text = concatenate_list_as_string(similar_product_ids, delimiter=",")
-
-            parent_products_count = parent_products.count()
-            if parent_products_count == 1:
-                parent_product = parent_products.first()
-                print(f"Parent product already existed {parent_product.id} {parent_product.name}: {display_text}")
-                parent_product.manufacturer_number = manufacturer_number
-                parent_product.save()
+        parent_ids: Dict[str, int] = {}
+        parent_ids_to_be_deleted = []
+        manufacturer_numbers_without_parent = []
+        for group in groups.iterator(chunk_size=batch_size):
+            if group["parents_count"] == 1:
+                parent_ids[group["manufacturer_number"]] = group["parent_ids"][0]
             else:
-                if parent_products_count >= 2:
-                    parent_product_ids = parent_products.values_list("id", flat=True)
-                    display_text = f"{concatenate_list_as_string(parent_product_ids, delimiter=',')}: {display_text}"
-                    print(f"Existed 2 parents {display_text}")
-                    ProductModel.objects.filter(id__in=parent_product_ids).delete()
+                if group["parents_count"] >= 2:
+                    display_text = concatenate_list_as_string(group["parent_ids"], delimiter=",")
+                    print(f"Existed {group['parents_count']} parents for {group['manufacturer_number']}")
+                    print(display_text)
+                    parent_ids_to_be_deleted.extend(group["parent_ids"])
+                manufacturer_numbers_without_parent.append(group["manufacturer_number"])
+
+        # a parent shared with a group having several parents is deleted, its other groups get a new parent too
+        deleted_parent_ids = set(parent_ids_to_be_deleted)
+        for manufacturer_number, parent_id in list(parent_ids.items()):
+            if parent_id in deleted_parent_ids:
+                del parent_ids[manufacturer_number]
+                manufacturer_numbers_without_parent.append(manufacturer_number)
+        print(
+            f"{len(parent_ids)} groups with parent, {len(manufacturer_numbers_without_parent)} groups without parent"
+        )
 
-                parent_product = ProductModel.objects.create(
-                    name=product_names[0], manufacturer_number=manufacturer_number
-                )
+        with transaction.atomic():
+            # the existing parent takes the manufacturer number of its children
+            bulk_update_from_values(
+                ProductModel,
+                "id",
+                ["manufacturer_number"],
+                [(parent_id, manufacturer_number) for manufacturer_number, parent_id in parent_ids.items()],
+                batch_size=batch_size,
+            )
 
-            for product in similar_products:
-                product.parent = parent_product
-                products_to_be_updated.append(product)
+            for parent_ids_batch in batched(parent_ids_to_be_deleted, batch_size):
+                ProductModel.objects.filter(id__in=parent_ids_batch).delete()
 
-                # parent_products_to_be_created.append(
-                #     ParentProduct(
-                #         product=ProductModel(name=product_names[0], manufacturer_number=manufacturer_number),
-                #         children_ids=similar_product_ids,
-                #     )
-                # )
+            for manufacturer_numbers_batch in batched(manufacturer_numbers_without_parent, batch_size):
+                parent_names = (
+                    ProductModel.objects.filter(
+                        vendor__isnull=False, manufacturer_number__in=manufacturer_numbers_batch
+                    )
+                    .order_by("manufacturer_number", Length("name"))
+                    .distinct("manufacturer_number")
+                    .values_list("manufacturer_number", "name")
+                )
+                parent_products = ProductModel.objects.bulk_create(
+                    [
+                        ProductModel(name=name, manufacturer_number=manufacturer_number)
+                        for manufacturer_number, name in parent_names
+                    ]
+                )
+                for parent_product in parent_products:
+                    parent_ids[parent_product.manufacturer_number] = parent_product.id
+
+            print("updating databases...")
+            updated_count = bulk_update_from_values(
+                ProductModel,
+                "manufacturer_number",
+                ["parent"],
+                list(parent_ids.items()),
+                batch_size=batch_size,
+                where="t.vendor_id IS NOT NULL",
+            )
 
-        print("updating databases...")
-        bulk_update(model_class=ProductModel, objs=products_to_be_updated, fields=["parent"])
-        # ProductHelper.create_parent_products(parent_products_to_be_created)
+        result = {
+            "groups": len(parent_ids),
+            "created_parents": len(manufacturer_numbers_without_parent),
+            "deleted_parents": len(parent_ids_to_be_deleted),
+            "updated_products": updated_count,
+        }
+        print(result)
+        if updated_count or result["created_parents"] or result["deleted_parents"]:
+            bump_catalog_version()
+        return result
 
     @staticmethod
     def group_products(
@@ -754,27 +784,27 @@ class ProductHelper:
                 return []
 
         vendors_products = {}
-        product_ids_by_vendors = []
+        vendors_count = 0
         for vendor_slug in vendor_slugs:
             vendor_products = products.filter(vendor__slug=vendor_slug).values("id", "vendor", "name")
             if product_category:
                 vendor_products = vendor_products.filter(category=product_category)
 
+            vendor_products_count = 0
             for vendor_product in vendor_products:
                 vendors_products[vendor_product["id"]] = {
                     "vendor": vendor_product["vendor"],
                     "name": vendor_product["name"],
                 }
+                vendor_products_count += 1
 
-            if vendor_products:
-                product_ids_by_vendors.append(vendor_products.values_list("id", flat=True))
+            if vendor_products_count:
+                vendors_count += 1
 
-        if len(product_ids_by_vendors) <= 1:
+        if vendors_count <= 1:
             return []
 
-        similar_product_ids_list: List[ProductIDs] = ProductHelper.group_products_by_name(
-            vendors_products, product_ids_by_vendors
-        )
+        similar_product_ids_list: List[ProductIDs] = ProductHelper.group_products_by_name(vendors_products)
         parent_product_objs: List[ParentProduct] = []
 
         print("updating database")
@@ -817,144 +847,28 @@ class ProductHelper:
             ProductHelper.create_parent_products(parent_product_objs)
 
     @staticmethod
-    def group_products_by_name(products, product_ids_by_vendors) -> List[ProductIDs]:
-        # TODO: This algorith should be updated. like this way
+    def group_products_by_name(products: Dict[ProductID, dict], threshold: float = 0.7) -> List[ProductIDs]:
         """
-        1. find out 2-length similar products like current one
-        2. from the 3-length product comparison, current approach seems bad,
-            even though we don't calculate similarity for all pairs
-        3. group_by_vendors, run combination, products just like 2-length comparison, that will be faster.
+        products: {product_id: {"vendor": vendor, "name": product name}}
+        Return the list of similar product ids, each group contains at most one product per vendor.
+        See ProductGroupingEngine for how candidates are found and merged.
         """
-        threshold = 0.7
-        n_similarity = 2
-        vendors_count = len(product_ids_by_vendors)
-        similar_products_candidates = defaultdict(list)
-
-        # find out all 2-length similar products
-        products_combinations = itertools.combinations(product_ids_by_vendors, n_similarity)
-        for products_combination in products_combinations:
-            for product_ids in itertools.product(*products_combination):
-                vendor_product_names = [products[product_id]["name"] for product_id in product_ids]
-                similarity = ProductHelper.get_similarity(*vendor_product_names)
-
-                if similarity > threshold:
-                    display_text = "; ".join(
-                        [f'{products[product_id]["vendor"]}-{product_id}' for product_id in product_ids]
-                    )
-                    print(f"{similarity:.2f}: {display_text}")
-                    similar_products_candidates[n_similarity].append([f"{similarity:.2f}", *product_ids])
-
-        # when finding more than 3-length similar products we need to check from candidates pairs
-        n_similarity = 3
-        while n_similarity <= vendors_count:
-            print(f"calculating {n_similarity}=======")
-            n_threshold = threshold ** (n_similarity - 1)
-            n_1_similarity_products_pairs_length = len(similar_products_candidates[n_similarity - 1])
-            if not n_1_similarity_products_pairs_length:
-                break
-
-            well_matching_pair_ids = set()
-            for i in range(n_1_similarity_products_pairs_length - 1):
-                ith_similar_products_pair = similar_products_candidates[n_similarity - 1][i][1:]
-                ith_similar_product_ids = set(ith_similar_products_pair)
-                ith_similar_product_vendors = set(
-                    [products[product_id]["vendor"] for product_id in ith_similar_products_pair]
-                )
-                print(f"comparing with {i}th element ")
-                for j in range(i + 1, n_1_similarity_products_pairs_length):
-                    jth_similar_products_pair = similar_products_candidates[n_similarity - 1][j][1:]
-                    jth_similar_product_ids = set(jth_similar_products_pair)
-                    jth_similar_product_vendors = set(
-                        [products[product_id]["vendor"] for product_id in jth_similar_products_pair]
-                    )
-                    if not ith_similar_product_ids.intersection(jth_similar_product_ids):
-                        continue
-
-                    proucts_difference = ith_similar_product_ids - jth_similar_product_ids
-                    if len(proucts_difference) > 1:
-                        continue
-
-                    ith_vendor_difference = ith_similar_product_vendors - jth_similar_product_vendors
-                    jth_vendor_difference = jth_similar_product_vendors - ith_similar_product_vendors
-
-                    if ith_vendor_difference == jth_vendor_difference:
-                        continue
-
-                    if tuple(ith_similar_product_ids | jth_similar_product_ids) in well_matching_pair_ids:
-                        continue
-
-                    similar_products_pair = ith_similar_product_ids | jth_similar_product_ids
-                    well_matching_pair_ids.add(tuple(similar_products_pair))
-                    vendor_product_names = [products[product_id]["name"] for product_id in similar_products_pair]
-                    similarity = ProductHelper.get_similarity(*vendor_product_names)
-
-                    if similarity > n_threshold:
-                        display_text = "; ".join(
-                            [f'{products[product_id]["vendor"]}-{product_id}' for product_id in similar_products_pair]
-                        )
-                        print(f"{similarity:.2f}: {display_text}")
-                        similar_products_candidates[n_similarity].append([f"{similarity:.2f}", *similar_products_pair])
-
-            n_similarity += 1
-
-        similar_products_candidates = chain.from_iterable([value for _, value in similar_products_candidates.items()])
-        similar_products_list = ProductHelper.clean_well_matching_paris(similar_products_candidates)
-        return [similar_products[1:] for similar_products in similar_products_list]
-
-    @staticmethod
-    def clean_well_matching_paris(well_matching_pairs):
-        """
-        This will remove partly-duplicated product paris if the well_matching_paris contains
-        [(1, vendorA_productID, vendorB_productID), (0.9, vendorA_productID, vendorB_productID)]
-        the second pair is not needed.
-        """
-        cleaned_well_matching_paris = []
-        included_product_ids = set()
-        well_matching_pairs = sorted(well_matching_pairs, key=lambda x: (len(x), x[0]), reverse=True)
-        for well_matching_pair in well_matching_pairs:
-            well_matching_product_pair_ids = set(well_matching_pair[1:])
-            if included_product_ids & well_matching_product_pair_ids:
-                continue
-            included_product_ids |= well_matching_product_pair_ids
-            cleaned_well_matching_paris.append(well_matching_pair)
-        return cleaned_well_matching_paris
+        return group_products_by_name(
+            ((product_id, product["vendor"], product["name"]) for product_id, product in products.items()),
+            threshold=threshold,
+        )
 
     @staticmethod
     def get_similarity(*products, key=None):
-        total_words = set()
-        matched_words = set()
-        total_numeric_values = set()
-        matched_numeric_values = set()
-        excluded_words = {"of", "and", "with"}
-
-        for product_i, product in enumerate(products):
+        product_names = []
+        for product in products:
             if isinstance(product, dict):
-                product_name = product[key]
+                product_names.append(product[key])
             elif isinstance(product, Model):
-                product_name = getattr(product, key)
+                product_names.append(getattr(product, key))
             else:
-                product_name = product
-
-            product_numeric_values = set(map(str.lower, find_numeric_values_from_string(product_name)))
-            product_words = set(map(str.lower, find_words_from_string(product_name)))
-            product_words = product_words - product_numeric_values
-            product_words -= excluded_words
-            total_words.update(product_words)
-            total_numeric_values.update(product_numeric_values)
-            if product_i == 0:
-                matched_words = product_words
-                matched_numeric_values = product_numeric_values
-            else:
-                matched_words &= product_words
-                matched_numeric_values &= product_numeric_values
-
-        if len(total_numeric_values):
-            percentage = 0.4 * len(matched_words) / len(total_words) + 0.6 * len(matched_numeric_values) / len(
-                total_numeric_values
-            )
-        else:
-            percentage = len(matched_words) / len(total_words)
-        return percentage
+                product_names.append(product)
+        return get_names_similarity(*product_names)
 
     @staticmethod
     def export_similar_products_to_csv(
@@ -1186,7 +1100,12 @@ class ProductHelper:
         price_from: float = -1,
         price_to: float = -1,
         vendors: Optional[List[str]] = None,
+        product_ids: Optional[List[int]] = None,
     ):
+        """
+        product_ids: when given, the query is not searched again and these products are returned instead,
+                     e.g. the page of a cached search result
+        """
         replacer = Replacer()
         query = replacer.replace(query)
         if isinstance(office, OfficeModel):
@@ -1200,58 +1119,36 @@ class ProductHelper:
             selected_vendors = VendorModel.objects.filter(slug__in=vendor_slugs).values_list("id", flat=True)
             connected_vendor_ids = list(set(connected_vendor_ids) & set(selected_vendors))
 
-        products = (
-            ProductModel.objects.available_products()
-            .search(query)
-            .filter(Q(vendors__overlap=connected_vendor_ids))
-            .filter(parent=None)
-        )
-
-        # Find by nicknames
-        q = SearchQuery(query, config="english")
-        office_nickname_products = (
-            OfficeProductModel.objects.annotate(
-                nn_vector=RawSQL("nn_vector", params=[], output_field=SearchVectorField())
+        # Office specific data (nicknames, inventory) of parent products is kept up to date
+        # in OfficeProductCatalog, so nickname matches and inventory ordering are a single join
+        # (dashes between numerics are removed for product ids like in ProductQuerySet.search)
+        if product_ids is not None:
+            products = ProductModel.objects.filter(id__in=product_ids)
+        else:
+            search_query = SearchQuery(remove_dash_between_numerics(query), config="english")
+            nickname_query = SearchQuery(query, config="english")
+            office_nickname_products = OfficeProductCatalogModel.objects.filter(
+                office_id=office_pk, nn_vector=nickname_query
+            ).values("product_id")
+            products = (
+                ProductModel.objects.available_products()
+                .filter(parent=None)
+                .filter(
+                    Q(search_vector=search_query, vendors__overlap=connected_vendor_ids)
+                    | Q(id__in=office_nickname_products)
+                )
             )
-            .filter(office_id=office_pk, nn_vector=q)
-            .values_list("product_id", flat=True)
-        )
-        office_nickname_product_parents = list(
-            ProductModel.objects.filter(id__in=office_nickname_products).values_list("parent_id", flat=True)
-        )
-        office_nickname_products = ProductModel.objects.available_products().filter(
-            id__in=office_nickname_product_parents
-        )
-
-        # Unify with the above
-        products = products | office_nickname_products
 
-        # TODO: why don't we remove this one? How is it being used?
-        #       Let's change it to office enabled vendors, this query is expensive
-        available_vendors = [
-            vendor
-            for vendor in products.values_list("vendor__slug", flat=True).order_by("vendor__slug").distinct()
-            if vendor
-        ]
+        # The vendors for the search filters are the office connected ones,
+        # scanning the search result for them was as expensive as the search itself
+        available_vendors = list(
+            VendorModel.objects.filter(id__in=connected_vendor_ids).order_by("slug").values_list("slug", flat=True)
+        )
         if selected_products is None:
             selected_products = []
 
         products = products.select_related("vendor", "category")
 
-        office_product_price = OfficeProductModel.objects.filter(
-            office_id=office_pk, product_id=OuterRef("pk")
-        ).values("price")
-
-        # we treat parent product as inventory product if it has inventory children product
-        max_last_order_date = (
-            OfficeProductModel.objects.filter(
-                office_id=office_pk, is_inventory=True, product__parent_id=OuterRef("pk")
-            )
-            .order_by()
-            .annotate(max_last_order_date=Func(F("last_order_date"), function="Max"))
-            .values("max_last_order_date")
-        )
-
         price_least_update_date = timezone.localtime() - datetime.timedelta(days=settings.PRODUCT_PRICE_UPDATE_CYCLE)
         office_product_price = OfficeProductModel.objects.filter(
             Q(office=office) & Q(product_id=OuterRef("pk")) & Q(last_price_updated__gte=price_least_update_date)
@@ -1276,11 +1173,14 @@ class ProductHelper:
             child_products_prefetch = child_products_prefetch.filter(product_price__lte=price_to)
 
         products = (
-            products.annotate(last_order_date=Subquery(max_last_order_date))
+            products.annotate(
+                office_catalog_product=FilteredRelation(
+                    "office_catalog", condition=Q(office_catalog__office_id=office_pk)
+                )
+            )
+            # we treat parent product as inventory product if it has inventory children product
+            .annotate(last_order_date=F("office_catalog_product__last_order_date"))
             .annotate(is_inventory=ExpressionWrapper(Q(last_order_date__isnull=False), output_field=BooleanField()))
-            # .annotate(last_order_date=Subquery(inventory_office_products.values("last_order_date")[:1]))
-            # .annotate(last_order_price=Subquery(inventory_office_products.values("price")[:1]))
-            # .annotate(product_vendor_status=Subquery(office_products.values("product_vendor_status")[:1]))
             .annotate(
                 selected_product=Case(
                     When(id__in=selected_products, then=Value(0)),
@@ -1297,12 +1197,40 @@ class ProductHelper:
                 "selected_product",
                 F("last_order_date").desc(nulls_last=True),
                 "-child_count",
+                "id",
             )
             .prefetch_related(Prefetch("children", child_products_prefetch))
         )
 
         return products, available_vendors
 
+    @staticmethod
+    def get_products_v3_position(product: ProductModel) -> list:
+        """Values of the get_products_v3 ordering for a product, used as keyset pagination cursor"""
+        last_order_date = product.last_order_date.isoformat() if product.last_order_date else None
+        return [product.selected_product, last_order_date, product.child_count, product.id]
+
+    @staticmethod
+    def filter_products_v3_after(products: QuerySet, position: list) -> QuerySet:
+        """Products of get_products_v3 that come after the position, raise ValueError for invalid position"""
+        selected_product, last_order_date, child_count, product_id = position
+        selected_product, child_count, product_id = int(selected_product), int(child_count), int(product_id)
+
+        after_in_same_date = Q(child_count__lt=child_count) | Q(child_count=child_count, id__gt=product_id)
+        if last_order_date is None:
+            # nulls are last
+            after_in_same_selection = Q(last_order_date__isnull=True) & after_in_same_date
+        else:
+            last_order_date = datetime.date.fromisoformat(last_order_date)
+            after_in_same_selection = (
+                Q(last_order_date__lt=last_order_date)
+                | Q(last_order_date__isnull=True)
+                | (Q(last_order_date=last_order_date) & after_in_same_date)
+            )
+        return products.filter(
+            Q(selected_product__gt=selected_product) | (Q(selected_product=selected_product) & after_in_same_selection)
+        )
+
     @staticmethod
     def suggest_products(search: str, office: Union[OfficeModel, SmartID]):
         if isinstance(office, OfficeModel):
@@ -1454,9 +1382,11 @@ class OrderHelper:
         office_vendor: OfficeVendorModel,
         login_cookies: str = None,
         perform_login: bool = True,
-        completed_order_ids: list = [],
-        consider_recent: bool = False,
-    ):
+        completed_order_ids: Iterable[str] = (),
+        from_date: Optional[datetime.date] = None,
+        to_date: Optional[datetime.date] = None,
+    ) -> int:
+        """Save the orders of the office vendor, return the number of orders that failed"""
         from apps.accounts.tasks import notify_vendor_auth_issue_to_admins
 
         async with ClientSession(cookies=login_cookies, timeout=ClientTimeout(30)) as session:
@@ -1466,13 +1396,6 @@ class OrderHelper:
                 username=office_vendor.username,
                 password=office_vendor.password,
             )
-            from_date = None
-            to_date = None
-
-            if consider_recent:
-                from_date = timezone.localtime().date() - datetime.timedelta(days=4)
-                to_date = timezone.localtime().date()
-
             if perform_login:
                 try:
                     await scraper.login()
@@ -1482,13 +1405,15 @@ class OrderHelper:
                     notify_vendor_auth_issue_to_admins.delay(office_vendor.id)
                     raise VendorAuthFailed(f"Authentication is failed for {office_vendor.vendor.name} vendor")
 
-            await scraper.get_orders(
-                office=office_vendor.office,
-                from_date=from_date,
-                to_date=to_date,
-                perform_login=False,
-                completed_order_ids=completed_order_ids,
-            )
+            async with scraper.batch_order_saving(office_vendor.office):
+                await scraper.get_orders(
+                    office=office_vendor.office,
+                    from_date=from_date,
+                    to_date=to_date,
+                    perform_login=False,
+                    completed_order_ids=completed_order_ids,
+                )
+            return scraper.failed_order_count
 
     @staticmethod
     async def process_order_in_vendor(
@@ -1526,6 +1451,46 @@ class OrderHelper:
                 vendor_order.vendor_order_id = result.get("order_id")
                 await vendor_order.asave()
 
+    @staticmethod
+    async def place_vendor_order(
+        vendor_order: VendorOrderModel,
+        office_vendor: OfficeVendorModel,
+        products: List[CartProduct],
+        fake_order: bool = False,
+    ) -> bool:
+        """
+        Place the vendor order within VENDOR_ORDER_PLACEMENT_TIMEOUT and record the outcome on the vendor order
+        as soon as it is known, return whether the order was placed
+        """
+        vendor_orders = VendorOrderModel.objects.filter(pk=vendor_order.pk)
+        await vendor_orders.aupdate(placement_status=VendorOrderModel.PlacementStatus.IN_PROGRESS)
+        try:
+            await aio.wait_for(
+                OrderHelper.process_order_in_vendor(
+                    vendor_order=vendor_order,
+                    office_vendor=office_vendor,
+                    products=products,
+                    fake_order=fake_order,
+                ),
+                timeout=VENDOR_ORDER_PLACEMENT_TIMEOUT,
+            )
+        except aio.TimeoutError:
+            logger.error("Placing vendor order %s timed out", vendor_order.pk)
+            await vendor_orders.aupdate(
+                placement_status=VendorOrderModel.PlacementStatus.TIMED_OUT,
+                placement_error=f"Not placed in {VENDOR_ORDER_PLACEMENT_TIMEOUT} seconds",
+            )
+            return False
+        except Exception as e:
+            exception_tb = "\n".join(traceback.extract_tb(e.__traceback__).format())
+            logger.error("Placing vendor order %s resulted in exception:\n%s\n%s", vendor_order.pk, e, exception_tb)
+            await vendor_orders.aupdate(
+                placement_status=VendorOrderModel.PlacementStatus.FAILED, placement_error=str(e)
+            )
+            return False
+        await vendor_orders.aupdate(placement_status=VendorOrderModel.PlacementStatus.PLACED, placement_error=None)
+        return True
+
     @staticmethod
     async def perform_orders_in_vendors(
         order_id: int,
@@ -1537,13 +1502,11 @@ class OrderHelper:
         order_tasks = []
 
         for vendor_order_id in vendor_order_ids:
-            vendor_order = (
-                await VendorOrderModel.objects.select_related("order", "order__office", "shipping_option", "vendor")
-                .prefetch_related("order_products")
-                .aget(pk=vendor_order_id)
-            )
-            vendor_order_products = (
-                vendor_order.order_products.select_related("product").filter(status=ProductStatus.PROCESSING).all()
+            vendor_order = await VendorOrderModel.objects.select_related(
+                "order", "order__office", "shipping_option", "vendor"
+            ).aget(pk=vendor_order_id)
+            vendor_order_products = vendor_order.order_products.select_related("product").filter(
+                status=ProductStatus.PROCESSING
             )
             office_vendor = (
                 await OfficeVendorModel.objects.select_related("vendor", "office", "office__company")
@@ -1551,6 +1514,7 @@ class OrderHelper:
                 .aget(office_id=vendor_order.order.office_id, vendor_id=vendor_order.vendor_id)
             )
             products = []
+            product_ids = []
 
             async for vendor_order_product in vendor_order_products:
                 product_description = (
@@ -1570,32 +1534,22 @@ class OrderHelper:
                         manufacturer_number=vendor_order_product.product.manufacturer_number,
                     )
                 )
-                await OfficeProductModel.objects.filter(
-                    office=vendor_order.order.office, product=vendor_order_product.product
-                ).aupdate(last_order_date=vendor_order.order_date)
+                product_ids.append(vendor_order_product.product_id)
+            await OfficeProductModel.objects.filter(
+                office_id=vendor_order.order.office_id, product_id__in=product_ids
+            ).aupdate(last_order_date=vendor_order.order_date)
 
             order_tasks.append(
-                OrderHelper.process_order_in_vendor(
+                OrderHelper.place_vendor_order(
                     vendor_order=vendor_order,
                     office_vendor=office_vendor,
                     products=products,
                     fake_order=fake_order,
                 )
             )
-        results = await aio.gather(*order_tasks, return_exceptions=True)
-
-        for vendor_order_id, result in zip(vendor_order_ids, results):
-            if isinstance(result, Exception):
-                summary = traceback.extract_tb(result.__traceback__)
-                exception_tb = "\n".join(summary.format())
-                logger.error(
-                    "Placing vendor order %s resulted in exception:\n%s\n%s",
-                    vendor_order_id,
-                    result,
-                    exception_tb,
-                )
+        results = await aio.gather(*order_tasks)
 
-        if any([isinstance(r, Exception) for r in results]):
+        if not all(results):
             return
 
         order.order_type = OrderType.ORDO_ORDER
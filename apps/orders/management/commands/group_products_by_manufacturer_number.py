@@ -23,7 +23,14 @@ class Command(BaseCommand):
             help="vendor id to group",
         )
 
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="number of rows per bulk query",
+        )
+
     def handle(self, *args, **options):
         since = datetime.datetime.fromisoformat(options["since"]) if options["since"] else None
         vendor_id = int(options["vendor"]) if options["vendor"] else -1
-        ProductHelper.group_products_by_manufacturer_numbers(since, vendor_id)
+        ProductHelper.group_products_by_manufacturer_numbers(since, vendor_id, batch_size=options["batch_size"])
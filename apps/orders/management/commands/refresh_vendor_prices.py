@@ -0,0 +1,49 @@
+import asyncio
+
+from django.core.management import BaseCommand
+
+from apps.orders.updater import IDLE_INTERVAL, refresh_vendor
+
+
+class Command(BaseCommand):
+    help = "Continuously refresh expired vendor product prices"
+
+    def add_arguments(self, parser):
+        """
+        python manage.py refresh_vendor_prices --vendor henry_schein --office 12 --office 34
+        """
+        parser.add_argument(
+            "--vendor",
+            type=str,
+            required=True,
+            help="vendor slug",
+        )
+        parser.add_argument(
+            "--office",
+            type=str,
+            action="append",
+            help="office id, all the offices connected to the vendor by default",
+        )
+        parser.add_argument(
+            "--cycles",
+            type=int,
+            help="stop after this number of refresh cycles, run forever by default",
+        )
+        parser.add_argument(
+            "--idle-interval",
+            type=float,
+            default=IDLE_INTERVAL,
+            help="seconds to wait when there is nothing to refresh",
+        )
+
+    def handle(self, *args, **options):
+        stats = asyncio.run(
+            refresh_vendor(
+                options["vendor"],
+                office_ids=options["office"],
+                max_cycles=options["cycles"],
+                idle_interval=options["idle_interval"],
+            )
+        )
+        for worker_stats in stats:
+            self.stdout.write(str(worker_stats))
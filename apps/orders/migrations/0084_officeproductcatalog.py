@@ -0,0 +1,195 @@
+# Generated by Django 4.2.1 on 2026-10-17 20:58
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+RECALCULATE_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION recalculate_office_product_catalog(catalog_office_id bigint, parent_product_id bigint)
+RETURNS VOID
+AS $$
+DECLARE
+    calculated_last_order_date date;
+    calculated_nicknames text;
+BEGIN
+    SELECT max(ofp.last_order_date) FILTER (WHERE ofp.is_inventory), string_agg(ofp.nickname, ' ')
+    INTO calculated_last_order_date, calculated_nicknames
+    FROM orders_officeproduct ofp
+    JOIN orders_product op ON op.id = ofp.product_id
+    WHERE ofp.office_id = catalog_office_id AND op.parent_id = parent_product_id;
+
+    IF calculated_last_order_date IS NULL AND coalesce(calculated_nicknames, '') = '' THEN
+        DELETE FROM orders_officeproductcatalog
+        WHERE office_id = catalog_office_id AND product_id = parent_product_id;
+    ELSE
+        INSERT INTO orders_officeproductcatalog (office_id, product_id, last_order_date, nn_vector)
+        VALUES (
+            catalog_office_id,
+            parent_product_id,
+            calculated_last_order_date,
+            to_tsvector('english', coalesce(calculated_nicknames, ''))
+        )
+        ON CONFLICT (office_id, product_id) DO UPDATE
+        SET last_order_date = excluded.last_order_date, nn_vector = excluded.nn_vector;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+RECALCULATE_FUNCTION_REV_SQL = """
+DROP FUNCTION IF EXISTS recalculate_office_product_catalog(bigint, bigint);
+"""
+
+TRIGGER_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION tgf_office_product_recalculate_office_catalog() RETURNS TRIGGER
+AS $$
+DECLARE
+    parent_product_id bigint;
+BEGIN
+    IF (TG_OP = 'DELETE') OR (TG_OP = 'UPDATE' AND (
+        old.office_id IS DISTINCT FROM new.office_id OR old.product_id IS DISTINCT FROM new.product_id
+    )) THEN
+        SELECT parent_id INTO parent_product_id FROM orders_product WHERE id = old.product_id;
+        IF parent_product_id IS NOT NULL THEN
+            PERFORM recalculate_office_product_catalog(old.office_id, parent_product_id);
+        END IF;
+    END IF;
+    IF (TG_OP = 'INSERT') OR (TG_OP = 'UPDATE') THEN
+        SELECT parent_id INTO parent_product_id FROM orders_product WHERE id = new.product_id;
+        IF parent_product_id IS NOT NULL THEN
+            PERFORM recalculate_office_product_catalog(new.office_id, parent_product_id);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION tgf_product_recalculate_office_catalog() RETURNS TRIGGER
+AS $$
+DECLARE
+    catalog_office_id bigint;
+BEGIN
+    FOR catalog_office_id IN
+        SELECT DISTINCT office_id FROM orders_officeproduct
+        WHERE product_id = new.id AND (is_inventory OR nickname IS NOT NULL)
+    LOOP
+        IF old.parent_id IS NOT NULL THEN
+            PERFORM recalculate_office_product_catalog(catalog_office_id, old.parent_id);
+        END IF;
+        IF new.parent_id IS NOT NULL THEN
+            PERFORM recalculate_office_product_catalog(catalog_office_id, new.parent_id);
+        END IF;
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+TRIGGER_FUNCTIONS_REV_SQL = """
+DROP FUNCTION IF EXISTS tgf_office_product_recalculate_office_catalog();
+DROP FUNCTION IF EXISTS tgf_product_recalculate_office_catalog();
+"""
+
+TRIGGERS_SQL = """
+CREATE TRIGGER after_insert_office_product_recalculate_office_catalog
+AFTER INSERT ON orders_officeproduct
+FOR EACH ROW
+WHEN (new.is_inventory IS TRUE OR new.nickname IS NOT NULL)
+EXECUTE FUNCTION tgf_office_product_recalculate_office_catalog();
+
+CREATE TRIGGER after_update_office_product_recalculate_office_catalog
+AFTER UPDATE ON orders_officeproduct
+FOR EACH ROW
+WHEN (
+    (old.is_inventory IS DISTINCT FROM new.is_inventory)
+    OR (old.last_order_date IS DISTINCT FROM new.last_order_date)
+    OR (old.nickname IS DISTINCT FROM new.nickname)
+    OR (old.office_id IS DISTINCT FROM new.office_id)
+    OR (old.product_id IS DISTINCT FROM new.product_id)
+)
+EXECUTE FUNCTION tgf_office_product_recalculate_office_catalog();
+
+CREATE TRIGGER after_delete_office_product_recalculate_office_catalog
+AFTER DELETE ON orders_officeproduct
+FOR EACH ROW
+WHEN (old.is_inventory IS TRUE OR old.nickname IS NOT NULL)
+EXECUTE FUNCTION tgf_office_product_recalculate_office_catalog();
+
+CREATE TRIGGER after_update_parent_id_recalculate_office_catalog
+AFTER UPDATE ON orders_product
+FOR EACH ROW
+WHEN (old.parent_id IS DISTINCT FROM new.parent_id)
+EXECUTE FUNCTION tgf_product_recalculate_office_catalog();
+"""
+
+TRIGGERS_REV_SQL = """
+DROP TRIGGER after_insert_office_product_recalculate_office_catalog ON orders_officeproduct;
+DROP TRIGGER after_update_office_product_recalculate_office_catalog ON orders_officeproduct;
+DROP TRIGGER after_delete_office_product_recalculate_office_catalog ON orders_officeproduct;
+DROP TRIGGER after_update_parent_id_recalculate_office_catalog ON orders_product;
+"""
+
+FILL_SQL = """
+INSERT INTO orders_officeproductcatalog (office_id, product_id, last_order_date, nn_vector)
+SELECT ofp.office_id,
+       op.parent_id,
+       max(ofp.last_order_date) FILTER (WHERE ofp.is_inventory),
+       to_tsvector('english', coalesce(string_agg(ofp.nickname, ' '), ''))
+FROM orders_officeproduct ofp
+JOIN orders_product op ON op.id = ofp.product_id
+WHERE op.parent_id IS NOT NULL AND (ofp.is_inventory OR ofp.nickname IS NOT NULL)
+GROUP BY ofp.office_id, op.parent_id
+HAVING max(ofp.last_order_date) FILTER (WHERE ofp.is_inventory) IS NOT NULL
+    OR coalesce(string_agg(ofp.nickname, ' '), '') <> ''
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0023_officevendor_account_id"),
+        ("orders", "0083_update_search_vectors"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OfficeProductCatalog",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("last_order_date", models.DateField(blank=True, null=True)),
+                (
+                    "nn_vector",
+                    django.contrib.postgres.search.SearchVectorField(
+                        blank=True, help_text="Children nicknames search vector", null=True
+                    ),
+                ),
+                (
+                    "office",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="product_catalog",
+                        to="accounts.office",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="office_catalog", to="orders.product"
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    django.contrib.postgres.indexes.GinIndex(
+                        fields=["office", "nn_vector"], name="office_catalog_nn_vector_idx"
+                    )
+                ],
+                "unique_together": {("office", "product")},
+            },
+        ),
+        migrations.RunSQL(RECALCULATE_FUNCTION_SQL, RECALCULATE_FUNCTION_REV_SQL),
+        migrations.RunSQL(TRIGGER_FUNCTIONS_SQL, TRIGGER_FUNCTIONS_REV_SQL),
+        migrations.RunSQL(TRIGGERS_SQL, TRIGGERS_REV_SQL),
+        migrations.RunSQL(FILL_SQL, migrations.RunSQL.noop),
+    ]
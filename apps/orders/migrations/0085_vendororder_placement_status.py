@@ -0,0 +1,34 @@
+# Generated by Django 4.2.1 on 2026-10-17 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0084_officeproductcatalog"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="vendororder",
+            name="placement_status",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("pending", "Pending"),
+                    ("processing", "In Progress"),
+                    ("placed", "Placed"),
+                    ("failed", "Failed"),
+                    ("timed_out", "Timed Out"),
+                ],
+                max_length=16,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="vendororder",
+            name="placement_error",
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,203 @@
+# Generated by Django 4.2.1 on 2026-10-17 21:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+RECALCULATE_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION recalculate_office_product_order_summaries(office_ids bigint[], product_ids bigint[])
+RETURNS VOID
+AS $$
+BEGIN
+    WITH pairs AS (
+        SELECT DISTINCT office_id, product_id
+        FROM unnest(office_ids, product_ids) AS p(office_id, product_id)
+        WHERE office_id IS NOT NULL AND product_id IS NOT NULL
+    ), summaries AS (
+        SELECT pairs.office_id, pairs.product_id, last_vop.*
+        FROM pairs
+        CROSS JOIN LATERAL (
+            SELECT vop.quantity,
+                   vo.order_date,
+                   vop.unit_price,
+                   vop.updated_at,
+                   sum(vop.quantity) OVER () AS total_quantity
+            FROM orders_vendororderproduct vop
+            JOIN orders_vendororder vo ON vo.id = vop.vendor_order_id
+            JOIN orders_order o ON o.id = vo.order_id
+            WHERE vop.product_id = pairs.product_id AND o.office_id = pairs.office_id
+            ORDER BY vop.updated_at DESC, vop.id DESC
+            LIMIT 1
+        ) last_vop
+    ), deleted AS (
+        DELETE FROM orders_officeproductordersummary ops
+        USING pairs
+        WHERE ops.office_id = pairs.office_id
+          AND ops.product_id = pairs.product_id
+          AND NOT EXISTS (
+              SELECT 1 FROM summaries s WHERE s.office_id = pairs.office_id AND s.product_id = pairs.product_id
+          )
+    )
+    INSERT INTO orders_officeproductordersummary (
+        office_id,
+        product_id,
+        last_quantity_ordered,
+        last_order_date,
+        last_order_price,
+        last_ordered_at,
+        total_quantity_ordered
+    )
+    SELECT office_id, product_id, quantity, order_date, unit_price, updated_at, total_quantity
+    FROM summaries
+    ON CONFLICT (office_id, product_id) DO UPDATE
+    SET last_quantity_ordered = excluded.last_quantity_ordered,
+        last_order_date = excluded.last_order_date,
+        last_order_price = excluded.last_order_price,
+        last_ordered_at = excluded.last_ordered_at,
+        total_quantity_ordered = excluded.total_quantity_ordered;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+RECALCULATE_FUNCTION_REV_SQL = """
+DROP FUNCTION IF EXISTS recalculate_office_product_order_summaries(bigint[], bigint[]);
+"""
+
+# Statement level triggers, a bulk insert of vendor order products recalculates every (office, product) pair once
+TRIGGER_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION tgf_vendor_order_product_recalculate_order_summaries() RETURNS TRIGGER
+AS $$
+BEGIN
+    IF (TG_OP = 'INSERT') OR (TG_OP = 'UPDATE') THEN
+        PERFORM recalculate_office_product_order_summaries(array_agg(o.office_id), array_agg(r.product_id))
+        FROM new_rows r
+        JOIN orders_vendororder vo ON vo.id = r.vendor_order_id
+        JOIN orders_order o ON o.id = vo.order_id;
+    END IF;
+    IF (TG_OP = 'DELETE') OR (TG_OP = 'UPDATE') THEN
+        PERFORM recalculate_office_product_order_summaries(array_agg(o.office_id), array_agg(r.product_id))
+        FROM old_rows r
+        JOIN orders_vendororder vo ON vo.id = r.vendor_order_id
+        JOIN orders_order o ON o.id = vo.order_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION tgf_vendor_order_recalculate_order_summaries() RETURNS TRIGGER
+AS $$
+BEGIN
+    PERFORM recalculate_office_product_order_summaries(array_agg(o.office_id), array_agg(vop.product_id))
+    FROM orders_vendororderproduct vop
+    JOIN orders_order o ON o.id = new.order_id
+    WHERE vop.vendor_order_id = new.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+TRIGGER_FUNCTIONS_REV_SQL = """
+DROP FUNCTION IF EXISTS tgf_vendor_order_product_recalculate_order_summaries();
+DROP FUNCTION IF EXISTS tgf_vendor_order_recalculate_order_summaries();
+"""
+
+TRIGGERS_SQL = """
+CREATE TRIGGER after_insert_vendor_order_product_recalculate_order_summaries
+AFTER INSERT ON orders_vendororderproduct
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION tgf_vendor_order_product_recalculate_order_summaries();
+
+CREATE TRIGGER after_update_vendor_order_product_recalculate_order_summaries
+AFTER UPDATE ON orders_vendororderproduct
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION tgf_vendor_order_product_recalculate_order_summaries();
+
+CREATE TRIGGER after_delete_vendor_order_product_recalculate_order_summaries
+AFTER DELETE ON orders_vendororderproduct
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION tgf_vendor_order_product_recalculate_order_summaries();
+
+CREATE TRIGGER after_update_order_date_recalculate_order_summaries
+AFTER UPDATE ON orders_vendororder
+FOR EACH ROW
+WHEN (old.order_date IS DISTINCT FROM new.order_date)
+EXECUTE FUNCTION tgf_vendor_order_recalculate_order_summaries();
+"""
+
+TRIGGERS_REV_SQL = """
+DROP TRIGGER after_insert_vendor_order_product_recalculate_order_summaries ON orders_vendororderproduct;
+DROP TRIGGER after_update_vendor_order_product_recalculate_order_summaries ON orders_vendororderproduct;
+DROP TRIGGER after_delete_vendor_order_product_recalculate_order_summaries ON orders_vendororderproduct;
+DROP TRIGGER after_update_order_date_recalculate_order_summaries ON orders_vendororder;
+"""
+
+FILL_SQL = """
+INSERT INTO orders_officeproductordersummary (
+    office_id,
+    product_id,
+    last_quantity_ordered,
+    last_order_date,
+    last_order_price,
+    last_ordered_at,
+    total_quantity_ordered
+)
+SELECT DISTINCT ON (o.office_id, vop.product_id)
+       o.office_id,
+       vop.product_id,
+       vop.quantity,
+       vo.order_date,
+       vop.unit_price,
+       vop.updated_at,
+       sum(vop.quantity) OVER (PARTITION BY o.office_id, vop.product_id)
+FROM orders_vendororderproduct vop
+JOIN orders_vendororder vo ON vo.id = vop.vendor_order_id
+JOIN orders_order o ON o.id = vo.order_id
+ORDER BY o.office_id, vop.product_id, vop.updated_at DESC, vop.id DESC
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0023_officevendor_account_id"),
+        ("orders", "0085_vendororder_placement_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OfficeProductOrderSummary",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("last_quantity_ordered", models.IntegerField()),
+                ("last_order_date", models.DateField()),
+                ("last_order_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("last_ordered_at", models.DateTimeField()),
+                ("total_quantity_ordered", models.IntegerField()),
+                (
+                    "office",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="product_order_summaries",
+                        to="accounts.office",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="order_summaries",
+                        to="orders.product",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("office", "product")},
+            },
+        ),
+        migrations.RunSQL(RECALCULATE_FUNCTION_SQL, RECALCULATE_FUNCTION_REV_SQL),
+        migrations.RunSQL(TRIGGER_FUNCTIONS_SQL, TRIGGER_FUNCTIONS_REV_SQL),
+        migrations.RunSQL(TRIGGERS_SQL, TRIGGERS_REV_SQL),
+        migrations.RunSQL(FILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -6,7 +6,7 @@ from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.indexes import GinIndex
 from django.contrib.postgres.search import SearchVectorField  # TrigramSimilarity,
 from django.db import models
-from django.db.models import F, Index, OuterRef, Q, Subquery
+from django.db.models import F, FilteredRelation, Index, OuterRef, Q, Subquery
 from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django_extensions.db.fields import AutoSlugField
@@ -235,6 +235,15 @@ class OfficeProductQuerySet(models.QuerySet):
         queryset = self.order_by("product__parent_id", "-last_order_date").distinct("product__parent_id").values("pk")
         return self.model.objects.filter(pk__in=Subquery(queryset))
 
+    def with_last_quantity_ordered(self):
+        """Join the order summary of the product in the same office"""
+        return self.annotate(
+            order_summary=FilteredRelation(
+                "product__order_summaries", condition=Q(product__order_summaries__office_id=F("office_id"))
+            ),
+            last_quantity_ordered=F("order_summary__last_quantity_ordered"),
+        )
+
 
 class OfficeProductManager(models.Manager):
     _queryset_class = OfficeProductQuerySet
@@ -314,6 +323,51 @@ class OfficeProduct(TimeStampedModel):
         )
 
 
+class OfficeProductCatalog(models.Model):
+    """
+    Office specific search data of the parent products, so that product search is a single join.
+    Rows are maintained by database triggers on orders_officeproduct and orders_product (see migrations),
+    a row exists only while one of the children is an inventory product or has a nickname in the office.
+    """
+
+    office = models.ForeignKey(Office, on_delete=models.CASCADE, related_name="product_catalog")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="office_catalog")
+    # Most recent order date of the inventory children
+    last_order_date = models.DateField(null=True, blank=True)
+    nn_vector = SearchVectorField(null=True, blank=True, help_text="Children nicknames search vector")
+
+    class Meta:
+        unique_together = ["office", "product"]
+        indexes = [
+            GinIndex(name="office_catalog_nn_vector_idx", fields=["office", "nn_vector"]),
+        ]
+
+    def __str__(self):
+        return f"{self.product} for {self.office}"
+
+
+class OfficeProductOrderSummary(models.Model):
+    """
+    Order history of a product in an office, so that listing inventory products is a single join.
+    Rows are maintained by database triggers on orders_vendororderproduct (see migrations).
+    """
+
+    office = models.ForeignKey(Office, on_delete=models.CASCADE, related_name="product_order_summaries")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="order_summaries")
+    # Values of the most recently updated vendor order product
+    last_quantity_ordered = models.IntegerField()
+    last_order_date = models.DateField()
+    last_order_price = models.DecimalField(max_digits=10, decimal_places=2)
+    last_ordered_at = models.DateTimeField()
+    total_quantity_ordered = models.IntegerField()
+
+    class Meta:
+        unique_together = ["office", "product"]
+
+    def __str__(self):
+        return f"{self.product} orders for {self.office}"
+
+
 class OrderMonthManager(models.Manager):
     def get_queryset(self):
         today = timezone.localtime().date()
@@ -350,6 +404,13 @@ class Order(TimeStampedModel):
 
 
 class VendorOrder(TimeStampedModel):
+    class PlacementStatus(models.TextChoices):
+        PENDING = "pending", "Pending"
+        IN_PROGRESS = "processing", "In Progress"
+        PLACED = "placed", "Placed"
+        FAILED = "failed", "Failed"
+        TIMED_OUT = "timed_out", "Timed Out"
+
     order = FlexibleForeignKey(Order, related_name="vendor_orders")
     vendor = FlexibleForeignKey(Vendor)
     vendor_order_id = models.CharField(max_length=100)
@@ -375,6 +436,9 @@ class VendorOrder(TimeStampedModel):
     shipping_option = models.ForeignKey(
         ShippingMethod, related_name="vo_shipping_option", on_delete=models.SET_NULL, null=True, blank=True
     )
+    # progress of placing the order on the vendor side, empty for orders that are not placed by us
+    placement_status = models.CharField(max_length=16, choices=PlacementStatus.choices, null=True, blank=True)
+    placement_error = models.TextField(null=True, blank=True)
 
     objects = models.Manager()
     current_months = OrderMonthManager()
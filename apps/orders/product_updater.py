@@ -1,6 +1,8 @@
+import datetime
 import logging
-from collections import namedtuple
-from typing import List, Union
+from collections import Counter, namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+from typing import AsyncIterator, Dict, List, Optional, Union
 
 from aiohttp import ClientSession
 from asgiref.sync import sync_to_async
@@ -10,6 +12,7 @@ from django.db.models import Q
 from django.utils import timezone
 
 from apps.common.enums import SupportedVendor
+from apps.common.utils import bulk_update_from_values
 from apps.orders.models import OfficeProduct, Product
 from services.api_client import (
     DCDentalAPIClient,
@@ -47,75 +50,110 @@ VendorAPIClientMapping = {
     },
 }
 BATCH_SIZE = 5000
+PRICE_QUANTUM = Decimal("0.01")
+# How often last_price_updated is refreshed for products whose price did not change
+PRICE_FRESHNESS_INTERVAL = datetime.timedelta(days=1)
+
+
+def quantize_price(price: Optional[Decimal]) -> Optional[Decimal]:
+    """Round the price the same way as the database column so that it can be compared with stored values"""
+    if price is None:
+        return None
+    return price.quantize(PRICE_QUANTUM, rounding=ROUND_HALF_UP)
 
 
 @sync_to_async
-def update_products(vendor: SupportedVendor, products: Union[List[DentalCityProduct], List[Net32Product]]):
+def update_products(
+    vendor: SupportedVendor, products: Union[List[DentalCityProduct], List[Net32Product]]
+) -> Dict[str, int]:
     """Update the product price in db with data we get from vendor api
     - Net32
     - Dental City: In addition to product price, we update manufacturer promotion
+
+    Current values are read with values() and only the rows whose price, description or
+    promotion changed are written, with one UPDATE ... FROM (VALUES ...) statement per kind of change.
     """
     products_by_identifier = {product.product_identifier: product for product in products}
     update_time = timezone.localtime()
-    office_product_instances = []
 
     vendor_api_client_info = VendorAPIClientMapping[vendor]
     product_identifier_name_in_table = vendor_api_client_info["product_identifier_name_in_table"]
     filters = Q(vendor__slug=vendor.value) & Q(
         **{f"{product_identifier_name_in_table}__in": products_by_identifier.keys()}
     )
-    product_instances = Product.objects.filter(filters)
+    product_rows = Product.objects.filter(filters).values(
+        "id", product_identifier_name_in_table, "price", "vendor_description", "manufacturer_number", "parent_id"
+    )
 
-    manufacturer_promotion_products = []
+    changed_products = []
+    unchanged_product_ids = []
+    product_prices = []
+    manufacturer_promotions = {}
     mismatch_manufacturer_numbers = []
     no_comparison_products = []
+    for product_row in product_rows:
+        vendor_product = products_by_identifier[product_row[product_identifier_name_in_table]]
+        price = quantize_price(vendor_product.price)
+        product_prices.append((product_row["id"], price))
+        vendor_description = getattr(vendor_product, "product_desc", None) or product_row["vendor_description"]
+        if price != product_row["price"] or vendor_description != product_row["vendor_description"]:
+            changed_products.append((product_row["id"], price, vendor_description, update_time, update_time))
+        else:
+            unchanged_product_ids.append(product_row["id"])
+
+        # In case of dental city and DC Dental, we update manufacturer promotion
+        manufacturer_special = getattr(vendor_product, "manufacturer_special", None)
+        if manufacturer_special:
+            manufacturer_number = getattr(vendor_product, "manufacturer_part_number", None)
+            if manufacturer_number and manufacturer_number.replace("-", "") != product_row["manufacturer_number"]:
+                mismatch_manufacturer_numbers.append(vendor_product)
+                continue
+
+            if product_row["parent_id"] is None:
+                no_comparison_products.append(vendor_product)
+                continue
+
+            manufacturer_promotions[product_row["parent_id"]] = manufacturer_special
+
+    changed_promotions = [
+        (parent_id, manufacturer_promotions[parent_id], True, update_time)
+        for parent_id, promotion_description, is_special_offer in Product.objects.filter(
+            id__in=manufacturer_promotions.keys()
+        ).values_list("id", "promotion_description", "is_special_offer")
+        if promotion_description != manufacturer_promotions[parent_id] or not is_special_offer
+    ]
+
     with transaction.atomic():
-        for product_instance in product_instances:
-            # update the product price
-            product_identifier_in_table = getattr(product_instance, product_identifier_name_in_table)
-            vendor_product = products_by_identifier[product_identifier_in_table]
-            product_instance.price = vendor_product.price
-            product_instance.last_price_updated = update_time
-            product_instance.updated_at = update_time
-
-            product_description = getattr(vendor_product, "product_desc", None)
-            if product_description:
-                product_instance.vendor_description = product_description
-
-            # In case of dental city and DC Dental, we update manufacturer promotion
-            manufacturer_special = getattr(vendor_product, "manufacturer_special", None)
-            if manufacturer_special:
-                manufacturer_number = getattr(vendor_product, "manufacturer_part_number", None)
-                if (
-                    manufacturer_number
-                    and manufacturer_number.replace("-", "") != product_instance.manufacturer_number
-                ):
-                    mismatch_manufacturer_numbers.append(vendor_product)
-                    continue
-
-                if product_instance.parent_id is None:
-                    no_comparison_products.append(vendor_product)
-                    continue
-
-                # Avoid loading parent from db, simulate product with id field.
-                manufacturer_promotion_product = Product(id=product_instance.parent_id)
-                manufacturer_promotion_product.promotion_description = manufacturer_special
-                manufacturer_promotion_product.is_special_offer = True
-                manufacturer_promotion_product.updated_at = update_time
-                manufacturer_promotion_products.append(manufacturer_promotion_product)
-
-        OfficeProduct.objects.filter(product=product_instance).update(
-            price=vendor_product.price,
-            last_price_updated=update_time,
-            updated_at=update_time,
+        bulk_update_from_values(
+            Product,
+            "id",
+            ["price", "vendor_description", "last_price_updated", "updated_at"],
+            changed_products,
+            only_changed=False,
+        )
+        # Unchanged prices are still fresh, but there is no need to rewrite them on every run
+        Product.objects.filter(id__in=unchanged_product_ids).filter(
+            Q(last_price_updated__lt=update_time - PRICE_FRESHNESS_INTERVAL) | Q(last_price_updated__isnull=True)
+        ).update(last_price_updated=update_time)
+
+        # Office prices follow the vendor price. Also fixes office prices that were left behind previously.
+        office_products_count = bulk_update_from_values(
+            OfficeProduct,
+            "product",
+            ["price", "last_price_updated", "updated_at"],
+            [(product_id, price, update_time, update_time) for product_id, price in product_prices],
+            batch_size=BATCH_SIZE,
+            only_changed=False,
+            where="t.price IS DISTINCT FROM v.price",
         )
 
-        Product.objects.bulk_update(
-            manufacturer_promotion_products, fields=("promotion_description", "is_special_offer", "updated_at")
+        bulk_update_from_values(
+            Product,
+            "id",
+            ["promotion_description", "is_special_offer", "updated_at"],
+            changed_promotions,
+            only_changed=False,
         )
-        common_fields = ["price", "last_price_updated", "updated_at"]
-        Product.objects.bulk_update(product_instances, fields=common_fields + ["vendor_description"])
-        OfficeProduct.objects.bulk_update(office_product_instances, fields=common_fields)
 
     if mismatch_manufacturer_numbers:
         logger.debug(f"Manufacturer Number Mismatches: {mismatch_manufacturer_numbers}")
@@ -123,6 +161,25 @@ def update_products(vendor: SupportedVendor, products: Union[List[DentalCityProd
     if no_comparison_products:
         logger.debug(f"No pricing comparison: {no_comparison_products}")
 
+    return {
+        "products": len(product_rows),
+        "changed_products": len(changed_products),
+        "changed_promotions": len(changed_promotions),
+        "changed_office_products": office_products_count,
+    }
+
+
+async def rebatch(pages: AsyncIterator[list], batch_size: int) -> AsyncIterator[list]:
+    """Turn pages of any size into batches of batch_size items"""
+    batch = []
+    async for page in pages:
+        batch.extend(page)
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    if batch:
+        yield batch
+
 
 async def update_vendor_products_by_api(vendor_slug: str) -> None:
     async with ClientSession() as session:
@@ -134,9 +191,7 @@ async def update_vendor_products_by_api(vendor_slug: str) -> None:
             kwargs.update(extra_kwargs)
 
         client = api_client_klass(**kwargs)
-        products_from_api = await client.get_products()
-        products_len = len(products_from_api)
-
-        for i in range(0, products_len, BATCH_SIZE):
-            products_chunk = products_from_api[i : i + BATCH_SIZE]
-            await update_products(vendor, products_chunk)
+        stats = Counter()
+        async for products_chunk in rebatch(client.iter_products(), BATCH_SIZE):
+            stats.update(await update_products(vendor, products_chunk))
+        logger.info("Updated %s products by api: %s", vendor_slug, dict(stats))
@@ -1,106 +1,187 @@
+import csv
 import datetime
+import io
 import logging
-from typing import List
+from typing import AsyncIterator, Dict, Iterable, Iterator, List
 
 from aiohttp import ClientSession
-from django.db.models import Q
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import connection, transaction
 from django.utils import timezone
 
 from apps.accounts.models import Vendor
-from apps.common.utils import batched
 from apps.orders.models import Product
+from apps.orders.services.search_cache import bump_catalog_version
 from services.api_client import Net32APIClient
 from services.api_client.vendor_api_types import Net32ProductInfo
 
 BATCH_SIZE = 200
+# Feed rows sent to the staging table per COPY
+COPY_BATCH_SIZE = 10000
+STAGING_TABLE = "net32_product_staging"
+STAGING_COLUMNS = ("mp_id", "price", "manufacturer_number", "name", "url")
+
+# The feed is copied outside of a transaction, the temporary table lives until it is dropped or the connection closes
+CREATE_STAGING_TABLE_SQL = f"""
+CREATE TEMPORARY TABLE {STAGING_TABLE} (
+    mp_id varchar(255) NOT NULL,
+    price numeric(10, 2),
+    manufacturer_number varchar(255),
+    name text,
+    url text
+)
+"""
+
+DEDUPLICATE_STAGING_TABLE_SQL = f"""
+DELETE FROM {STAGING_TABLE} a USING {STAGING_TABLE} b
+WHERE a.mp_id = b.mp_id AND a.ctid < b.ctid
+"""
+
+DISABLE_PRODUCTS_SQL = f"""
+UPDATE orders_product p
+SET is_available_on_vendor = false, updated_at = %(now)s
+WHERE p.vendor_id = %(vendor_id)s
+  AND p.is_available_on_vendor
+  AND NOT EXISTS (SELECT 1 FROM {STAGING_TABLE} s WHERE s.mp_id = p.product_id)
+"""
+
+ENABLE_PRODUCTS_SQL = f"""
+UPDATE orders_product p
+SET is_available_on_vendor = true, updated_at = %(now)s
+FROM {STAGING_TABLE} s
+WHERE p.vendor_id = %(vendor_id)s
+  AND NOT p.is_available_on_vendor
+  AND s.mp_id = p.product_id
+"""
+
+NEW_PRODUCTS_SQL = f"""
+SELECT s.mp_id, s.price, s.manufacturer_number, s.name, s.url
+FROM {STAGING_TABLE} s
+WHERE NOT EXISTS (SELECT 1 FROM orders_product p WHERE p.vendor_id = %(vendor_id)s AND p.product_id = s.mp_id)
+"""
+
+UPDATE_PRICES_SQL = f"""
+UPDATE orders_product p
+SET price = s.price, last_price_updated = %(now)s, updated_at = %(now)s
+FROM {STAGING_TABLE} s
+WHERE p.vendor_id = %(vendor_id)s
+  AND p.is_available_on_vendor
+  AND s.mp_id = p.product_id
+  AND (p.last_price_updated < %(price_updated_before)s OR p.last_price_updated IS NULL)
+"""
 
 
 async def update_net32_products():
     """
     Fetch Full products from Net32 using API
     - Enable or disable products in the table
+    - Create new products
     - Update prices if not updated since yesterday.
     """
+    net_32_vendor_id = (await Vendor.objects.aget(slug="net_32")).id
     async with ClientSession() as session:
         client = Net32APIClient(session)
-        logging.info("Getting full product list")
-        products_from_api: List[Net32ProductInfo] = await client.get_full_products()
+        logging.info("Streaming full product list")
+        products = iter_products(client.iter_full_products())
+        stats = await sync_to_async(sync_net32_products)(net_32_vendor_id, products)
+    logging.info("Net32 products synced: %s", stats)
+    return stats
 
-        await enable_or_disable_products(products_from_api)
-        await update_prices(products_from_api)
 
+def iter_products(batches: AsyncIterator[List[Net32ProductInfo]]) -> Iterator[Net32ProductInfo]:
+    """
+    Iterate the products of the feed from a sync_to_async thread,
+    each batch is downloaded and parsed in the event loop when it is needed.
+    """
 
-async def enable_or_disable_products(products_from_api: List[Net32ProductInfo]):
-    net_32_vendor_id = (await Vendor.objects.aget(slug="net_32")).id
-    all_products = [
-        o
-        async for o in Product.objects.filter(vendor_id=net_32_vendor_id).values_list(
-            "product_id", "is_available_on_vendor"
-        )
-    ]
-    available_product_ids = {product_id for product_id, available in all_products if available}
-    unavailable_product_ids = {product_id for product_id, available in all_products if not available}
-    all_product_ids = {product_id for product_id, _ in all_products}
-
-    available_product_ids_from_api = set(product.mp_id for product in products_from_api)
-
-    product_ids_to_be_disabled = available_product_ids - available_product_ids_from_api
-    product_ids_to_be_enabled = unavailable_product_ids & available_product_ids_from_api
-    product_ids_to_be_created = available_product_ids_from_api - all_product_ids
-
-    logging.info(
-        "To disable = %s, to enable = %s, to_create = %s",
-        len(product_ids_to_be_disabled),
-        len(product_ids_to_be_enabled),
-        len(product_ids_to_be_created),
-    )
-
-    for batch in batched(product_ids_to_be_disabled, BATCH_SIZE):
-        logging.debug("Disabling %s", batch)
-        await Product.objects.filter(product_id__in=batch).aupdate(
-            is_available_on_vendor=False, updated_at=timezone.localtime()
-        )
+    async def next_batch():
+        return await batches.__anext__()
 
-    for batch in batched(product_ids_to_be_enabled, BATCH_SIZE):
-        logging.debug("Enabling %s", batch)
-        await Product.objects.filter(product_id__in=batch).aupdate(
-            is_available_on_vendor=True, updated_at=timezone.localtime()
-        )
+    while True:
+        try:
+            batch = async_to_sync(next_batch)()
+        except StopAsyncIteration:
+            return
+        yield from batch
 
-    updated_at = timezone.localtime()
+
+def copy_to_staging_table(cursor, products: Iterable[Net32ProductInfo]) -> int:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for product in products:
+        writer.writerow([product.mp_id, product.price, product.manufacturer_number, product.name, product.url])
+        count += 1
+        if count % COPY_BATCH_SIZE == 0:
+            copy_buffer(cursor, buffer)
+            buffer.seek(0)
+            buffer.truncate()
+    copy_buffer(cursor, buffer)
+    return count
+
+
+def copy_buffer(cursor, buffer: io.StringIO):
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def sync_net32_products(vendor_id: int, products: Iterable[Net32ProductInfo]) -> Dict[str, int]:
+    """
+    COPY the feed into a temporary staging table, then apply it to the product table
+    with a few set-based statements instead of loading every product in memory.
+    The feed is downloaded while it is copied, so only the statements applying it run in a transaction.
+    """
+    now = timezone.localtime()
+    params = {
+        "now": now,
+        "vendor_id": vendor_id,
+        "price_updated_before": now - datetime.timedelta(days=1),
+    }
+    stats = {}
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+        cursor.execute(CREATE_STAGING_TABLE_SQL)
+        try:
+            stats["feed"] = copy_to_staging_table(cursor, products)
+            cursor.execute(DEDUPLICATE_STAGING_TABLE_SQL)
+            cursor.execute(f"CREATE INDEX ON {STAGING_TABLE} (mp_id)")
+            cursor.execute(f"ANALYZE {STAGING_TABLE}")
+            with transaction.atomic():
+                stats.update(apply_staging_table(cursor, vendor_id, params))
+        finally:
+            cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+    if stats["disabled"] or stats["enabled"] or stats["created"]:
+        bump_catalog_version()
+    return stats
+
+
+def apply_staging_table(cursor, vendor_id: int, params: dict) -> Dict[str, int]:
+    """Enable, disable, create and reprice the products of the vendor from the staging table"""
+    now = params["now"]
+    stats = {}
+    cursor.execute(DISABLE_PRODUCTS_SQL, params)
+    stats["disabled"] = cursor.rowcount
+    cursor.execute(ENABLE_PRODUCTS_SQL, params)
+    stats["enabled"] = cursor.rowcount
+
+    cursor.execute(NEW_PRODUCTS_SQL, params)
     products_to_be_created = [
         Product(
-            vendor_id=net_32_vendor_id,
-            product_id=product.mp_id,
-            manufacturer_number=product.manufacturer_number,
-            name=product.name,
-            url=product.url,
-            price=product.price,
-            last_price_updated=updated_at,
-            created_at=updated_at,
-            updated_at=updated_at,
+            vendor_id=vendor_id,
+            product_id=mp_id,
+            manufacturer_number=manufacturer_number,
+            name=name,
+            url=url,
+            price=price,
+            last_price_updated=now,
+            created_at=now,
+            updated_at=now,
         )
-        for product in products_from_api
-        if product.mp_id in product_ids_to_be_created
+        for mp_id, price, manufacturer_number, name, url in cursor.fetchall()
     ]
+    Product.objects.bulk_create(products_to_be_created, batch_size=BATCH_SIZE)
+    stats["created"] = len(products_to_be_created)
 
-    await Product.objects.abulk_create(products_to_be_created, batch_size=BATCH_SIZE)
-
-
-async def update_prices(products_from_api: List[Net32ProductInfo]):
-    product_prices = {p.mp_id: p.price for p in products_from_api}
-    updated_at = timezone.localtime()
-    datetime_from = updated_at - datetime.timedelta(days=1)
-    product_instances = Product.net32.available_products().filter(
-        Q(last_price_updated__lt=datetime_from) | Q(last_price_updated=None)
-    )
-    async for product_instance in product_instances:
-        if product_instance.product_id not in product_prices:
-            continue
-        product_instance.price = product_prices[product_instance.product_id]
-        product_instance.last_price_updated = updated_at
-        product_instance.updated_at = updated_at
-
-    await Product.objects.abulk_update(
-        product_instances, fields=["price", "last_price_updated", "updated_at"], batch_size=BATCH_SIZE
-    )
+    cursor.execute(UPDATE_PRICES_SQL, params)
+    stats["price_updated"] = cursor.rowcount
+    return stats
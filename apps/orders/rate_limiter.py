@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds of unused budget a vendor is allowed to accumulate
+DEFAULT_BURST = 1
+# How much the rate grows per second of error-free requests
+ADDITIVE_INCREASE = 0.05
+# How much the rate is cut when the vendor asks us to slow down
+MULTIPLICATIVE_DECREASE = 0.5
+# Pause applied on TooManyRequests when the vendor did not send Retry-After
+DEFAULT_PENALTY = 5
+# Several in-flight requests get rejected together, they should count as one slow down signal
+DECREASE_COOLDOWN = 1
+STATE_TTL = 60 * 60
+
+# KEYS[1]: state key
+# ARGV: now, initial rate, burst, ttl
+# Returns the number of seconds to wait. 0 means a token was taken.
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local state = redis.call('HMGET', KEYS[1], 'rate', 'tokens', 'ts', 'blocked_until')
+local rate = tonumber(state[1]) or tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local tokens = tonumber(state[2]) or burst
+local ts = tonumber(state[3]) or now
+local blocked_until = tonumber(state[4]) or 0
+if blocked_until > now then
+    return tostring(blocked_until - now)
+end
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HMSET', KEYS[1], 'rate', rate, 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return tostring(wait)
+"""
+
+# KEYS[1]: state key
+# ARGV: now, initial rate, min rate, max rate, success (1/0), retry after, ttl
+# Returns the new rate.
+FEEDBACK_SCRIPT = """
+local now = tonumber(ARGV[1])
+local state = redis.call('HMGET', KEYS[1], 'rate', 'decreased_at', 'blocked_until')
+local rate = tonumber(state[1]) or tonumber(ARGV[2])
+local decreased_at = tonumber(state[2]) or 0
+local blocked_until = tonumber(state[3]) or 0
+local min_rate = tonumber(ARGV[3])
+local max_rate = tonumber(ARGV[4])
+if ARGV[5] == '1' then
+    rate = math.min(max_rate, rate + %(increase)s / rate)
+else
+    if now - decreased_at >= %(cooldown)s then
+        rate = math.max(min_rate, rate * %(decrease)s)
+        decreased_at = now
+    end
+    blocked_until = math.max(blocked_until, now + tonumber(ARGV[6]))
+    redis.call('HMSET', KEYS[1], 'tokens', 0, 'ts', now)
+end
+redis.call('HMSET', KEYS[1], 'rate', rate, 'decreased_at', decreased_at, 'blocked_until', blocked_until)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[7]))
+return tostring(rate)
+""" % {
+    "increase": ADDITIVE_INCREASE,
+    "cooldown": DECREASE_COOLDOWN,
+    "decrease": MULTIPLICATIVE_DECREASE,
+}
+
+
+class LocalBucket:
+    """In-process implementation of the same token bucket, used when Redis is not configured"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.ts: Optional[float] = None
+        self.blocked_until = 0.0
+        self.decreased_at = 0.0
+
+    def acquire(self, now: float) -> float:
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.ts is not None:
+            self.tokens = min(self.burst, self.tokens + max(0.0, now - self.ts) * self.rate)
+        self.ts = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def feedback(self, now: float, min_rate: float, max_rate: float, success: bool, retry_after: float) -> float:
+        if success:
+            self.rate = min(max_rate, self.rate + ADDITIVE_INCREASE / self.rate)
+        else:
+            if now - self.decreased_at >= DECREASE_COOLDOWN:
+                self.rate = max(min_rate, self.rate * MULTIPLICATIVE_DECREASE)
+                self.decreased_at = now
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            self.tokens = 0
+            self.ts = now
+        return self.rate
+
+
+class RedisBucket:
+    """Token bucket stored in a Redis hash so that all the workers of a vendor share one budget"""
+
+    def __init__(self, client: redis.Redis, key: str, rate: float, burst: float):
+        self.client = client
+        self.key = key
+        self.initial_rate = rate
+        self.burst = burst
+        self._acquire = client.register_script(ACQUIRE_SCRIPT)
+        self._feedback = client.register_script(FEEDBACK_SCRIPT)
+
+    def acquire(self, now: float) -> float:
+        wait = self._acquire(keys=[self.key], args=[now, self.initial_rate, self.burst, STATE_TTL])
+        return float(wait)
+
+    def feedback(self, now: float, min_rate: float, max_rate: float, success: bool, retry_after: float) -> float:
+        rate = self._feedback(
+            keys=[self.key],
+            args=[now, self.initial_rate, min_rate, max_rate, int(success), retry_after, STATE_TTL],
+        )
+        return float(rate)
+
+
+class VendorRateLimiter:
+    """
+    AIMD token bucket for the requests sent to one vendor.
+
+    Every request takes a token. The rate grows slowly while the vendor answers and is halved as soon as
+    it answers with TooManyRequests, in that case nobody sends requests until Retry-After is over.
+    The state lives in Redis (when REDIS_URL is set) so concurrent update tasks of the same vendor
+    share the budget instead of multiplying it. Any Redis error falls back to a local bucket.
+    """
+
+    key_prefix = "rate_limiter"
+
+    def __init__(
+        self,
+        vendor_slug: str,
+        rate: float,
+        min_rate: Optional[float] = None,
+        max_rate: Optional[float] = None,
+        burst: float = DEFAULT_BURST,
+        redis_url: Optional[str] = None,
+    ):
+        self.vendor_slug = vendor_slug
+        self.min_rate = min_rate or rate / 10
+        self.max_rate = max_rate or rate * 4
+        self.local_bucket = LocalBucket(rate, burst)
+        self.bucket = self.local_bucket
+        redis_url = redis_url or settings.REDIS_URL
+        if redis_url:
+            client = redis.Redis.from_url(redis_url)
+            self.bucket = RedisBucket(client, f"{self.key_prefix}:{vendor_slug}", rate, burst)
+
+    @property
+    def rate(self) -> float:
+        return self.local_bucket.rate
+
+    async def _call(self, method: str, *args):
+        if self.bucket is self.local_bucket:
+            return getattr(self.bucket, method)(time.time(), *args)
+        try:
+            return await sync_to_async(getattr(self.bucket, method), thread_sensitive=False)(time.time(), *args)
+        except redis.RedisError:
+            logger.exception("Shared rate limiter for %s is not available, using local one", self.vendor_slug)
+            self.bucket = self.local_bucket
+            return getattr(self.bucket, method)(time.time(), *args)
+
+    async def acquire(self):
+        while True:
+            wait = await self._call("acquire")
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def on_success(self):
+        self.local_bucket.rate = await self._call("feedback", self.min_rate, self.max_rate, True, 0)
+
+    async def on_too_many_requests(self, retry_after: Optional[float] = None):
+        if retry_after is None:
+            retry_after = DEFAULT_PENALTY
+        self.local_bucket.rate = await self._call("feedback", self.min_rate, self.max_rate, False, retry_after)
+        logger.info("Too many requests for %s, slowing down to %.2f req/s", self.vendor_slug, self.rate)
@@ -1,4 +1,7 @@
+import datetime
+
 from django.db import transaction
+from django.utils.functional import cached_property
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework_recursive.fields import RecursiveField
@@ -83,6 +86,15 @@ class SimpleProductSerializer(serializers.ModelSerializer):
             return image.image
 
 
+def get_last_ordered_child(children):
+    """Return the serialized inventory child ordered most recently, children never ordered come last"""
+    return max(
+        (child for child in children if child["is_inventory"]),
+        key=lambda child: child["last_order_date"] or datetime.date.min,
+        default=None,
+    )
+
+
 class ChildProductV2Serializer(serializers.ModelSerializer):
     vendor = VendorLiteSerializer()
     category = ProductCategorySerializer()
@@ -127,8 +139,9 @@ class ChildProductV2Serializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         ret = super().to_representation(instance)
 
-        if hasattr(instance, "office_product") and instance.office_product:
-            office_product = instance.office_product[0]
+        if hasattr(instance, "office_product"):
+            # prefetched by the office, an empty list means the office has no such product
+            office_product = instance.office_product[0] if instance.office_product else None
         elif "office_pk" in self.context:
             office_product = instance.office_products.filter(office_id=self.context["office_pk"]).first()
         else:
@@ -138,7 +151,7 @@ class ChildProductV2Serializer(serializers.ModelSerializer):
             ret["product_vendor_status"] = office_product.product_vendor_status
             ret["last_order_date"] = office_product.last_order_date
             ret["last_order_price"] = office_product.last_order_price
-            ret["last_order_vendor"] = office_product.product.vendor_id
+            ret["last_order_vendor"] = instance.vendor_id
             ret["nickname"] = office_product.nickname
             # ret["image_url"] = instance.office_product[0].image_url
 
@@ -191,22 +204,11 @@ class ProductV2Serializer(serializers.ModelSerializer):
         ret = super().to_representation(instance)
         ret["description"] = instance.description
 
-        children = ret["children"]
-
-        if children:
-            last_order_dates = sorted(
-                [
-                    (child["last_order_date"], child["last_order_price"], child["last_order_vendor"])
-                    for child in children
-                    if child["is_inventory"]
-                ],
-                key=lambda x: x[0],
-                reverse=True,
-            )
-            if last_order_dates:
-                ret["last_order_date"] = last_order_dates[0][0]
-                ret["last_order_price"] = last_order_dates[0][1]
-                ret["last_order_vendor"] = last_order_dates[0][2]
+        last_ordered_child = get_last_ordered_child(ret["children"])
+        if last_ordered_child:
+            ret["last_order_date"] = last_ordered_child["last_order_date"]
+            ret["last_order_price"] = last_ordered_child["last_order_price"]
+            ret["last_order_vendor"] = last_ordered_child["last_order_vendor"]
         return ret
 
 
@@ -347,6 +349,14 @@ class VendorOrderSerializer(serializers.ModelSerializer):
         return data
 
 
+class VendorOrderPlacementSerializer(serializers.ModelSerializer):
+    vendor = serializers.CharField(source="vendor.slug")
+
+    class Meta:
+        model = m.VendorOrder
+        fields = ("id", "vendor", "vendor_order_id", "status", "placement_status", "placement_error")
+
+
 class OrderSerializer(serializers.ModelSerializer):
     vendor_orders = VendorOrderSerializer(many=True)
 
@@ -501,6 +511,42 @@ class CartSerializer(serializers.ModelSerializer):
         return ret
 
 
+class CheckoutCartSerializer(serializers.ModelSerializer):
+    """
+    Read-only cart serializer for the checkout summary, it expects the queryset of get_cart
+    with the product, vendor, category and promotion selected, images and sibling products prefetched
+    and updated_unit_price and item_inventory annotated
+    """
+
+    product = ProductSerializer(read_only=True)
+    promotion = PromotionSerializer(read_only=True)
+    updated_unit_price = serializers.DecimalField(decimal_places=2, max_digits=10, read_only=True)
+    item_inventory = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = m.Cart
+        fields = (
+            "id",
+            "office",
+            "product",
+            "quantity",
+            "unit_price",
+            "updated_unit_price",
+            "item_inventory",
+            "save_for_later",
+            "instant_checkout",
+            "promotion",
+            "budget_spend_type",
+        )
+
+    def to_representation(self, instance):
+        ret = super().to_representation(instance)
+        parent = instance.product.parent
+        sibling_products = [o for o in parent.children.all() if o.id != instance.product_id] if parent else []
+        ret["sibling_products"] = ChildProductV2Serializer(sibling_products, many=True).data
+        return ret
+
+
 class OfficeCheckoutStatusUpdateSerializer(serializers.Serializer):
     checkout_status = serializers.ChoiceField(choices=m.OfficeCheckoutStatus.CHECKOUT_STATUS.choices)
 
@@ -542,8 +588,14 @@ class OfficeProductSerializer(serializers.ModelSerializer):
         if hasattr(office_product, "last_quantity_ordered"):
             return office_product.last_quantity_ordered
         else:
-            quantity_ordered = office_product.product.vendororderproduct_set.order_by("-updated_at").first()
-            return quantity_ordered.quantity if quantity_ordered else 0
+            quantity_ordered = (
+                m.OfficeProductOrderSummary.objects.filter(
+                    office_id=office_product.office_id, product_id=office_product.product_id
+                )
+                .values_list("last_quantity_ordered", flat=True)
+                .first()
+            )
+            return quantity_ordered or 0
 
     def custom_quantity_on_hand(self, office_product):
         """
@@ -610,30 +662,41 @@ class OfficeProductSerializer(serializers.ModelSerializer):
 
         return instance
 
+    @cached_property
+    def category_serializer(self):
+        # built once and shared by every office product of a list, binding fields per item is costly
+        return OfficeProductCategorySerializer()
+
+    @cached_property
+    def product_serializer(self):
+        return ProductV2Serializer(context=self.context)
+
     def to_representation(self, instance):
         ret = super().to_representation(instance)
-        ret["office_product_category"] = OfficeProductCategorySerializer(instance.office_product_category).data
-        ret["product"] = ProductV2Serializer(instance.product.parent, context=self.context).data
+        office_product_category = instance.office_product_category
+        ret["office_product_category"] = (
+            self.category_serializer.to_representation(office_product_category)
+            if office_product_category
+            else OfficeProductCategorySerializer(office_product_category).data
+        )
+        parent = instance.product.parent
+        ret["product"] = (
+            self.product_serializer.to_representation(parent)
+            if parent
+            else ProductV2Serializer(parent, context=self.context).data
+        )
 
         if ret["is_inventory"]:
             if ret["product"]["vendor"]:
                 ret["last_order_vendor"] = ret["product"]["vendor"]["id"]
             else:
-                last_order_products = sorted(
-                    [
-                        (child["last_order_date"], child["last_order_price"], child["vendor"]["id"], child["id"])
-                        for child in ret["product"]["children"]
-                        if child["is_inventory"]
-                    ],
-                    key=lambda x: x[0],
-                    reverse=True,
-                )
-                if last_order_products:
-                    ret["last_order_date"] = last_order_products[0][0]
-                    ret["last_order_price"] = last_order_products[0][1]
-                    ret["last_order_vendor"] = last_order_products[0][2]
+                last_ordered_child = get_last_ordered_child(ret["product"]["children"])
+                if last_ordered_child:
+                    ret["last_order_date"] = last_ordered_child["last_order_date"]
+                    ret["last_order_price"] = last_ordered_child["last_order_price"]
+                    ret["last_order_vendor"] = last_ordered_child["vendor"]["id"]
                     # this is a little complicated
-                    ret["product"]["id"] = last_order_products[0][3]
+                    ret["product"]["id"] = last_ordered_child["id"]
                 else:
                     ret["last_order_date"] = None
                     ret["last_order_price"] = None
@@ -715,6 +778,8 @@ class VendorProductSearchSerializer(serializers.Serializer):
 
 class ProductPriceRequestSerializer(serializers.Serializer):
     products = serializers.ListField(child=serializers.IntegerField())
+    # return product_ids, prices and product_vendor_statuses lists instead of a dict per product
+    columnar = serializers.BooleanField(default=False)
 
 
 class VendorOrderReturnSerializer(serializers.Serializer):
@@ -0,0 +1,183 @@
+import logging
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+from apps.common.similarity import ProductTokens, similarity_from_sets, tokenize_name
+
+logger = logging.getLogger(__name__)
+
+ProductID = Hashable
+
+
+def get_pair_similarity(tokens: ProductTokens, other_tokens: ProductTokens) -> float:
+    """Faster version of get_tokens_similarity for the most common case of comparing two products"""
+    total_words = len(tokens.words | other_tokens.words)
+    words_ratio = len(tokens.words & other_tokens.words) / total_words if total_words else 0
+    total_numeric_values = len(tokens.numeric_values | other_tokens.numeric_values)
+    if total_numeric_values:
+        return (
+            0.4 * words_ratio + 0.6 * len(tokens.numeric_values & other_tokens.numeric_values) / total_numeric_values
+        )
+    return words_ratio
+
+
+class _Group:
+    """Union-find node state, keeps the running intersection/union of the members tokens"""
+
+    __slots__ = ("vendors", "size", "matched_words", "total_words", "matched_numeric_values", "total_numeric_values")
+
+    def __init__(self, vendor, tokens: ProductTokens):
+        self.vendors = frozenset([vendor])
+        self.size = 1
+        self.matched_words = tokens.words
+        self.total_words = tokens.words
+        self.matched_numeric_values = tokens.numeric_values
+        self.total_numeric_values = tokens.numeric_values
+
+    def merged_similarity(self, other: "_Group") -> float:
+        return similarity_from_sets(
+            self.matched_words & other.matched_words,
+            self.total_words | other.total_words,
+            self.matched_numeric_values & other.matched_numeric_values,
+            self.total_numeric_values | other.total_numeric_values,
+        )
+
+    def absorb(self, other: "_Group"):
+        self.vendors |= other.vendors
+        self.size += other.size
+        self.matched_words &= other.matched_words
+        self.total_words |= other.total_words
+        self.matched_numeric_values &= other.matched_numeric_values
+        self.total_numeric_values |= other.total_numeric_values
+
+
+class ProductGroupingEngine:
+    """
+    Group similar products from different vendors by name.
+
+    Names are tokenized once and indexed per vendor (token -> product ids). Only pairs of products
+    from different vendors which share at least one rare token are scored, so the work is roughly
+    proportional to the number of products instead of the product of the vendors catalog sizes.
+    Pairs above the threshold are merged, best pair first, with union-find. A merge is accepted only
+    when the groups have no vendor in common and the merged group is still similar enough,
+    i.e. the similarity of n products must be above threshold ** (n - 1) like the previous algorithm.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.7,
+        max_token_frequency: float = 0.05,
+        min_token_frequency_cap: int = 50,
+    ):
+        """
+        threshold: minimum similarity for a pair of products
+        max_token_frequency: tokens that appear in more than this ratio of products are not used
+                             for finding candidates (they are still used for scoring)
+        min_token_frequency_cap: never treat a token as frequent if it appears in less products than this
+        """
+        self.threshold = threshold
+        self.max_token_frequency = max_token_frequency
+        self.min_token_frequency_cap = min_token_frequency_cap
+        self.tokens: Dict[ProductID, ProductTokens] = {}
+        self.vendors: Dict[ProductID, Hashable] = {}
+
+    def add_product(self, product_id: ProductID, vendor: Hashable, name: str):
+        self.tokens[product_id] = tokenize_name(name or "")
+        self.vendors[product_id] = vendor
+
+    def add_products(self, products: Iterable[Tuple[ProductID, Hashable, str]]):
+        for product_id, vendor, name in products:
+            self.add_product(product_id, vendor, name)
+
+    def _build_index(self) -> Dict[Hashable, Dict[str, List[ProductID]]]:
+        document_frequency: Dict[str, int] = defaultdict(int)
+        for tokens in self.tokens.values():
+            for token in tokens.all:
+                document_frequency[token] += 1
+
+        max_frequency = max(self.min_token_frequency_cap, int(len(self.tokens) * self.max_token_frequency))
+        index: Dict[Hashable, Dict[str, List[ProductID]]] = defaultdict(lambda: defaultdict(list))
+        for product_id, tokens in self.tokens.items():
+            vendor = self.vendors[product_id]
+            for token in tokens.all:
+                if document_frequency[token] <= max_frequency:
+                    index[vendor][token].append(product_id)
+        return index
+
+    def get_candidate_pairs(self) -> List[Tuple[float, ProductID, ProductID]]:
+        """Return (similarity, product_id, product_id) for every cross-vendor pair above the threshold"""
+        index = self._build_index()
+        vendors = list(index.keys())
+        scored_pairs = []
+        for i, vendor in enumerate(vendors):
+            for other_vendor in vendors[i + 1 :]:
+                vendor_index, other_vendor_index = index[vendor], index[other_vendor]
+                candidates: Dict[ProductID, set] = defaultdict(set)
+                for token, product_ids in vendor_index.items():
+                    other_product_ids = other_vendor_index.get(token)
+                    if not other_product_ids:
+                        continue
+                    for product_id in product_ids:
+                        candidates[product_id].update(other_product_ids)
+
+                for product_id, other_product_ids in candidates.items():
+                    tokens = self.tokens[product_id]
+                    for other_product_id in other_product_ids:
+                        similarity = get_pair_similarity(tokens, self.tokens[other_product_id])
+                        if similarity > self.threshold:
+                            scored_pairs.append((similarity, product_id, other_product_id))
+        return scored_pairs
+
+    def group(self) -> List[List[ProductID]]:
+        groups: Dict[ProductID, _Group] = {}
+        parents: Dict[ProductID, ProductID] = {}
+
+        def find(product_id: ProductID) -> ProductID:
+            root = product_id
+            while parents[root] != root:
+                root = parents[root]
+            while parents[product_id] != root:
+                parents[product_id], product_id = root, parents[product_id]
+            return root
+
+        scored_pairs = self.get_candidate_pairs()
+        scored_pairs.sort(key=lambda x: x[0], reverse=True)
+        for similarity, product_id, other_product_id in scored_pairs:
+            for pid in (product_id, other_product_id):
+                if pid not in parents:
+                    parents[pid] = pid
+                    groups[pid] = _Group(self.vendors[pid], self.tokens[pid])
+
+            root, other_root = find(product_id), find(other_product_id)
+            if root == other_root:
+                continue
+
+            group, other_group = groups[root], groups[other_root]
+            if group.vendors & other_group.vendors:
+                continue
+
+            merged_size = group.size + other_group.size
+            if merged_size > 2 and group.merged_similarity(other_group) <= self.threshold ** (merged_size - 1):
+                continue
+
+            if group.size < other_group.size:
+                root, other_root = other_root, root
+                group, other_group = other_group, group
+            parents[other_root] = root
+            group.absorb(other_group)
+            del groups[other_root]
+            logger.debug("%.2f: merged %s and %s", similarity, product_id, other_product_id)
+
+        members: Dict[ProductID, List[ProductID]] = defaultdict(list)
+        for product_id in parents:
+            members[find(product_id)].append(product_id)
+        return [product_ids for product_ids in members.values() if len(product_ids) > 1]
+
+
+def group_products_by_name(
+    products: Iterable[Tuple[ProductID, Hashable, str]], threshold: float = 0.7
+) -> List[List[ProductID]]:
+    """products: iterable of (product id, vendor, product name)"""
+    engine = ProductGroupingEngine(threshold=threshold)
+    engine.add_products(products)
+    return engine.group()
@@ -1,4 +1,6 @@
+from collections import defaultdict
 from decimal import Decimal
+from typing import Dict, List
 
 from asgiref.sync import async_to_sync, sync_to_async
 from django.db import transaction
@@ -58,8 +60,8 @@ class OrderService:
         products = await OrderService.get_vendor_order_products(vendor_order, validated_data)
 
         if products:
-            perform_real_order.delay([vendor_order.id])
             vendor_order.status = OrderStatus.OPEN
+            vendor_order.placement_status = VendorOrder.PlacementStatus.PENDING
         else:
             vendor_order.status = OrderStatus.CLOSED
 
@@ -69,6 +71,8 @@ class OrderService:
         await sync_to_async(vendor_order.save)()
 
         if products:
+            # saved first, so that the placement progress is not overwritten
+            perform_real_order.delay([vendor_order.id])
             # TODO: this logics should be refactored
             notify_order_creation.delay([vendor_order.id], approval_needed=False)
 
@@ -119,3 +123,39 @@ class OrderService:
             office_budget.office_spend += Decimal(dental_amount[BUDGET_SPEND_TYPE.FRONT_OFFICE_SUPPLY_SPEND_BUDGET])
             office_budget.miscellaneous_spend += Decimal(dental_amount[BUDGET_SPEND_TYPE.MISCELLANEOUS_SPEND_BUDGET])
             office_budget.save()
+
+    @staticmethod
+    def get_checkout_summary(cart_products, office_vendors: List[OfficeVendor]) -> Dict[str, dict]:
+        """
+        Return the order details of every office vendor, computed in one pass over the loaded cart products
+        """
+        totals = defaultdict(lambda: {"subtotal_amount": Decimal(0), "reduction_amount": Decimal(0), "item_count": 0})
+        for cart_product in cart_products:
+            vendor_totals = totals[cart_product.product.vendor_id]
+            vendor_totals["item_count"] += 1
+            if not isinstance(cart_product.unit_price, (int, float, Decimal)):
+                continue
+            price = cart_product.unit_price
+            vendor_totals["subtotal_amount"] += cart_product.quantity * price
+            promotion = cart_product.promotion
+            if promotion is not None and promotion.type == 1 and price > promotion.reduction_price:
+                price -= max(0, promotion.reduction_price)
+            vendor_totals["reduction_amount"] += cart_product.quantity * price
+
+        result = {}
+        for office_vendor in office_vendors:
+            vendor_totals = totals[office_vendor.vendor_id]
+            result[office_vendor.vendor.slug] = {
+                **office_vendor.vendor.to_dict(),
+                "retail_amount": Decimal(0),
+                "savings_amount": Decimal(0),
+                "subtotal_amount": vendor_totals["subtotal_amount"],
+                "shipping_amount": Decimal(0),
+                "tax_amount": Decimal(0),
+                "total_amount": vendor_totals["subtotal_amount"],
+                "payment_method": "",
+                "shipping_address": "",
+                "reduction_amount": vendor_totals["reduction_amount"],
+                "item_count": vendor_totals["item_count"],
+            }
+        return result
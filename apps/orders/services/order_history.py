@@ -0,0 +1,95 @@
+import datetime
+from collections import defaultdict
+from typing import Dict, Iterable, NamedTuple, Optional, Set
+
+from django.db.models import Min
+from django.utils import timezone
+
+from apps.accounts.models import OfficeVendor
+from apps.common.choices import OrderStatus
+from apps.orders.models import VendorOrder as VendorOrderModel
+
+# Orders of the last days before the watermark are requested again, vendors list some orders late
+ORDER_HISTORY_OVERLAP_DAYS = 3
+# Every office vendor requests its full order history once in this period to catch missed changes
+ORDER_HISTORY_RECONCILE_DAYS = 30
+
+
+class OrderHistoryWindow(NamedTuple):
+    # None requests the default history range of the vendor
+    from_date: Optional[datetime.date]
+    to_date: datetime.date
+    completed_order_ids: Set[str]
+    full_reconcile: bool
+
+
+def get_order_history_windows(
+    office_vendors: Iterable[OfficeVendor], full_reconcile: bool = False
+) -> Dict[int, OrderHistoryWindow]:
+    """
+    Find the orders to request from the vendors, by office vendor id. Incremental syncs start from the sync
+    watermark, or from the oldest open order when it is older, so that its status keeps getting updated.
+    The vendor orders of all the office vendors are loaded with two queries.
+    """
+    today = timezone.localtime().date()
+    office_vendors = {
+        (office_vendor.office_id, office_vendor.vendor_id): office_vendor for office_vendor in office_vendors
+    }
+    vendor_orders = VendorOrderModel.objects.filter(
+        order__office_id__in={office_id for office_id, _ in office_vendors},
+        vendor_id__in={vendor_id for _, vendor_id in office_vendors},
+    ).order_by()
+    oldest_open_order_dates = {
+        (row["order__office_id"], row["vendor_id"]): row["order_date"]
+        for row in vendor_orders.filter(status=OrderStatus.OPEN)
+        .values("order__office_id", "vendor_id")
+        .annotate(order_date=Min("order_date"))
+    }
+    completed_order_ids = defaultdict(set)
+    for office_id, vendor_id, vendor_order_id, vendor_order_reference in vendor_orders.filter(
+        status=OrderStatus.CLOSED
+    ).values_list("order__office_id", "vendor_id", "vendor_order_id", "vendor_order_reference"):
+        office_vendor = office_vendors.get((office_id, vendor_id))
+        if office_vendor:
+            completed_order_ids[office_vendor.pk].add(
+                vendor_order_reference if office_vendor.vendor.slug == "henry_schein" else vendor_order_id
+            )
+
+    windows = {}
+    for key, office_vendor in office_vendors.items():
+        synced_on = office_vendor.order_history_synced_on
+        reconciled_on = office_vendor.order_history_reconciled_on
+        office_vendor_full_reconcile = (
+            full_reconcile
+            or synced_on is None
+            or reconciled_on is None
+            or (today - reconciled_on).days >= ORDER_HISTORY_RECONCILE_DAYS
+        )
+        from_date = None
+        if not office_vendor_full_reconcile:
+            from_date = synced_on - datetime.timedelta(days=ORDER_HISTORY_OVERLAP_DAYS)
+            oldest_open_order_date = oldest_open_order_dates.get(key)
+            if oldest_open_order_date and oldest_open_order_date < from_date:
+                from_date = oldest_open_order_date
+        windows[office_vendor.pk] = OrderHistoryWindow(
+            from_date=from_date,
+            to_date=today,
+            completed_order_ids=completed_order_ids[office_vendor.pk],
+            full_reconcile=office_vendor_full_reconcile,
+        )
+    return windows
+
+
+def get_order_history_window(office_vendor: OfficeVendor, full_reconcile: bool = False) -> OrderHistoryWindow:
+    return get_order_history_windows([office_vendor], full_reconcile=full_reconcile)[office_vendor.pk]
+
+
+def mark_order_history_synced(office_vendor: OfficeVendor, window: OrderHistoryWindow):
+    """Move the sync watermark after the orders of the window are saved"""
+    fields = {"order_history_synced_on": window.to_date}
+    if window.full_reconcile:
+        fields["order_history_reconciled_on"] = window.to_date
+    # update() skips the post_save signal, the watermark doesn't change the search results of the office
+    OfficeVendor.objects.filter(pk=office_vendor.pk).update(**fields)
+    for field, value in fields.items():
+        setattr(office_vendor, field, value)
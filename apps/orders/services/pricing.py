@@ -0,0 +1,88 @@
+import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, TypedDict
+
+from django.conf import settings
+from django.db.models import (
+    Case,
+    CharField,
+    F,
+    FilteredRelation,
+    Q,
+    QuerySet,
+    Value,
+    When,
+)
+from django.utils import timezone
+
+from apps.orders.models import Product as ProductModel
+from apps.vendor_clients.types import ProductPrice
+
+# Vendors whose product prices are only used while they are not older than the price update cycle
+PRICE_FRESHNESS_CHECKED_VENDORS = ["dental_city"]
+
+
+class ResolvedPrices(TypedDict):
+    """Prices in columns, the values at the same index belong to the same product"""
+
+    product_ids: List[int]
+    prices: List[Optional[Decimal]]
+    product_vendor_statuses: List[str]
+
+
+def get_price_queryset(office_id, product_ids: Iterable[int]) -> QuerySet:
+    """
+    Resolve the effective prices of products for an office in one statement:
+    - formula vendors: the price of the office, only products with an office product have a price
+    - non formula vendors: the product price, while it is fresh for the vendors that check freshness
+    - other vendors: no price, it has to be fetched from the vendor
+    Yields (product id, price, product vendor status) for the products having a price.
+    """
+    fresh_after = timezone.localtime() - datetime.timedelta(days=settings.PRODUCT_PRICE_UPDATE_CYCLE)
+    formula_vendor = Q(vendor__slug__in=settings.FORMULA_VENDORS)
+    recent_vendor_price = (
+        Q(vendor__slug__in=settings.NON_FORMULA_VENDORS)
+        & (
+            ~Q(vendor__slug__in=PRICE_FRESHNESS_CHECKED_VENDORS)
+            # like Product.recent_price, a price without an update time is used
+            | Q(last_price_updated__isnull=True)
+            | Q(last_price_updated__gt=fresh_after)
+        )
+        & Q(price__isnull=False)
+        & ~Q(price=0)
+    )
+    return (
+        ProductModel.objects.filter(id__in=product_ids)
+        .annotate(
+            office_product=FilteredRelation("office_products", condition=Q(office_products__office_id=office_id))
+        )
+        .filter((formula_vendor & Q(office_product__id__isnull=False)) | (~formula_vendor & recent_vendor_price))
+        .annotate(
+            effective_price=Case(When(formula_vendor, then=F("office_product__price")), default=F("price")),
+            effective_product_vendor_status=Case(
+                When(formula_vendor, then=F("office_product__product_vendor_status")),
+                default=Value(""),
+                output_field=CharField(),
+            ),
+        )
+        .order_by()
+        .values_list("id", "effective_price", "effective_product_vendor_status")
+    )
+
+
+async def resolve_prices(office_id, product_ids: Iterable[int]) -> ResolvedPrices:
+    result: ResolvedPrices = {"product_ids": [], "prices": [], "product_vendor_statuses": []}
+    async for product_id, price, product_vendor_status in get_price_queryset(office_id, product_ids):
+        result["product_ids"].append(product_id)
+        result["prices"].append(price)
+        result["product_vendor_statuses"].append(product_vendor_status)
+    return result
+
+
+def to_product_prices(resolved_prices: ResolvedPrices) -> Dict[int, ProductPrice]:
+    return {
+        product_id: {"price": price, "product_vendor_status": product_vendor_status}
+        for product_id, price, product_vendor_status in zip(
+            resolved_prices["product_ids"], resolved_prices["prices"], resolved_prices["product_vendor_statuses"]
+        )
+    }
@@ -0,0 +1,266 @@
+import json
+import logging
+import re
+from typing import Dict, Iterator, List, Optional, Set, TypedDict
+
+import redis
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+
+from apps.common.similarity import EXCLUDED_WORDS, WORD_PATTERN
+from apps.common.utils import batched, get_redis_client
+from apps.orders.models import OfficeProduct as OfficeProductModel
+from apps.orders.models import Product as ProductModel
+from apps.orders.models import ProductImage as ProductImageModel
+from apps.orders.services.search_cache import get_catalog_version
+
+logger = logging.getLogger(__name__)
+
+# Sorted sets with a zero score for every member, so members are ordered lexicographically
+# and ZRANGEBYLEX returns the "<term>\0<product id>" members starting with a prefix
+NAME_INDEX_KEY = "product_suggestion:names"
+PRODUCT_ID_INDEX_KEY = "product_suggestion:product_ids"
+# Hash of product id => serialized suggestion, with the normalized product ids of the product and its children
+PRODUCTS_KEY = "product_suggestion:products"
+# Catalog version the index was built from, products may have been regrouped since it was bumped
+CATALOG_VERSION_KEY = "product_suggestion:catalog_version"
+INDEX_KEYS = (NAME_INDEX_KEY, PRODUCT_ID_INDEX_KEY, PRODUCTS_KEY, CATALOG_VERSION_KEY)
+BUILDING_KEY_SUFFIX = ":building"
+
+# Members of a prefix are read in batches, a prefix matching more products than MAX_CANDIDATES
+# only ranks the first ones, the office inventory products are always ranked
+CANDIDATES_BATCH_SIZE = 1000
+MAX_CANDIDATES = 5000
+BUILD_BATCH_SIZE = 5000
+PRODUCT_ID_PATTERN = re.compile(r"[\s\-./]+")
+
+
+class ProductSuggestion(TypedDict):
+    id: int
+    name: str
+    image: Optional[str]
+    is_inventory: bool
+
+
+def normalize_product_id(product_id: str) -> str:
+    """Lowercase the product id and strip separators, so that 1234-567, 1234 567 and 1234567 match each other"""
+    return PRODUCT_ID_PATTERN.sub("", product_id.lower())
+
+
+def get_name_terms(name: str) -> Set[str]:
+    return {word for word in WORD_PATTERN.findall(name.lower()) if word not in EXCLUDED_WORDS}
+
+
+def _member(term: str, product_id: int) -> str:
+    return f"{term}\0{product_id}"
+
+
+def _prefix_range(prefix: str):
+    prefix = prefix.encode()
+    # utf-8 never contains \xff, it sorts after every member starting with the prefix
+    return b"[" + prefix, b"[" + prefix + b"\xff"
+
+
+def _product_id_from_member(member: bytes) -> int:
+    return int(member.rsplit(b"\0", 1)[1])
+
+
+def _get_prefix_product_ids(client: redis.Redis, key: str, prefix: str) -> Set[int]:
+    product_ids = set()
+    for start in range(0, MAX_CANDIDATES, CANDIDATES_BATCH_SIZE):
+        members = client.zrangebylex(key, *_prefix_range(prefix), start=start, num=CANDIDATES_BATCH_SIZE)
+        product_ids.update(_product_id_from_member(member) for member in members)
+        if len(members) < CANDIDATES_BATCH_SIZE:
+            break
+    return product_ids
+
+
+def _matches_name(name: str, terms: List[str]) -> bool:
+    name_terms = get_name_terms(name)
+    return all(any(name_term.startswith(term) for name_term in name_terms) for term in terms)
+
+
+def _iter_suggestion_batches(batch_size: int) -> Iterator[List[dict]]:
+    """Yield the parent products with their children product ids and image, in batches ordered by id"""
+    last_id = 0
+    while True:
+        products = list(
+            ProductModel.objects.filter(parent__isnull=True, id__gt=last_id)
+            .order_by("id")
+            .values("id", "name", "product_id")[:batch_size]
+        )
+        if not products:
+            return
+        last_id = products[-1]["id"]
+        product_ids = [product["id"] for product in products]
+
+        children_product_ids: Dict[int, Set[str]] = {}
+        for parent_id, product_id in ProductModel.objects.filter(parent_id__in=product_ids).values_list(
+            "parent_id", "product_id"
+        ):
+            if product_id:
+                children_product_ids.setdefault(parent_id, set()).add(product_id)
+
+        # parent products don't have images, use the first image of their children like SimpleProductSerializer
+        images: Dict[int, str] = {}
+        for product_id, image in (
+            ProductImageModel.objects.filter(Q(product_id__in=product_ids) | Q(product__parent_id__in=product_ids))
+            .order_by("id")
+            .values_list(Coalesce("product__parent_id", "product_id"), "image")
+        ):
+            images.setdefault(product_id, image)
+
+        for product in products:
+            product["children_product_ids"] = children_product_ids.get(product["id"], set())
+            product["image"] = images.get(product["id"])
+        yield products
+
+
+def build_suggestion_index(redis_url: Optional[str] = None, batch_size: int = BUILD_BATCH_SIZE) -> int:
+    """
+    Rebuild the autocomplete index of parent products, return the number of indexed products.
+    The index is written to temporary keys and swapped in at once, suggestions keep working during the build.
+    """
+    redis_url = redis_url or settings.REDIS_URL
+    if not redis_url:
+        return 0
+
+    client = get_redis_client(redis_url)
+    building_keys = [key + BUILDING_KEY_SUFFIX for key in INDEX_KEYS]
+    client.delete(*building_keys)
+    name_index_key, product_id_index_key, products_key, catalog_version_key = building_keys
+    # read before the products, a regrouping during the build leaves the index stale
+    catalog_version = get_catalog_version()
+
+    total = 0
+    for products in _iter_suggestion_batches(batch_size):
+        name_members, product_id_members, suggestions = {}, {}, {}
+        for product in products:
+            for term in get_name_terms(product["name"]):
+                name_members[_member(term, product["id"])] = 0
+            product_ids = {product["product_id"], *product["children_product_ids"]} - {None}
+            product_ids = {normalize_product_id(product_id) for product_id in product_ids} - {""}
+            for product_id in product_ids:
+                product_id_members[_member(product_id, product["id"])] = 0
+            suggestions[product["id"]] = json.dumps(
+                {"name": product["name"], "image": product["image"], "product_ids": sorted(product_ids)}
+            )
+
+        pipeline = client.pipeline(transaction=False)
+        if name_members:
+            pipeline.zadd(name_index_key, name_members)
+        if product_id_members:
+            pipeline.zadd(product_id_index_key, product_id_members)
+        pipeline.hset(products_key, mapping=suggestions)
+        pipeline.execute()
+        total += len(products)
+    if catalog_version is not None:
+        client.set(catalog_version_key, catalog_version)
+
+    pipeline = client.pipeline()
+    for building_key, key in zip(building_keys, INDEX_KEYS):
+        if client.exists(building_key):
+            pipeline.rename(building_key, key)
+        else:
+            pipeline.delete(key)
+    pipeline.execute()
+    logger.info("Indexed %s products for suggestions", total)
+    return total
+
+
+def get_inventory_product_ids(office_id) -> Set[int]:
+    """Parent ids of the office inventory products, inventory children make their parent an inventory product"""
+    return set(
+        OfficeProductModel.objects.filter(office_id=office_id, is_inventory=True).values_list(
+            Coalesce("product__parent_id", "product_id"), flat=True
+        )
+    )
+
+
+def get_parent_product_ids(product_ids: List[int]) -> Set[int]:
+    return set(ProductModel.objects.filter(id__in=product_ids, parent__isnull=True).values_list("id", flat=True))
+
+
+def suggest_products(search: str, office_id=None, limit: int = 5) -> Optional[List[ProductSuggestion]]:
+    """
+    Suggest parent products whose name words start with the search words or whose product id, or one of their
+    children product ids, starts with the search. Office inventory products come first, then product id matches
+    and shorter names. Returns None when the index is not available so that the caller can search the database.
+
+    The candidates are the products of the most selective search word, the other words are matched on their names.
+    """
+    redis_url = settings.REDIS_URL
+    if not redis_url:
+        return None
+
+    terms = sorted(get_name_terms(search or ""))
+    product_id = normalize_product_id(search or "")
+    if not terms and not product_id:
+        return []
+
+    client = get_redis_client(redis_url)
+    try:
+        pipeline = client.pipeline(transaction=False)
+        pipeline.exists(PRODUCTS_KEY)
+        pipeline.get(CATALOG_VERSION_KEY)
+        for term in terms:
+            pipeline.zlexcount(NAME_INDEX_KEY, *_prefix_range(term))
+        index_exists, index_catalog_version, *term_counts = pipeline.execute()
+        if not index_exists:
+            return None
+
+        candidate_ids = set()
+        if terms and min(term_counts):
+            most_selective_term = min(zip(term_counts, terms))[1]
+            candidate_ids |= _get_prefix_product_ids(client, NAME_INDEX_KEY, most_selective_term)
+        if product_id:
+            candidate_ids |= _get_prefix_product_ids(client, PRODUCT_ID_INDEX_KEY, product_id)
+        inventory_product_ids = get_inventory_product_ids(office_id) if office_id else set()
+        candidate_ids = list(candidate_ids | inventory_product_ids)
+        if not candidate_ids:
+            return []
+        serialized_suggestions = client.hmget(PRODUCTS_KEY, candidate_ids)
+    except redis.RedisError:
+        logger.exception("Could not read product suggestions")
+        return None
+
+    suggestions = []
+    product_id_match_ids = set()
+    for candidate_id, serialized in zip(candidate_ids, serialized_suggestions):
+        if not serialized:
+            continue
+        suggestion = json.loads(serialized)
+        if product_id and any(
+            candidate_product_id.startswith(product_id) for candidate_product_id in suggestion.get("product_ids", [])
+        ):
+            product_id_match_ids.add(candidate_id)
+        elif not (terms and _matches_name(suggestion["name"], terms)):
+            continue
+        suggestions.append(
+            {
+                "id": candidate_id,
+                "name": suggestion["name"],
+                "image": suggestion["image"],
+                "is_inventory": candidate_id in inventory_product_ids,
+            }
+        )
+    suggestions.sort(
+        key=lambda suggestion: (
+            not suggestion["is_inventory"],
+            suggestion["id"] not in product_id_match_ids,
+            len(suggestion["name"]),
+            suggestion["id"],
+        )
+    )
+
+    if index_catalog_version is not None and int(index_catalog_version) == get_catalog_version():
+        return suggestions[:limit]
+    # products were regrouped since the index was built, the deleted parents are dropped
+    parent_suggestions = []
+    for batch in batched(suggestions, limit):
+        parent_product_ids = get_parent_product_ids([suggestion["id"] for suggestion in batch])
+        parent_suggestions.extend(suggestion for suggestion in batch if suggestion["id"] in parent_product_ids)
+        if len(parent_suggestions) >= limit:
+            break
+    return parent_suggestions[:limit]
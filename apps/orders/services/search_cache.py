@@ -0,0 +1,112 @@
+import hashlib
+import json
+import logging
+from typing import List, Optional, TypedDict
+
+from django.core.cache import cache
+from django.db.models import QuerySet
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_TTL = 5 * 60
+# Longer results are cached partially, pages after them are searched in the database
+MAX_CACHED_PRODUCTS = 1000
+CATALOG_VERSION_KEY = "product_search:catalog_version"
+OFFICE_VERSION_KEY = "product_search:office_version:{office_id}"
+
+
+class CachedSearchResult(TypedDict):
+    product_ids: List[int]
+    # False when the search has more results than product_ids
+    complete: bool
+
+
+def _bump_version(key: str):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+    except Exception:
+        logger.exception("Could not invalidate search results with %s", key)
+
+
+def bump_catalog_version():
+    """Invalidate the cached search results of all the offices, call it after products are added or regrouped"""
+    _bump_version(CATALOG_VERSION_KEY)
+
+
+def get_catalog_version() -> Optional[int]:
+    """The version bumped by bump_catalog_version, None when the cache is not available"""
+    try:
+        return cache.get(CATALOG_VERSION_KEY, 0)
+    except Exception:
+        logger.exception("Could not read the catalog version")
+        return None
+
+
+def bump_office_version(office_id: int):
+    """Invalidate the cached search results of one office, e.g. after its vendors changed"""
+    _bump_version(OFFICE_VERSION_KEY.format(office_id=office_id))
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class ProductSearchCache:
+    """
+    Ordered parent product ids of a ProductV2ViewSet search.
+
+    The key contains the catalog and the office versions, bumping one of them makes the older entries unreachable
+    and they expire after SEARCH_CACHE_TTL. Errors of the cache backend are logged and treated as a cache miss.
+    """
+
+    key_prefix = "product_search"
+
+    def __init__(
+        self,
+        office_id: int,
+        query: str,
+        vendors: Optional[str] = None,
+        price_from=None,
+        price_to=None,
+        selected_products: Optional[List[str]] = None,
+    ):
+        self.office_id = office_id
+        params = {
+            "query": normalize_query(query),
+            "vendors": sorted(vendors.split(",")) if vendors else [],
+            "price_from": str(price_from) if price_from not in (None, -1) else None,
+            "price_to": str(price_to) if price_to not in (None, -1) else None,
+            "selected_products": sorted(selected_products or []),
+        }
+        self.digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    def get_key(self) -> str:
+        office_version_key = OFFICE_VERSION_KEY.format(office_id=self.office_id)
+        versions = cache.get_many([CATALOG_VERSION_KEY, office_version_key])
+        catalog_version = versions.get(CATALOG_VERSION_KEY, 0)
+        office_version = versions.get(office_version_key, 0)
+        return f"{self.key_prefix}:{self.office_id}:{catalog_version}:{office_version}:{self.digest}"
+
+    def get(self) -> Optional[CachedSearchResult]:
+        try:
+            return cache.get(self.get_key())
+        except Exception:
+            logger.exception("Could not read cached search result")
+            return None
+
+    def set_from_queryset(self, queryset: QuerySet) -> CachedSearchResult:
+        """Cache the ordered ids of the queryset, it only runs the query without loading the products"""
+        return self.set(list(queryset.values_list("id", flat=True)[: MAX_CACHED_PRODUCTS + 1]))
+
+    def set(self, product_ids: List[int]) -> CachedSearchResult:
+        result = {
+            "product_ids": product_ids[:MAX_CACHED_PRODUCTS],
+            "complete": len(product_ids) <= MAX_CACHED_PRODUCTS,
+        }
+        try:
+            cache.set(self.get_key(), result, timeout=SEARCH_CACHE_TTL)
+        except Exception:
+            logger.exception("Could not cache search result")
+        return result
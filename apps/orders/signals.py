@@ -1,8 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from apps.accounts.models import OfficeVendor
 from apps.orders.models import VendorOrder
+from apps.orders.services.search_cache import bump_office_version
 
 
 @receiver(post_save, sender=VendorOrder)
@@ -11,3 +12,9 @@ def create_vendor_order(sender, instance, created, **kwargs):
         office_vendor = OfficeVendor.objects.filter(office=instance.order.office, vendor=instance.vendor).first()
         instance.shipping_option = office_vendor.default_shipping_option
         instance.save()
+
+
+@receiver(post_save, sender=OfficeVendor)
+@receiver(post_delete, sender=OfficeVendor)
+def invalidate_office_search_results(sender, instance, **kwargs):
+    bump_office_version(instance.office_id)
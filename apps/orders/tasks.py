@@ -1,9 +1,11 @@
 import asyncio
 import datetime
 import logging
+import time
 from asyncio import Semaphore
+from collections import defaultdict
 from decimal import Decimal
-from typing import List, Optional
+from typing import Dict, List
 
 from aiohttp import ClientSession, ClientTimeout
 from asgiref.sync import sync_to_async
@@ -16,7 +18,6 @@ from slugify import slugify
 
 from apps.accounts.models import CompanyMember, OfficeVendor, Subscription, User
 from apps.audit.models import OrderTasks
-from apps.common.choices import OrderStatus
 from apps.common.utils import group_products
 from apps.notifications.models import Notification
 from apps.orders.helpers import OrderHelper, ProductHelper
@@ -29,6 +30,12 @@ from apps.orders.models import ProductCategory
 from apps.orders.models import ProductImage as ProductImageModel
 from apps.orders.models import VendorOrder as VendorOrderModel
 from apps.orders.models import VendorOrderProduct as VendorOrderProductModel
+from apps.orders.services.order_history import (
+    OrderHistoryWindow,
+    get_order_history_windows,
+    mark_order_history_synced,
+)
+from apps.orders.services.product_suggestion import build_suggestion_index
 from apps.scrapers.errors import VendorAuthenticationFailed
 from apps.scrapers.schema import Product as ProductDataClass
 from apps.scrapers.scraper_factory import ScraperFactory
@@ -38,6 +45,10 @@ from promotions import PROMOTION_MAP
 
 logger = logging.getLogger(__name__)
 
+# Office vendors of the same vendor synced at the same time, vendor sites limit parallel sessions differently
+DEFAULT_VENDOR_SYNC_CONCURRENCY = 2
+VENDOR_SYNC_CONCURRENCY = {"net_32": 4}
+
 
 @app.task
 def update_office_cart_status():
@@ -315,83 +326,78 @@ def notify_order_creation(vendor_order_ids, approval_needed):
 
 async def _sync_with_vendor(
     sem: Semaphore,
-    session: ClientSession,
     office_vendor: OfficeVendor,
-    completed_vendor_order_ids: List[str],
-    from_date: Optional[datetime.date],
-    to_date: Optional[datetime.date],
+    window: OrderHistoryWindow,
 ):
-    scraper = ScraperFactory.create_scraper(
-        vendor=office_vendor.vendor,
-        session=session,
-        username=office_vendor.username,
-        password=office_vendor.password,
-    )
-
-    if not hasattr(scraper, "get_orders"):
-        return
-
     if not sem:
         sem = fake_semaphore
 
-    async with sem:
-        results = await scraper.get_orders(
-            office=office_vendor.office,
-            perform_login=True,
-            from_date=from_date,
-            to_date=to_date,
-            completed_order_ids=completed_vendor_order_ids,
+    # every office vendor logs in with its own account, so it gets its own cookies
+    async with sem, ClientSession(timeout=ClientTimeout(30)) as session:
+        scraper = ScraperFactory.create_scraper(
+            vendor=office_vendor.vendor,
+            session=session,
+            username=office_vendor.username,
+            password=office_vendor.password,
         )
 
-    return results
-
+        if not hasattr(scraper, "get_orders"):
+            return
 
-@sync_to_async
-def get_vendor_orders_id_and_last_processing_order_date(office_vendor):
-    vendor_orders = VendorOrderModel.objects.select_related("vendor", "order__office").filter(
-        order__office=office_vendor.office,
-        vendor=office_vendor.vendor,
-    )
+        async with scraper.batch_order_saving(office_vendor.office):
+            results = await scraper.get_orders(
+                office=office_vendor.office,
+                perform_login=True,
+                from_date=window.from_date,
+                to_date=window.to_date,
+                completed_order_ids=window.completed_order_ids,
+            )
+    if scraper.failed_order_count:
+        # the failed orders are requested again by the next sync
+        logger.warning("%s orders of office vendor %s failed to sync", scraper.failed_order_count, office_vendor.id)
+    else:
+        await sync_to_async(mark_order_history_synced)(office_vendor, window)
 
-    order_id_field = "vendor_order_reference" if office_vendor.vendor.slug == "henry_schein" else "vendor_order_id"
-    completed_vendor_order_ids = list(
-        vendor_orders.filter(status=OrderStatus.CLOSED).values_list(order_id_field, flat=True)
-    )
-    return (
-        completed_vendor_order_ids,
-        vendor_orders.filter(status=OrderStatus.OPEN).order_by("order_date").first(),
-    )
+    return results
 
 
-async def _sync_with_vendors(office_vendors):
-    sem = Semaphore(value=2)
-    today = datetime.date.today()
-    tasks = []
-    async with ClientSession(timeout=ClientTimeout(30)) as session:
-        for office_vendor in office_vendors:
-            (
-                completed_vendor_order_ids,
-                last_processing_vendor_order,
-            ) = await get_vendor_orders_id_and_last_processing_order_date(office_vendor)
-            tasks.append(
-                _sync_with_vendor(
-                    sem=sem,
-                    session=session,
-                    office_vendor=office_vendor,
-                    completed_vendor_order_ids=completed_vendor_order_ids,
-                    from_date=last_processing_vendor_order.order_date if last_processing_vendor_order else None,
-                    to_date=today,
-                )
-            )
+async def _sync_with_vendors(office_vendors: List[OfficeVendor], windows: Dict[int, OrderHistoryWindow], concurrency):
+    sem = Semaphore(value=concurrency)
+    tasks = (_sync_with_vendor(sem=sem, office_vendor=ov, window=windows[ov.pk]) for ov in office_vendors)
+    return await asyncio.gather(*tasks, return_exceptions=True)
 
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        invalid_credentials_office_vendors = [
-            result for result in results if type(result) == VendorAuthenticationFailed
-        ]
 
-    if invalid_credentials_office_vendors:
-        # send email notification
-        pass
+@app.task
+def sync_vendor_orders(vendor_slug, office_vendor_ids):
+    """
+    Sync the orders of the office vendors of one vendor,
+    returns the number of synced and failed office vendors for monitoring
+    """
+    office_vendors = list(
+        OfficeVendor.objects.select_related("office", "vendor").filter(
+            vendor__slug=vendor_slug, id__in=office_vendor_ids
+        )
+    )
+    windows = get_order_history_windows(office_vendors)
+    concurrency = VENDOR_SYNC_CONCURRENCY.get(vendor_slug, DEFAULT_VENDOR_SYNC_CONCURRENCY)
+
+    started_at = time.monotonic()
+    results = asyncio.run(_sync_with_vendors(office_vendors, windows, concurrency))
+    elapsed = time.monotonic() - started_at
+
+    for office_vendor, result in zip(office_vendors, results):
+        if isinstance(result, Exception):
+            logger.warning("Syncing orders of office vendor %s failed: %r", office_vendor.id, result)
+    failed = sum(isinstance(result, Exception) for result in results)
+    report = {
+        "vendor": vendor_slug,
+        "synced": len(results) - failed,
+        "failed": failed,
+        "authentication_failed": sum(isinstance(result, VendorAuthenticationFailed) for result in results),
+        "seconds": round(elapsed, 1),
+    }
+    logger.info("Synced orders with %s: %s", vendor_slug, report)
+    return report
 
 
 @app.task
@@ -400,10 +406,17 @@ def sync_with_vendors():
     This task is running every day, checking following items
     - check if orders are created on vendor side directly
     - update order status for those created on Ordo
+    Each vendor is synced in its own task, so vendors are spread over the workers
+    and a slow vendor site doesn't hold up the others.
     """
     office_ids = Subscription.actives.select_related("office").values_list("office", flat=True)
-    office_vendors = list(OfficeVendor.objects.select_related("office", "vendor").filter(office_id__in=office_ids))
-    asyncio.run(_sync_with_vendors(office_vendors))
+    office_vendor_ids = defaultdict(list)
+    for office_vendor_id, vendor_slug in OfficeVendor.objects.filter(office_id__in=office_ids).values_list(
+        "id", "vendor__slug"
+    ):
+        office_vendor_ids[vendor_slug].append(office_vendor_id)
+    for vendor_slug, vendor_office_vendor_ids in office_vendor_ids.items():
+        sync_vendor_orders.delay(vendor_slug, vendor_office_vendor_ids)
 
 
 @app.task
@@ -417,6 +430,11 @@ def update_vendor_promotions(vendor_slug):
         ProductHelper.import_promotion_products_from_list(result, vendor_slug=vendor_slug)
 
 
+@app.task
+def rebuild_product_suggestion_index():
+    build_suggestion_index()
+
+
 @app.task
 def update_promotions():
     for vendor_slug in PROMOTION_MAP.keys():
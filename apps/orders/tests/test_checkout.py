@@ -0,0 +1,174 @@
+import asyncio
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.factories import (
+    CompanyFactory,
+    CompanyMemberFactory,
+    OfficeFactory,
+    OfficeVendorFactory,
+    UserFactory,
+    VendorFactory,
+)
+from apps.accounts.models import ShippingMethod
+from apps.orders.factories import ProductFactory
+from apps.orders.models import (
+    Cart,
+    OfficeCheckoutStatus,
+    OfficeProduct,
+    OrderStatus,
+    ProductCategory,
+    ProductImage,
+    Promotion,
+    VendorOrder,
+    VendorOrderProduct,
+)
+from apps.orders.serializers import CheckoutCartSerializer
+from apps.orders.services.order import OrderService
+from apps.orders.views import CartViewSet, get_cart
+
+
+class CheckoutSummaryTests(TestCase):
+    def setUp(self) -> None:
+        self.office = OfficeFactory()
+        self.henry_schein = VendorFactory(slug="henry_schein")
+        self.darby = VendorFactory(slug="darby")
+        self.ground = ShippingMethod.objects.create(name="Ground")
+        OfficeVendorFactory(office=self.office, vendor=self.henry_schein, default_shipping_option=self.ground)
+        OfficeVendorFactory(office=self.office, vendor=self.darby)
+        promotion = Promotion.objects.create(code="SAVE5", type=1, reduction_price=5)
+        category = ProductCategory.objects.create(name="Gloves")
+        self.parent = ProductFactory(vendor=None, category=category)
+
+        for i, (vendor, unit_price, quantity) in enumerate(
+            [(self.henry_schein, "10.00", 2), (self.henry_schein, "4.50", 1), (self.darby, "20.00", 3)]
+        ):
+            product = ProductFactory(vendor=vendor, category=category, parent=self.parent)
+            ProductImage.objects.create(product=product, image=f"https://example.com/{i}.png")
+            OfficeProduct.objects.create(
+                office=self.office, product=product, price=Decimal(unit_price), is_inventory=vendor == self.darby
+            )
+            Cart.objects.create(
+                office=self.office,
+                product=product,
+                quantity=quantity,
+                unit_price=Decimal(unit_price),
+                promotion=promotion if vendor == self.henry_schein else None,
+            )
+
+    def test_checkout_summary(self):
+        cart_products, office_vendors = get_cart(self.office.id)
+        with self.assertNumQueries(0):
+            summary = OrderService.get_checkout_summary(cart_products, office_vendors)
+
+        self.assertEqual(summary["henry_schein"]["subtotal_amount"], Decimal("24.50"))
+        self.assertEqual(summary["henry_schein"]["total_amount"], Decimal("24.50"))
+        # the promotion only applies to the products priced above its reduction
+        self.assertEqual(summary["henry_schein"]["reduction_amount"], Decimal("14.50"))
+        self.assertEqual(summary["henry_schein"]["item_count"], 2)
+        self.assertEqual(summary["darby"]["subtotal_amount"], Decimal("60.00"))
+        self.assertEqual(summary["darby"]["reduction_amount"], Decimal("60.00"))
+        self.assertEqual(summary["darby"]["item_count"], 1)
+
+    def test_checkout_serializer_uses_loaded_cart(self):
+        cart_products, _ = get_cart(self.office.id)
+        with self.assertNumQueries(0):
+            data = CheckoutCartSerializer(cart_products, many=True).data
+        self.assertEqual(len(data), 3)
+        for item in data:
+            self.assertTrue(item["product"]["images"])
+            self.assertEqual(item["product"]["category"]["name"], "Gloves")
+            self.assertIn("description", item["product"])
+            self.assertIn("promotion_description", item["product"])
+            self.assertIn("is_special_offer", item["product"])
+            self.assertEqual(item["item_inventory"], item["product"]["vendor"]["slug"] == "darby")
+            self.assertEqual(len(item["sibling_products"]), 2)
+            self.assertNotIn(item["product"]["id"], [sibling["id"] for sibling in item["sibling_products"]])
+
+    @mock.patch("apps.orders.views.notify_order_creation")
+    @mock.patch("apps.orders.views.fetch_order_history")
+    def test_create_order(self, fetch_order_history, notify_order_creation):
+        view = CartViewSet()
+        view.kwargs = {"office_pk": self.office.id}
+        view.request = mock.Mock(user=UserFactory())
+        OfficeCheckoutStatus.objects.create(office=self.office, user=view.request.user)
+        cart_products, office_vendors = get_cart(self.office.id)
+        overnight = ShippingMethod.objects.create(name="Overnight")
+        results = [
+            {"order_id": f"{office_vendor.vendor.slug}-1", "total_amount": 10.0} for office_vendor in office_vendors
+        ]
+
+        async_to_sync(view._create_order)(
+            office_vendors, results, cart_products, True, {"darby": overnight}, fake_order=True
+        )
+
+        vendor_orders = {vendor_order.vendor.slug: vendor_order for vendor_order in VendorOrder.objects.all()}
+        self.assertEqual(vendor_orders["henry_schein"].shipping_option, self.ground)
+        self.assertEqual(vendor_orders["darby"].shipping_option, overnight)
+        self.assertEqual(vendor_orders["henry_schein"].total_items, 2)
+        self.assertEqual(vendor_orders["henry_schein"].order.total_items, 3)
+        self.assertEqual(vendor_orders["henry_schein"].order.total_amount, Decimal("20.00"))
+        self.assertEqual(
+            VendorOrderProduct.objects.filter(vendor_order__status=OrderStatus.PENDING_APPROVAL).count(), 3
+        )
+        self.assertEqual(
+            sorted(OfficeProduct.objects.values_list("last_order_price", flat=True)),
+            [Decimal("4.50"), Decimal("10.00"), Decimal("20.00")],
+        )
+        self.assertFalse(Cart.objects.exists())
+        self.assertEqual(fetch_order_history.apply_async.call_count, 2)
+        notify_order_creation.delay.assert_called_once()
+
+
+class FakeOrderScraper:
+    def __init__(self, vendor):
+        self.vendor = vendor
+
+    async def redundancy_order(self, products, shipping_method=None, fake=False, redundancy=False):
+        if self.vendor.slug == "darby":
+            await asyncio.sleep(1)
+        return {"order_id": f"{self.vendor.slug}-1", "total_amount": 10.0, "shipping_method": shipping_method}
+
+
+@mock.patch("apps.orders.views.notify_order_creation", mock.Mock())
+@mock.patch("apps.orders.views.perform_real_order", mock.Mock())
+@mock.patch("apps.orders.views.fetch_order_history", mock.Mock())
+@mock.patch("apps.orders.views.VENDOR_CONFIRM_TIMEOUT", 0.1)
+@mock.patch("apps.orders.views.ScraperFactory.create_scraper", lambda vendor, **kwargs: FakeOrderScraper(vendor))
+class ConfirmOrderTests(APITestCase):
+    def setUp(self) -> None:
+        company = CompanyFactory()
+        self.office = OfficeFactory(company=company)
+        user = UserFactory()
+        CompanyMemberFactory(company=company, user=user, email=user.email)
+        OfficeCheckoutStatus.objects.create(office=self.office, user=user)
+        self.overnight = ShippingMethod.objects.create(name="Overnight")
+        for slug in ("henry_schein", "darby"):
+            vendor = VendorFactory(slug=slug)
+            OfficeVendorFactory(office=self.office, vendor=vendor, username=slug)
+            Cart.objects.create(office=self.office, product=ProductFactory(vendor=vendor), quantity=1, unit_price=5)
+        self.url = f"/api/companies/{company.id}/offices/{self.office.id}/carts/confirm-order"
+        self.client.force_authenticate(user)
+
+    def test_vendors_that_time_out_stay_in_the_cart(self):
+        response = self.client.post(
+            self.url,
+            {"shipping_options": {"henry_schein": str(self.overnight.pk)}},
+            format="json",
+            HTTP_HOST="api.ordo.com",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["failed_vendors"], [{"vendor": "darby", "reason": "timeout"}])
+        vendor_order = VendorOrder.objects.get()
+        self.assertEqual((vendor_order.vendor.slug, vendor_order.shipping_option), ("henry_schein", self.overnight))
+        self.assertEqual(list(Cart.objects.values_list("product__vendor__slug", flat=True)), ["darby"])
+
+    def test_invalid_shipping_options(self):
+        response = self.client.post(self.url, {"shipping_options": {"henry_schein": "ground"}}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
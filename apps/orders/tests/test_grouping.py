@@ -0,0 +1,123 @@
+from django.test import TestCase
+
+from apps.common.similarity import (
+    get_similarity_matrix,
+    get_tokens_similarity,
+    tokenize_name,
+)
+from apps.common.utils import get_similarity
+from apps.orders.factories import ProductFactory
+from apps.orders.helpers import ProductHelper
+from apps.orders.models import Product
+from apps.orders.services.grouping import (
+    ProductGroupingEngine,
+    group_products_by_name,
+)
+
+PRODUCTS = [
+    (1, "henry_schein", "Septocaine Articaine HCl 4% Epinephrine 1:200,000 50/Bx"),
+    (2, "benco", "Septocaine® Articaine HCl 4% and Epinephrine 1:200,000 Silver Box of 50"),
+    (3, "net_32", "Septocaine Articaine HCl 4% with Epinephrine 1:200,000. Box of 50 - 1.7 mL"),
+    (4, "henry_schein", "Articaine HCl 4% Epinephrine 1:100,000 50/Bx"),
+    (5, "benco", "Septocaine® Articaine HCl 4% and Epinephrine 1:100,000 Gold Box of 50"),
+    (6, "net_32", "Dental Floss Waxed Mint 200yd Refill"),
+]
+
+
+def test_tokens_similarity_matches_get_similarity():
+    for _, _, name in PRODUCTS:
+        for _, _, other_name in PRODUCTS:
+            expected = ProductHelper.get_similarity(name, other_name)
+            assert abs(get_tokens_similarity(tokenize_name(name), tokenize_name(other_name)) - expected) < 1e-9
+
+
+def test_similarity_matrix_matches_get_similarity():
+    names = [name for _, _, name in PRODUCTS]
+    other_names = names[::-1] + ["", "50"]
+    similarities = get_similarity_matrix(names, other_names)
+    assert similarities.shape == (len(names), len(other_names))
+    for i, name in enumerate(names):
+        for j, other_name in enumerate(other_names):
+            assert abs(similarities[i, j] - get_similarity(name, other_name)) < 1e-9
+
+
+def test_similarity_matrix_in_processes():
+    names = [name for _, _, name in PRODUCTS] * 100
+    other_names = [name for _, _, name in PRODUCTS]
+    assert (get_similarity_matrix(names, other_names, processes=2) == get_similarity_matrix(names, other_names)).all()
+
+
+def test_group_products_by_name():
+    groups = group_products_by_name(PRODUCTS, threshold=0.5)
+    assert sorted(map(sorted, groups)) == [[1, 2, 3], [4, 5]]
+
+
+def test_groups_contain_one_product_per_vendor():
+    products = [
+        (1, "henry_schein", "Cotton Roll 1.5 inch 2000/Bx"),
+        (2, "henry_schein", "Cotton Roll 1.5 inch 2000/Box"),
+        (3, "benco", "Cotton Roll 1.5 inch 2000/Bx"),
+    ]
+    groups = group_products_by_name(products)
+    assert groups == [[1, 3]] or groups == [[3, 1]]
+
+
+def test_frequent_tokens_are_not_used_for_candidates():
+    engine = ProductGroupingEngine(threshold=0.5, max_token_frequency=0, min_token_frequency_cap=1)
+    engine.add_products([(1, "benco", "Gloves Nitrile"), (2, "darby", "Gloves Latex"), (3, "safco", "Gloves Vinyl")])
+    assert engine.get_candidate_pairs() == []
+
+
+class GroupProductsByManufacturerNumberTestCase(TestCase):
+    def test_group_products_by_manufacturer_numbers(self):
+        parent = ProductFactory(vendor=None, name="Parent")
+        other_parent = ProductFactory(vendor=None, name="Other Parent")
+        another_parent = ProductFactory(vendor=None, name="Another Parent")
+        grouped = [ProductFactory(manufacturer_number="MFN-1", parent=parent) for _ in range(2)]
+        ungrouped = [ProductFactory(manufacturer_number="MFN-1")]
+        duplicated = [
+            ProductFactory(manufacturer_number="MFN-2", parent=another_parent, name="Long product name"),
+            ProductFactory(manufacturer_number="MFN-2", parent=other_parent, name="Short name"),
+        ]
+        new = [ProductFactory(manufacturer_number="MFN-3", name=f"New product {i}") for i in range(3)]
+
+        result = ProductHelper.group_products_by_manufacturer_numbers(batch_size=2)
+
+        assert result["groups"] == 3
+        assert result["created_parents"] == 2
+        assert result["deleted_parents"] == 2
+        parent = Product.objects.get(name="Parent")
+        assert parent.manufacturer_number == "MFN-1"
+        assert {p.parent_id for p in Product.objects.filter(id__in=[p.id for p in grouped + ungrouped])} == {parent.id}
+        assert not Product.objects.filter(name__in=["Other Parent", "Another Parent"]).exists()
+
+        duplicated_parent = Product.objects.get(vendor__isnull=True, manufacturer_number="MFN-2")
+        assert duplicated_parent.name == "Short name"
+        assert set(Product.objects.filter(id__in=[p.id for p in duplicated]).values_list("parent_id", flat=True)) == {
+            duplicated_parent.id
+        }
+        new_parent = Product.objects.get(vendor__isnull=True, manufacturer_number="MFN-3")
+        assert set(Product.objects.filter(id__in=[p.id for p in new]).values_list("parent_id", flat=True)) == {
+            new_parent.id
+        }
+
+    def test_parent_shared_with_a_duplicated_group(self):
+        shared_parent = ProductFactory(vendor=None, name="Shared Parent")
+        other_parent = ProductFactory(vendor=None, name="Other Parent")
+        duplicated = [
+            ProductFactory(manufacturer_number="MFN-A", parent=shared_parent),
+            ProductFactory(manufacturer_number="MFN-A", parent=other_parent),
+        ]
+        sole_parent_deleted = ProductFactory(manufacturer_number="MFN-B", parent=shared_parent, name="Sole child")
+
+        result = ProductHelper.group_products_by_manufacturer_numbers()
+
+        assert result["deleted_parents"] == 2
+        assert result["created_parents"] == 2
+        assert not Product.objects.filter(id__in=[shared_parent.id, other_parent.id]).exists()
+        parents = dict(Product.objects.filter(vendor__isnull=True).values_list("manufacturer_number", "id"))
+        assert set(Product.objects.filter(id__in=[p.id for p in duplicated]).values_list("parent_id", flat=True)) == {
+            parents["MFN-A"]
+        }
+        sole_parent_deleted.refresh_from_db()
+        assert sole_parent_deleted.parent_id == parents["MFN-B"]
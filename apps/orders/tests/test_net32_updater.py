@@ -0,0 +1,142 @@
+import datetime
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from apps.accounts.factories import VendorFactory
+from apps.orders.factories import ProductFactory
+from apps.orders.models import Product
+from apps.orders.products_updater.net32_updater import (
+    STAGING_TABLE,
+    sync_net32_products,
+    update_net32_products,
+)
+from services.api_client.net_32 import Net32APIClient, iter_feed, parse_product
+from services.api_client.vendor_api_types import Net32Product, Net32ProductInfo
+
+FEED = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed>
+  <entry><mp_id>1</mp_id><price>$1,001.50</price><inventory_quantity>3</inventory_quantity></entry>
+  <entry><mp_id>2</mp_id><price>2.00</price><inventory_quantity>0</inventory_quantity></entry>
+  <entry><mp_id>3</mp_id><price>3.00</price><inventory_quantity>7</inventory_quantity></entry>
+</feed>
+"""
+
+
+def make_net32_product(mp_id, price):
+    return Net32ProductInfo(
+        mp_id=mp_id,
+        price=price,
+        inventory_quantity=1,
+        name=f"Product, {mp_id}",
+        manufacturer_number=f"MFN-{mp_id}",
+        category="",
+        url=f"https://www.net32.com/{mp_id}",
+        retail_price=price,
+        availability="in-stock",
+    )
+
+
+class SyncNet32ProductsTestCase(TestCase):
+    def test_sync(self):
+        vendor = VendorFactory(slug="net_32")
+        other_vendor = VendorFactory(slug="benco")
+        old = timezone.now() - datetime.timedelta(days=2)
+        to_disable = ProductFactory(vendor=vendor, product_id="1", is_available_on_vendor=True)
+        to_enable = ProductFactory(vendor=vendor, product_id="2", is_available_on_vendor=False)
+        outdated = ProductFactory(vendor=vendor, product_id="3", price=Decimal("1.00"), last_price_updated=old)
+        recent = ProductFactory(
+            vendor=vendor, product_id="4", price=Decimal("1.00"), last_price_updated=timezone.now()
+        )
+        other_vendor_product = ProductFactory(vendor=other_vendor, product_id="1", is_available_on_vendor=True)
+
+        feed = [
+            make_net32_product("2", Decimal("2.00")),
+            make_net32_product("3", Decimal("3.00")),
+            make_net32_product("3", Decimal("3.50")),
+            make_net32_product("4", Decimal("4.00")),
+            make_net32_product("5", Decimal("5.00")),
+        ]
+        stats = sync_net32_products(vendor.id, feed)
+
+        assert stats == {"feed": 5, "disabled": 1, "enabled": 1, "created": 1, "price_updated": 2}
+        assert not Product.objects.get(pk=to_disable.pk).is_available_on_vendor
+        assert Product.objects.get(pk=other_vendor_product.pk).is_available_on_vendor
+        to_enable.refresh_from_db()
+        assert to_enable.is_available_on_vendor
+        assert to_enable.price == Decimal("2.00")
+        assert Product.objects.get(pk=outdated.pk).price == Decimal("3.50")
+        assert Product.objects.get(pk=recent.pk).price == Decimal("1.00")
+        created = Product.objects.get(vendor=vendor, product_id="5")
+        assert (created.name, created.price, created.manufacturer_number) == ("Product, 5", Decimal("5.00"), "MFN-5")
+
+
+class SyncNet32ProductsTransactionTestCase(TransactionTestCase):
+    def test_feed_is_copied_outside_of_a_transaction(self):
+        vendor = VendorFactory(slug="net_32")
+        in_transaction = []
+
+        def feed():
+            for mp_id in ("1", "2"):
+                in_transaction.append(connection.in_atomic_block)
+                yield make_net32_product(mp_id, Decimal("1.00"))
+
+        stats = sync_net32_products(vendor.id, feed())
+
+        assert in_transaction == [False, False]
+        assert stats["created"] == 2
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [STAGING_TABLE])
+            assert cursor.fetchone() == (None,)
+
+
+class FakeContent:
+    def __init__(self, content: bytes, chunk_size: int):
+        self.chunks = [content[i : i + chunk_size] for i in range(0, len(content), chunk_size)]
+
+    async def iter_chunked(self, n):
+        for chunk in self.chunks:
+            yield chunk
+
+
+class FakeResponse:
+    def __init__(self, content: bytes, chunk_size: int = 16):
+        self.content = FakeContent(content, chunk_size)
+
+
+def test_iter_feed():
+    async def parse():
+        return [batch async for batch in iter_feed(FakeResponse(FEED), parse_product, batch_size=2)]
+
+    assert async_to_sync(parse)() == [
+        [
+            Net32Product(mp_id="1", price=Decimal("1001.50"), inventory_quantity=3),
+            Net32Product(mp_id="2", price=Decimal("2.00"), inventory_quantity=0),
+        ],
+        [Net32Product(mp_id="3", price=Decimal("3.00"), inventory_quantity=7)],
+    ]
+
+
+class UpdateNet32ProductsTestCase(TestCase):
+    def test_feed_is_streamed_to_the_staging_table(self):
+        vendor = VendorFactory(slug="net_32")
+        fetched = []
+
+        async def iter_full_products(client, batch_size=5000):
+            for batch in ([make_net32_product("1", Decimal("1.00"))], [make_net32_product("2", Decimal("2.00"))]):
+                fetched.append(batch)
+                yield batch
+
+        with mock.patch.object(Net32APIClient, "iter_full_products", iter_full_products), mock.patch(
+            "apps.orders.products_updater.net32_updater.COPY_BATCH_SIZE", 1
+        ):
+            stats = async_to_sync(update_net32_products)()
+
+        assert len(fetched) == 2
+        assert stats["feed"] == 2
+        assert stats["created"] == 2
+        assert set(Product.objects.filter(vendor=vendor).values_list("product_id", flat=True)) == {"1", "2"}
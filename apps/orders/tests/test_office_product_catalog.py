@@ -0,0 +1,77 @@
+import datetime
+import importlib
+
+from django.db import connection
+from django.test import TestCase
+
+from apps.accounts.factories import OfficeFactory, OfficeVendorFactory, VendorFactory
+from apps.orders.factories import ProductFactory
+from apps.orders.helpers import ProductHelper
+from apps.orders.models import OfficeProduct, OfficeProductCatalog
+from apps.orders.tests.utils import update_product_search_data
+
+# Tests run without migrations, the catalog triggers are installed from the migration itself
+catalog_migration = importlib.import_module("apps.orders.migrations.0084_officeproductcatalog")
+
+
+class OfficeProductCatalogTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with connection.cursor() as cursor:
+            cursor.execute(catalog_migration.RECALCULATE_FUNCTION_SQL)
+            cursor.execute(catalog_migration.TRIGGER_FUNCTIONS_SQL)
+            cursor.execute(catalog_migration.TRIGGERS_SQL)
+
+    def setUp(self) -> None:
+        self.vendor = VendorFactory(slug="henry_schein")
+        self.office = OfficeFactory()
+        OfficeVendorFactory(office=self.office, vendor=self.vendor)
+        self.parent = ProductFactory(vendor=None, name="Cotton Rolls")
+        self.child = ProductFactory(vendor=self.vendor, parent=self.parent, name="Cotton Rolls 2000/Bx")
+        self.other_parent = ProductFactory(vendor=None, name="Cotton Pellets")
+        self.other_child = ProductFactory(vendor=self.vendor, parent=self.other_parent, name="Cotton Pellets 500/Bx")
+        update_product_search_data()
+
+    def test_catalog_follows_office_products(self):
+        office_product = OfficeProduct.objects.create(office=self.office, product=self.child, price=10)
+        assert not OfficeProductCatalog.objects.exists()
+
+        office_product.is_inventory = True
+        office_product.last_order_date = datetime.date(2023, 1, 1)
+        office_product.save()
+        catalog_product = OfficeProductCatalog.objects.get()
+        assert (catalog_product.office_id, catalog_product.product_id) == (self.office.id, self.parent.id)
+        assert catalog_product.last_order_date == datetime.date(2023, 1, 1)
+
+        self.child.parent = self.other_parent
+        self.child.save()
+        assert OfficeProductCatalog.objects.get().product_id == self.other_parent.id
+
+        office_product.delete()
+        assert not OfficeProductCatalog.objects.exists()
+
+    def test_search_uses_catalog(self):
+        OfficeProduct.objects.create(
+            office=self.office,
+            product=self.other_child,
+            is_inventory=True,
+            last_order_date=datetime.date(2023, 1, 1),
+        )
+        OfficeProduct.objects.create(office=self.office, product=self.child, nickname="gauze")
+
+        products, available_vendors = ProductHelper.get_products_v3(query="cotton", office=self.office.id)
+        assert available_vendors == ["henry_schein"]
+        assert [(p.id, p.is_inventory) for p in products] == [(self.other_parent.id, True), (self.parent.id, False)]
+
+        products, _ = ProductHelper.get_products_v3(query="gauze", office=self.office.id)
+        assert [p.id for p in products] == [self.parent.id]
+
+    def test_fill_catalog(self):
+        OfficeProduct.objects.create(office=self.office, product=self.child, nickname="gauze")
+        OfficeProduct.objects.create(office=self.office, product=self.other_child, price=10)
+        OfficeProductCatalog.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(catalog_migration.FILL_SQL)
+        catalog_product = OfficeProductCatalog.objects.get()
+        assert (catalog_product.product_id, catalog_product.last_order_date) == (self.parent.id, None)
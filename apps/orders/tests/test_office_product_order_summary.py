@@ -0,0 +1,94 @@
+import datetime
+import importlib
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+
+from apps.accounts.factories import OfficeFactory, OfficeVendorFactory, VendorFactory
+from apps.orders.factories import OrderFactory, ProductFactory, VendorOrderFactory
+from apps.orders.models import (
+    OfficeProduct,
+    OfficeProductOrderSummary,
+    VendorOrder,
+    VendorOrderProduct,
+)
+
+# Tests run without migrations, the summary triggers are installed from the migration itself
+summary_migration = importlib.import_module("apps.orders.migrations.0086_officeproductordersummary")
+
+
+class OfficeProductOrderSummaryTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with connection.cursor() as cursor:
+            cursor.execute(summary_migration.RECALCULATE_FUNCTION_SQL)
+            cursor.execute(summary_migration.TRIGGER_FUNCTIONS_SQL)
+            cursor.execute(summary_migration.TRIGGERS_SQL)
+
+    def setUp(self) -> None:
+        self.vendor = VendorFactory(slug="henry_schein")
+        self.office = OfficeFactory()
+        self.other_office = OfficeFactory()
+        for office in (self.office, self.other_office):
+            OfficeVendorFactory(office=office, vendor=self.vendor, username=f"office-{office.id}")
+        self.product = ProductFactory(vendor=self.vendor)
+        self.office_product = OfficeProduct.objects.create(office=self.office, product=self.product, is_inventory=True)
+
+    def create_vendor_order(self, office, order_date):
+        return VendorOrderFactory(order=OrderFactory(office=office), vendor=self.vendor, order_date=order_date)
+
+    def order_product(self, vendor_order, quantity, unit_price="10.00"):
+        return VendorOrderProduct.objects.bulk_create(
+            [
+                VendorOrderProduct(
+                    vendor_order=vendor_order, product=self.product, quantity=quantity, unit_price=Decimal(unit_price)
+                )
+            ]
+        )[0]
+
+    def get_summary(self, office=None):
+        return OfficeProductOrderSummary.objects.get(office=office or self.office, product=self.product)
+
+    def test_summary_follows_vendor_order_products(self):
+        first_order = self.create_vendor_order(self.office, datetime.date(2023, 1, 1))
+        self.order_product(first_order, 2)
+        second_order = self.create_vendor_order(self.office, datetime.date(2023, 2, 1))
+        last_order_product = self.order_product(second_order, 5, "9.50")
+        self.order_product(self.create_vendor_order(self.other_office, datetime.date(2023, 3, 1)), 7)
+
+        summary = self.get_summary()
+        self.assertEqual(
+            (summary.last_quantity_ordered, summary.last_order_date, summary.last_order_price),
+            (5, datetime.date(2023, 2, 1), Decimal("9.50")),
+        )
+        self.assertEqual(summary.total_quantity_ordered, 7)
+        self.assertEqual(self.get_summary(self.other_office).total_quantity_ordered, 7)
+
+        last_order_product.quantity = 3
+        last_order_product.save()
+        VendorOrder.objects.filter(pk=second_order.pk).update(order_date=datetime.date(2023, 2, 15))
+        summary = self.get_summary()
+        self.assertEqual((summary.last_quantity_ordered, summary.total_quantity_ordered), (3, 5))
+        self.assertEqual(summary.last_order_date, datetime.date(2023, 2, 15))
+
+        last_order_product.delete()
+        self.assertEqual(self.get_summary().last_quantity_ordered, 2)
+        VendorOrderProduct.objects.filter(vendor_order=first_order).delete()
+        self.assertFalse(OfficeProductOrderSummary.objects.filter(office=self.office).exists())
+
+    def test_last_quantity_ordered_annotation(self):
+        self.order_product(self.create_vendor_order(self.office, datetime.date(2023, 1, 1)), 4)
+        self.order_product(self.create_vendor_order(self.other_office, datetime.date(2023, 2, 1)), 9)
+
+        office_product = OfficeProduct.objects.filter(pk=self.office_product.pk).with_last_quantity_ordered().get()
+        self.assertEqual(office_product.last_quantity_ordered, 4)
+
+    def test_fill_summaries(self):
+        self.order_product(self.create_vendor_order(self.office, datetime.date(2023, 1, 1)), 4)
+        OfficeProductOrderSummary.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(summary_migration.FILL_SQL)
+        summary = self.get_summary()
+        self.assertEqual((summary.last_quantity_ordered, summary.total_quantity_ordered), (4, 4))
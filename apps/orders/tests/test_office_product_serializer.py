@@ -0,0 +1,68 @@
+import datetime
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.factories import (
+    CompanyFactory,
+    OfficeFactory,
+    UserFactory,
+    VendorFactory,
+)
+from apps.accounts.models import Subscription
+from apps.orders.factories import ProductFactory
+from apps.orders.models import OfficeProduct, OfficeProductCategory, ProductImage
+
+
+class OfficeProductListTests(APITestCase):
+    def setUp(self) -> None:
+        company = CompanyFactory()
+        self.office = OfficeFactory(company=company)
+        Subscription.objects.create(office=self.office, subscription_id="sub", start_on=datetime.date(2023, 1, 1))
+        self.vendors = [VendorFactory(slug="henry_schein"), VendorFactory(slug="darby")]
+        self.category = OfficeProductCategory.objects.create(office=self.office, name="Other", slug="other")
+        self.url = f"/api/companies/{company.id}/offices/{self.office.id}/products?per_page=100"
+        self.client.force_authenticate(UserFactory())
+
+    def add_inventory_product(self, last_order_date):
+        parent = ProductFactory(vendor=None)
+        ordered_child, other_child = [ProductFactory(vendor=vendor, parent=parent) for vendor in self.vendors]
+        ProductImage.objects.create(product=ordered_child, image="https://example.com/image.png")
+        # the other child is not in the office, rendering it must not query its office product
+        return OfficeProduct.objects.create(
+            office=self.office,
+            product=ordered_child,
+            vendor=ordered_child.vendor,
+            office_product_category=self.category,
+            is_inventory=True,
+            last_order_date=last_order_date,
+        )
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response.data
+
+    def test_list_renders_in_constant_queries(self):
+        for _ in range(2):
+            self.add_inventory_product(datetime.date(2023, 1, 1))
+        query_count, data = self.count_list_queries()
+        self.assertEqual(len(data["data"]), 2)
+
+        for _ in range(8):
+            self.add_inventory_product(None)
+        self.assertEqual(self.count_list_queries()[0], query_count)
+
+    def test_last_ordered_child(self):
+        office_product = self.add_inventory_product(datetime.date(2023, 1, 1))
+        item = self.count_list_queries()[1]["data"][0]
+        self.assertEqual(item["last_order_date"], datetime.date(2023, 1, 1))
+        self.assertEqual(item["last_order_vendor"], self.vendors[0].id)
+        self.assertEqual(item["product"]["id"], office_product.product_id)
+        children = {child["id"]: child for child in item["product"]["children"]}
+        self.assertTrue(children[office_product.product_id]["is_inventory"])
+        self.assertEqual(len(children[office_product.product_id]["images"]), 1)
+        self.assertEqual(item["office_product_category"]["slug"], "other")
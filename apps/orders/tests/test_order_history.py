@@ -0,0 +1,92 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.accounts.factories import OfficeFactory, OfficeVendorFactory, VendorFactory
+from apps.accounts.models import OfficeVendor
+from apps.accounts.tasks import fetch_order_history
+from apps.common.choices import OrderStatus
+from apps.orders.factories import OrderFactory, VendorOrderFactory
+from apps.orders.models import VendorOrder
+from apps.orders.services.order_history import (
+    ORDER_HISTORY_OVERLAP_DAYS,
+    ORDER_HISTORY_RECONCILE_DAYS,
+    get_order_history_window,
+    mark_order_history_synced,
+)
+
+
+class OrderHistoryWindowTests(TestCase):
+    def setUp(self) -> None:
+        self.today = timezone.localtime().date()
+        self.office = OfficeFactory()
+        self.office_vendor = OfficeVendorFactory(office=self.office, vendor=VendorFactory(slug="henry_schein"))
+        order = OrderFactory(office=self.office)
+        for reference, status, days_ago in (("R-1", OrderStatus.CLOSED, 40), ("R-2", OrderStatus.OPEN, 20)):
+            VendorOrderFactory(
+                order=order,
+                vendor=self.office_vendor.vendor,
+                vendor_order_reference=reference,
+                status=status,
+                order_date=self.today - datetime.timedelta(days=days_ago),
+            )
+
+    def test_first_sync_is_a_full_reconcile(self):
+        window = get_order_history_window(self.office_vendor)
+        self.assertTrue(window.full_reconcile)
+        self.assertIsNone(window.from_date)
+        self.assertEqual(window.completed_order_ids, {"R-1"})
+
+    def test_incremental_window(self):
+        mark_order_history_synced(self.office_vendor, get_order_history_window(self.office_vendor))
+        office_vendor = OfficeVendor.objects.get(pk=self.office_vendor.pk)
+        self.assertEqual(
+            (office_vendor.order_history_synced_on, office_vendor.order_history_reconciled_on),
+            (self.today, self.today),
+        )
+
+        # the open order keeps being requested until it is closed
+        window = get_order_history_window(office_vendor)
+        self.assertFalse(window.full_reconcile)
+        self.assertEqual(window.from_date, self.today - datetime.timedelta(days=20))
+
+        # once the open order is closed, only the days around the watermark are requested
+        VendorOrder.objects.update(status=OrderStatus.CLOSED)
+        window = get_order_history_window(office_vendor)
+        self.assertEqual(window.from_date, self.today - datetime.timedelta(days=ORDER_HISTORY_OVERLAP_DAYS))
+        self.assertEqual(window.completed_order_ids, {"R-1", "R-2"})
+
+    def test_periodic_full_reconcile(self):
+        self.office_vendor.order_history_synced_on = self.today
+        self.office_vendor.order_history_reconciled_on = self.today - datetime.timedelta(
+            days=ORDER_HISTORY_RECONCILE_DAYS
+        )
+        self.assertTrue(get_order_history_window(self.office_vendor).full_reconcile)
+        self.assertTrue(get_order_history_window(self.office_vendor, full_reconcile=True).full_reconcile)
+
+    @mock.patch("apps.accounts.tasks.OrderHelper.fetch_orders_and_update", return_value=0)
+    def test_fetch_order_history_moves_the_watermark(self, fetch_orders_and_update):
+        OfficeVendor.objects.filter(pk=self.office_vendor.pk).update(
+            order_history_synced_on=self.today - datetime.timedelta(days=1), order_history_reconciled_on=self.today
+        )
+        VendorOrder.objects.update(status=OrderStatus.CLOSED)
+
+        fetch_order_history("henry_schein", self.office.id, True)
+
+        kwargs = fetch_orders_and_update.call_args.kwargs
+        self.assertEqual(kwargs["from_date"], self.today - datetime.timedelta(days=1 + ORDER_HISTORY_OVERLAP_DAYS))
+        self.assertEqual(kwargs["completed_order_ids"], {"R-1", "R-2"})
+        self.assertEqual(OfficeVendor.objects.get(pk=self.office_vendor.pk).order_history_synced_on, self.today)
+
+    @mock.patch("apps.accounts.tasks.OrderHelper.fetch_orders_and_update", return_value=2)
+    def test_failed_orders_keep_the_watermark(self, fetch_orders_and_update):
+        synced_on = self.today - datetime.timedelta(days=1)
+        OfficeVendor.objects.filter(pk=self.office_vendor.pk).update(
+            order_history_synced_on=synced_on, order_history_reconciled_on=self.today
+        )
+
+        fetch_order_history("henry_schein", self.office.id, True)
+
+        self.assertEqual(OfficeVendor.objects.get(pk=self.office_vendor.pk).order_history_synced_on, synced_on)
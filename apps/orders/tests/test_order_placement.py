@@ -0,0 +1,107 @@
+import asyncio
+import datetime
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.factories import (
+    CompanyFactory,
+    OfficeFactory,
+    OfficeVendorFactory,
+    UserFactory,
+    VendorFactory,
+)
+from apps.accounts.models import Subscription
+from apps.common.choices import OrderType, ProductStatus
+from apps.orders.factories import (
+    OrderFactory,
+    VendorOrderFactory,
+    VendorOrderProductFactory,
+)
+from apps.orders.helpers import OrderHelper
+from apps.orders.models import OfficeProduct, Order, VendorOrder
+
+PlacementStatus = VendorOrder.PlacementStatus
+
+
+class OrderPlacementTests(TestCase):
+    def setUp(self) -> None:
+        self.office = OfficeFactory()
+        self.order = OrderFactory(office=self.office, order_type=OrderType.VENDOR_DIRECT)
+        self.vendor_orders = {}
+        for slug in ("henry_schein", "darby", "benco"):
+            vendor = VendorFactory(slug=slug)
+            OfficeVendorFactory(office=self.office, vendor=vendor)
+            vendor_order = VendorOrderFactory(
+                order=self.order,
+                vendor=vendor,
+                order_date=datetime.date(2023, 6, 1),
+                placement_status=PlacementStatus.PENDING,
+            )
+            order_product = VendorOrderProductFactory(vendor_order=vendor_order, status=ProductStatus.PROCESSING)
+            OfficeProduct.objects.create(office=self.office, product=order_product.product)
+            self.vendor_orders[slug] = vendor_order
+
+    def perform_orders(self):
+        async def process_order_in_vendor(vendor_order, **kwargs):
+            if vendor_order.vendor.slug == "darby":
+                raise ValueError("Out of stock")
+            if vendor_order.vendor.slug == "benco":
+                await asyncio.sleep(1)
+
+        with mock.patch.object(OrderHelper, "process_order_in_vendor", process_order_in_vendor), mock.patch(
+            "apps.orders.helpers.VENDOR_ORDER_PLACEMENT_TIMEOUT", 0.1
+        ):
+            async_to_sync(OrderHelper.perform_orders_in_vendors)(
+                order_id=self.order.id,
+                vendor_order_ids=[vendor_order.id for vendor_order in self.vendor_orders.values()],
+            )
+
+    def test_placement_progress_is_recorded_per_vendor(self):
+        self.perform_orders()
+
+        placements = {
+            vendor_order.vendor.slug: (vendor_order.placement_status, vendor_order.placement_error)
+            for vendor_order in VendorOrder.objects.select_related("vendor")
+        }
+        self.assertEqual(placements["henry_schein"], (PlacementStatus.PLACED, None))
+        self.assertEqual(placements["darby"], (PlacementStatus.FAILED, "Out of stock"))
+        self.assertEqual(placements["benco"][0], PlacementStatus.TIMED_OUT)
+        self.assertEqual(
+            set(OfficeProduct.objects.values_list("last_order_date", flat=True)), {datetime.date(2023, 6, 1)}
+        )
+        # the order is only marked as placed by Ordo when every vendor order is placed
+        self.assertEqual(Order.objects.get().order_type, OrderType.VENDOR_DIRECT)
+
+
+class OrderPlacementStatusTests(APITestCase):
+    def setUp(self) -> None:
+        company = CompanyFactory()
+        self.office = OfficeFactory(company=company)
+        Subscription.objects.create(office=self.office, subscription_id="sub", start_on=datetime.date(2023, 1, 1))
+        self.order = OrderFactory(office=self.office)
+        self.placed, self.in_progress = [
+            VendorOrderFactory(
+                order=self.order,
+                vendor=OfficeVendorFactory(office=self.office).vendor,
+                placement_status=placement_status,
+            )
+            for placement_status in (PlacementStatus.PLACED, PlacementStatus.IN_PROGRESS)
+        ]
+        self.url = f"/api/companies/{company.id}/offices/{self.office.id}/orders/{self.order.id}/placement-status"
+        self.client.force_authenticate(UserFactory())
+
+    def test_placement_status(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["complete"])
+        self.assertEqual(
+            [vendor_order["placement_status"] for vendor_order in response.data["vendor_orders"]],
+            [PlacementStatus.PLACED, PlacementStatus.IN_PROGRESS],
+        )
+
+        VendorOrder.objects.filter(pk=self.in_progress.pk).update(placement_status=PlacementStatus.FAILED)
+        self.assertTrue(self.client.get(self.url).data["complete"])
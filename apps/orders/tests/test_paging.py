@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from services.api_client.errors import APIClientError
+from services.api_client.paging import PageFetcher
+
+PAGE_SIZE = 2
+
+
+class FakePages:
+    def __init__(self, page_count, delays=None, failures=None):
+        self.page_count = page_count
+        self.delays = delays or {}
+        self.failures = failures or {}
+        self.requested = []
+        self.running = 0
+        self.max_running = 0
+
+    async def fetch_page(self, page_number):
+        self.requested.append(page_number)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delays.get(page_number, 0))
+            if self.failures.get(page_number):
+                self.failures[page_number] -= 1
+                raise APIClientError(f"page {page_number} failed")
+        finally:
+            self.running -= 1
+        if page_number > self.page_count:
+            return []
+        if page_number == self.page_count:
+            return [f"{page_number}-1"]
+        return [f"{page_number}-{i}" for i in range(1, PAGE_SIZE + 1)]
+
+
+def collect(pages, **kwargs):
+    async def main():
+        fetcher = PageFetcher(pages.fetch_page, PAGE_SIZE, backoff=0.001, **kwargs)
+        return [page async for page in fetcher.iter_pages()]
+
+    return asyncio.run(main())
+
+
+def test_pages_are_yielded_in_arrival_order():
+    pages = FakePages(page_count=3, delays={1: 0.05})
+    result = collect(pages)
+    assert [page[0] for page in result] == ["2-1", "3-1", "1-1"]
+    assert sum(len(page) for page in result) == 5
+
+
+def test_requests_stop_after_the_last_page():
+    pages = FakePages(page_count=7)
+    result = collect(pages, max_window=3)
+    assert [page[0] for page in result] == [f"{i}-1" for i in range(1, 8)]
+    assert pages.max_running == 3
+    assert max(pages.requested) <= 7 + 3
+
+
+def test_failed_pages_are_retried():
+    pages = FakePages(page_count=3, failures={2: 2})
+    result = collect(pages)
+    assert sorted(page[0] for page in result) == ["1-1", "2-1", "3-1"]
+    assert pages.requested.count(2) == 3
+
+
+def test_error_is_raised_after_max_retries():
+    pages = FakePages(page_count=3, failures={2: 3})
+    with pytest.raises(APIClientError):
+        collect(pages, max_retries=2)
@@ -0,0 +1,93 @@
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.factories import (
+    CompanyFactory,
+    OfficeFactory,
+    UserFactory,
+    VendorFactory,
+)
+from apps.accounts.models import Subscription
+from apps.orders.factories import ProductFactory
+from apps.orders.models import OfficeProduct
+
+
+class ProductPricesTests(APITestCase):
+    def setUp(self) -> None:
+        company = CompanyFactory()
+        self.office = OfficeFactory(company=company)
+        other_office = OfficeFactory(company=company)
+        Subscription.objects.create(office=self.office, subscription_id="sub", start_on=datetime.date(2023, 1, 1))
+        henry_schein = VendorFactory(slug="henry_schein")
+        net_32 = VendorFactory(slug="net_32")
+        dental_city = VendorFactory(slug="dental_city")
+
+        self.formula_product = ProductFactory(vendor=henry_schein, price=Decimal("9.00"))
+        OfficeProduct.objects.create(
+            office=self.office, product=self.formula_product, price=Decimal("8.50"), product_vendor_status="Active"
+        )
+        OfficeProduct.objects.create(office=other_office, product=self.formula_product, price=Decimal("1.00"))
+        self.formula_product_without_office_price = ProductFactory(vendor=henry_schein, price=Decimal("3.00"))
+        self.net32_product = ProductFactory(vendor=net_32, price=Decimal("4.25"))
+        self.net32_product_without_price = ProductFactory(vendor=net_32, price=None)
+        self.dental_city_product = ProductFactory(
+            vendor=dental_city, price=Decimal("5.00"), last_price_updated=timezone.localtime()
+        )
+
+        self.url = f"/api/companies/{company.id}/offices/{self.office.id}/products/prices"
+        self.product_ids = [
+            self.formula_product.id,
+            self.formula_product_without_office_price.id,
+            self.net32_product.id,
+            self.net32_product_without_price.id,
+            self.dental_city_product.id,
+        ]
+        self.client.force_authenticate(UserFactory())
+
+    def test_prices(self):
+        with self.assertNumQueries(2):
+            response = self.client.post(self.url, {"products": self.product_ids}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {
+                self.formula_product.id: {"price": Decimal("8.50"), "product_vendor_status": "Active"},
+                self.net32_product.id: {"price": Decimal("4.25"), "product_vendor_status": ""},
+            },
+        )
+
+    def test_columnar_prices(self):
+        response = self.client.post(self.url, {"products": self.product_ids, "columnar": True}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        prices = dict(zip(response.data["product_ids"], response.data["prices"]))
+        self.assertEqual(prices, {self.formula_product.id: Decimal("8.50"), self.net32_product.id: Decimal("4.25")})
+        self.assertEqual(len(response.data["product_vendor_statuses"]), 2)
+
+    def test_price_freshness(self):
+        dental_city = self.dental_city_product.vendor
+        product_without_update_time = ProductFactory(
+            vendor=dental_city, price=Decimal("6.00"), last_price_updated=None
+        )
+        stale_product = ProductFactory(
+            vendor=dental_city,
+            price=Decimal("7.00"),
+            last_price_updated=timezone.localtime() - datetime.timedelta(days=settings.PRODUCT_PRICE_UPDATE_CYCLE + 1),
+        )
+        product_ids = [self.dental_city_product.id, product_without_update_time.id, stale_product.id]
+
+        with override_settings(
+            FORMULA_VENDORS=[slug for slug in settings.FORMULA_VENDORS if slug != "dental_city"],
+            NON_FORMULA_VENDORS=["net_32", "dental_city"],
+        ):
+            response = self.client.post(self.url, {"products": product_ids, "columnar": True}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        prices = dict(zip(response.data["product_ids"], response.data["prices"]))
+        self.assertEqual(
+            prices, {self.dental_city_product.id: Decimal("5.00"), product_without_update_time.id: Decimal("6.00")}
+        )
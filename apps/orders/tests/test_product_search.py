@@ -0,0 +1,96 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.factories import (
+    OfficeFactory,
+    OfficeVendorFactory,
+    UserFactory,
+    VendorFactory,
+)
+from apps.audit.models import SearchHistory
+from apps.audit.search_history import flush_search_history
+from apps.orders.factories import ProductFactory
+from apps.orders.models import OfficeProductCatalog, Product
+from apps.orders.tests.utils import update_product_search_data
+
+
+class ProductV2SearchPaginationTests(APITestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        vendor = VendorFactory(slug="henry_schein")
+        self.office = OfficeFactory()
+        self.office_vendor = OfficeVendorFactory(office=self.office, vendor=vendor)
+        self.parents = []
+        for i in range(7):
+            parent = ProductFactory(vendor=None, name=f"Cotton Rolls {i}")
+            self.parents.append(parent)
+            for _ in range(i % 3 + 1):
+                ProductFactory(vendor=vendor, parent=parent, name=f"Cotton Rolls {i}")
+        update_product_search_data()
+        for i, last_order_date in ((1, datetime.date(2023, 1, 1)), (4, datetime.date(2023, 2, 1))):
+            OfficeProductCatalog.objects.create(
+                office=self.office, product=self.parents[i], last_order_date=last_order_date
+            )
+        self.client.force_authenticate(UserFactory())
+
+    def search(self, **params):
+        response = self.client.get(
+            "/api/v2/products", {"search": "cotton", "office_pk": self.office.id, "per_page": 3, **params}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_cursor_pages_match_offset_pages(self):
+        self._test_cursor_pages_match_offset_pages()
+
+    def test_cursor_pages_past_cached_search_result(self):
+        with mock.patch("apps.orders.services.search_cache.MAX_CACHED_PRODUCTS", 4):
+            self._test_cursor_pages_match_offset_pages()
+
+    def _test_cursor_pages_match_offset_pages(self):
+        cursor_ids, offset_ids = [], []
+        selected_products = self.parents[5].id
+        params = {}
+        for page in range(1, 4):
+            data = self.search(selected_products=selected_products, **params)
+            cursor_ids.extend(product["id"] for product in data["data"]["products"])
+            params = {"cursor": data["next_cursor"], "page": page + 1}
+            offset_ids.extend(
+                product["id"]
+                for product in self.search(selected_products=selected_products, page=page)["data"]["products"]
+            )
+
+        self.assertIsNone(data["next_cursor"])
+        self.assertIsNone(data["next_page"])
+        self.assertEqual(len(cursor_ids), 7)
+        self.assertEqual(cursor_ids, offset_ids)
+        self.assertEqual(cursor_ids[:3], [self.parents[5].id, self.parents[4].id, self.parents[1].id])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            "/api/v2/products", {"search": "cotton", "office_pk": self.office.id, "cursor": "x"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_estimated_total(self):
+        self.assertEqual(self.search()["total"], -1)
+        self.assertGreaterEqual(self.search(with_total="true")["total"], 1)
+
+    def test_search_result_is_cached(self):
+        product_ids = [product["id"] for product in self.search()["data"]["products"]]
+        Product.objects.filter(id=product_ids[0]).update(search_vector=None)
+        self.assertEqual([product["id"] for product in self.search()["data"]["products"]], product_ids)
+
+        # office vendors changes invalidate the cached results
+        self.office_vendor.save()
+        self.assertNotIn(product_ids[0], [product["id"] for product in self.search()["data"]["products"]])
+
+    def test_search_history(self):
+        self.search()
+        self.search(page=2)
+        flush_search_history()
+        self.assertEqual(list(SearchHistory.objects.values_list("query", flat=True)), ["cotton", "cotton"])
@@ -0,0 +1,87 @@
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.factories import OfficeFactory, UserFactory, VendorFactory
+from apps.common.testing import is_redis_available
+from apps.common.utils import get_redis_client
+from apps.orders.factories import ProductFactory
+from apps.orders.models import OfficeProduct, Product, ProductImage
+from apps.orders.services.product_suggestion import (
+    BUILDING_KEY_SUFFIX,
+    INDEX_KEYS,
+    build_suggestion_index,
+)
+from apps.orders.services.search_cache import bump_catalog_version
+
+
+@skipUnless(is_redis_available(), "Redis is not available")
+class ProductSuggestionTests(APITestCase):
+    def setUp(self) -> None:
+        vendor = VendorFactory(slug="henry_schein")
+        self.office = OfficeFactory()
+        self.cotton_rolls = ProductFactory(vendor=None, name="Cotton Rolls", product_id=None)
+        cotton_rolls_child = ProductFactory(
+            vendor=vendor, parent=self.cotton_rolls, name="Cotton Rolls 2000/Bx", product_id="100-2345"
+        )
+        ProductImage.objects.create(product=cotton_rolls_child, image="https://example.com/cotton-rolls.png")
+        self.cotton_pellets = ProductFactory(vendor=None, name="Cotton Pellets Size 2", product_id=None)
+        cotton_pellets_child = ProductFactory(
+            vendor=vendor, parent=self.cotton_pellets, name="Cotton Pellets", product_id="777-1234"
+        )
+        self.gauze = ProductFactory(vendor=vendor, name="Gauze Sponges", product_id="GZ-10")
+        OfficeProduct.objects.create(office=self.office, product=cotton_pellets_child, is_inventory=True)
+        self.client.force_authenticate(UserFactory())
+
+    def tearDown(self) -> None:
+        get_redis_client(settings.REDIS_URL).delete(*INDEX_KEYS, *(key + BUILDING_KEY_SUFFIX for key in INDEX_KEYS))
+
+    def suggest(self, search):
+        response = self.client.get("/api/v2/products/suggest", {"search": search, "office_pk": self.office.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_suggestions_from_index(self):
+        self.assertEqual(build_suggestion_index(batch_size=2), 3)
+
+        suggestions = self.suggest("cot")
+        self.assertEqual([s["id"] for s in suggestions], [self.cotton_pellets.id, self.cotton_rolls.id])
+        self.assertEqual([s["is_inventory"] for s in suggestions], [True, False])
+        self.assertEqual(suggestions[1]["image"], "https://example.com/cotton-rolls.png")
+
+        self.assertEqual([s["id"] for s in self.suggest("cotton ro")], [self.cotton_rolls.id])
+        self.assertEqual([s["id"] for s in self.suggest("1002345")], [self.cotton_rolls.id])
+        self.assertEqual([s["id"] for s in self.suggest("gz10")], [self.gauze.id])
+        self.assertEqual(self.suggest("pads"), [])
+
+    def test_suggestions_without_index(self):
+        suggestions = self.suggest("cotton")
+        self.assertEqual({s["id"] for s in suggestions}, {self.cotton_pellets.id, self.cotton_rolls.id})
+
+    @mock.patch("apps.orders.services.product_suggestion.CANDIDATES_BATCH_SIZE", 1)
+    @mock.patch("apps.orders.services.product_suggestion.MAX_CANDIDATES", 2)
+    def test_candidates_of_common_words(self):
+        for material in ("Latex", "Vinyl", "Poly"):
+            ProductFactory(vendor=None, name=f"Gloves {material} Medium", product_id=None)
+        nitrile_gloves = ProductFactory(vendor=None, name="Gloves Nitrile Medium", product_id=None)
+        inventory_gloves = ProductFactory(vendor=None, name="Gloves Powder Free Large", product_id=None)
+        OfficeProduct.objects.create(
+            office=self.office, product=ProductFactory(parent=inventory_gloves), is_inventory=True
+        )
+        build_suggestion_index()
+
+        # the other words are matched on the candidates of the most selective one
+        self.assertEqual([s["id"] for s in self.suggest("nitrile gloves")], [nitrile_gloves.id])
+        # inventory products are ranked even when a prefix matches too many products
+        self.assertEqual(self.suggest("g")[0]["id"], inventory_gloves.id)
+
+    def test_regrouped_parents_are_not_suggested(self):
+        build_suggestion_index()
+        Product.objects.filter(parent=self.cotton_rolls).update(parent=self.cotton_pellets)
+        self.cotton_rolls.delete()
+        bump_catalog_version()
+
+        self.assertEqual([s["id"] for s in self.suggest("cot")], [self.cotton_pellets.id])
+        self.assertEqual(self.suggest("1002345"), [])
@@ -0,0 +1,76 @@
+import asyncio
+import datetime
+from decimal import Decimal
+
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from apps.accounts.factories import VendorFactory
+from apps.common.enums import SupportedVendor
+from apps.orders.factories import ProductFactory
+from apps.orders.models import Product
+from apps.orders.product_updater import update_products
+from apps.orders.tests.factories import OfficeProductFactory
+from services.api_client import DentalCityProduct
+
+
+def make_dental_city_product(sku, price, manufacturer_special=""):
+    return DentalCityProduct(
+        product_sku=sku,
+        list_price=price,
+        partner_price=price,
+        web_price=price,
+        manufacturer="",
+        manufacturer_part_number="",
+        manufacturer_special=manufacturer_special,
+        product_desc="",
+    )
+
+
+class UpdateProductsTestCase(TransactionTestCase):
+    def test_only_changed_products_are_written(self):
+        vendor = VendorFactory(slug="dental_city")
+        parent = ProductFactory(vendor=None)
+        last_updated = timezone.now() - datetime.timedelta(hours=1)
+        unchanged = ProductFactory(vendor=vendor, sku="1", price=Decimal("10.00"), last_price_updated=last_updated)
+        changed = ProductFactory(vendor=vendor, sku="2", price=Decimal("10.00"), parent=parent)
+        office_products = [
+            OfficeProductFactory(product=unchanged, price=Decimal("9.00")),
+            OfficeProductFactory(product=changed, price=Decimal("10.00")),
+            OfficeProductFactory(product=changed, price=Decimal("10.00")),
+        ]
+        vendor_products = [
+            make_dental_city_product("1", Decimal("10.001")),
+            make_dental_city_product("2", Decimal("12.50"), manufacturer_special="Buy 2 get 1"),
+        ]
+
+        result = asyncio.run(update_products(SupportedVendor.DentalCity, vendor_products))
+        assert result == {
+            "products": 2,
+            "changed_products": 1,
+            "changed_promotions": 1,
+            "changed_office_products": 3,
+        }
+        unchanged.refresh_from_db()
+        changed.refresh_from_db()
+        parent.refresh_from_db()
+        assert unchanged.last_price_updated == last_updated
+        assert changed.price == Decimal("12.50")
+        assert parent.promotion_description == "Buy 2 get 1"
+        assert parent.is_special_offer
+        for office_product in office_products:
+            office_product.refresh_from_db()
+        assert [office_product.price for office_product in office_products] == [
+            Decimal("10.00"),
+            Decimal("12.50"),
+            Decimal("12.50"),
+        ]
+
+        result = asyncio.run(update_products(SupportedVendor.DentalCity, vendor_products))
+        assert result == {
+            "products": 2,
+            "changed_products": 0,
+            "changed_promotions": 0,
+            "changed_office_products": 0,
+        }
+        assert Product.objects.get(pk=changed.pk).updated_at == changed.updated_at
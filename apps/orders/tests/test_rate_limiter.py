@@ -0,0 +1,49 @@
+import asyncio
+
+from django.test import override_settings
+
+from apps.orders.rate_limiter import (
+    ADDITIVE_INCREASE,
+    DEFAULT_PENALTY,
+    LocalBucket,
+    VendorRateLimiter,
+)
+from apps.vendor_clients.async_clients.base import parse_retry_after
+
+
+def test_bucket_waits_for_next_token():
+    bucket = LocalBucket(rate=2, burst=1)
+    assert bucket.acquire(100.0) == 0
+    assert bucket.acquire(100.0) == 0.5
+    assert bucket.acquire(100.5) == 0
+
+
+def test_bucket_slows_down_on_too_many_requests():
+    bucket = LocalBucket(rate=4, burst=1)
+    assert bucket.feedback(100.0, 0.5, 8, False, 10) == 2
+    # concurrent rejections count as one slow down signal
+    assert bucket.feedback(100.1, 0.5, 8, False, 5) == 2
+    assert bucket.acquire(105.0) == 5
+    assert bucket.acquire(110.0) == 0
+    assert bucket.acquire(110.0) == 0.5
+    assert bucket.feedback(111.0, 0.5, 8, True, 0) == 2 + ADDITIVE_INCREASE / 2
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") is None
+
+
+@override_settings(REDIS_URL=None)
+def test_rate_limiter_without_redis():
+    limiter = VendorRateLimiter("net_32", rate=1)
+
+    async def run():
+        await limiter.acquire()
+        await limiter.on_too_many_requests()
+        return limiter.local_bucket.blocked_until - limiter.local_bucket.decreased_at
+
+    assert asyncio.run(run()) == DEFAULT_PENALTY
+    assert limiter.rate == 0.5
@@ -0,0 +1,246 @@
+import asyncio
+import datetime
+import time
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from result import Ok
+
+from apps.accounts.factories import OfficeFactory, VendorFactory
+from apps.accounts.models import Vendor
+from apps.orders.factories import ProductFactory
+from apps.orders.models import OfficeProduct, Product
+from apps.orders.tests.factories import OfficeProductFactory
+from apps.orders.types import ProcessTask, ProductCursor
+from apps.orders.updater import STATUS_EXHAUSTED, RefreshWorker, Updater, WriteBuffer
+from apps.vendor_clients.async_clients.base import PriceInfo, ProductPriceUpdateResult
+from apps.vendor_clients.errors import VendorAuthenticationFailed
+
+
+class WriteBufferTestCase(TransactionTestCase):
+    def test_flush(self):
+        products = ProductFactory.create_batch(3, price=Decimal("1.00"))
+        office_product = OfficeProductFactory(product=products[0], price=Decimal("1.00"))
+        now = timezone.now()
+
+        buffer = WriteBuffer()
+        for i, product in enumerate(products):
+            buffer.add(Product, "id", product.pk, price=Decimal(i + 10), last_price_updated=now)
+        buffer.add(OfficeProduct, "product", products[0].pk, price=Decimal("10.00"), last_price_updated=now)
+        # the latest update of a row wins, even with different fields
+        buffer.add(Product, "id", products[2].pk, product_vendor_status="Unavailable")
+        assert len(buffer) == 4
+
+        assert asyncio.run(buffer.flush()) == 4
+        assert len(buffer) == 0
+        assert list(
+            Product.objects.filter(pk__in=[p.pk for p in products]).order_by("pk").values_list("price", flat=True)
+        ) == [
+            Decimal("10.00"),
+            Decimal("11.00"),
+            Decimal("1.00"),
+        ]
+        assert Product.objects.get(pk=products[2].pk).product_vendor_status == "Unavailable"
+        office_product.refresh_from_db()
+        assert office_product.price == Decimal("10.00")
+        assert office_product.last_price_updated == now
+
+    def test_failed_flush_keeps_the_rows(self):
+        products = ProductFactory.create_batch(2, price=Decimal("1.00"))
+        buffer = WriteBuffer()
+        buffer.add(Product, "id", products[0].pk, price=Decimal("10.00"))
+        buffer.add(Product, "id", products[1].pk, price=Decimal("11.00"))
+
+        async def flush_while_updating():
+            flush = asyncio.create_task(buffer.flush())
+            await asyncio.sleep(0)
+            # a newer update of a row being written
+            buffer.add(Product, "id", products[1].pk, product_vendor_status="Unavailable")
+            await flush
+
+        with mock.patch.object(WriteBuffer, "_write", side_effect=DatabaseError):
+            with pytest.raises(DatabaseError):
+                asyncio.run(flush_while_updating())
+        assert len(buffer) == 2
+
+        assert asyncio.run(buffer.flush()) == 2
+        product = Product.objects.get(pk=products[1].pk)
+        assert (product.price, product.product_vendor_status) == (Decimal("1.00"), "Unavailable")
+        assert Product.objects.get(pk=products[0].pk).price == Decimal("10.00")
+
+
+def test_flusher_keeps_flushing_after_a_failure():
+    async def run():
+        updater = Updater(vendor=Vendor(slug="henry_schein"))
+        flush = mock.AsyncMock(side_effect=[DatabaseError, 1, 1])
+        updater.write_buffer = mock.MagicMock(flush=flush)
+        with mock.patch("apps.orders.updater.FLUSH_INTERVAL", 0):
+            flusher = asyncio.create_task(updater.flusher())
+
+            async def flushed():
+                while flush.await_count < 3:
+                    await asyncio.sleep(0)
+
+            try:
+                await asyncio.wait_for(flushed(), timeout=1)
+            finally:
+                flusher.cancel()
+
+    asyncio.run(run())
+
+
+class GetProductsTestCase(TestCase):
+    def test_keyset_pagination(self):
+        vendor = VendorFactory(slug="henry_schein")
+        office = OfficeFactory()
+        now = timezone.now()
+        expired = [
+            OfficeProductFactory(
+                office=office,
+                vendor=vendor,
+                is_inventory=i % 3 == 0,
+                price_expiration=now - datetime.timedelta(days=i % 4),
+                product_vendor_status="Active",
+            )
+            for i in range(10)
+        ]
+        OfficeProductFactory(office=office, vendor=vendor, price_expiration=now + datetime.timedelta(days=1))
+
+        updater = Updater(vendor=vendor, office_id=office.id)
+        cursor, pages = None, []
+        while products := updater.get_products(cursor, limit=3):
+            pages.append(products)
+            last = products[-1]
+            cursor = ProductCursor(last._priority, last.price_expiration, last.id)
+
+        assert [len(page) for page in pages] == [3, 3, 3, 1]
+        ids = [product.id for page in pages for product in page]
+        expected = sorted(expired, key=lambda p: (not p.is_inventory, p.price_expiration, p.id))
+        assert ids == [product.id for product in expected]
+
+
+class FakeRateLimiter:
+    rate = 1
+
+    async def acquire(self):
+        pass
+
+    async def on_success(self):
+        pass
+
+    async def on_too_many_requests(self, retry_after=None):
+        pass
+
+
+class FailingClient:
+    logged_in_at = None
+
+    async def login(self):
+        pass
+
+    def can_check_session(self):
+        return False
+
+    async def get_batch_product_prices(self, products):
+        raise ValueError("Vendor is down")
+
+
+class ExpiringSessionClient(FailingClient):
+    """The session expires after a few requests, it is only renewed by logging in again"""
+
+    def __init__(self, requests_per_session):
+        self.requests_per_session = requests_per_session
+        self.requests = 0
+        self.logins = 0
+
+    async def login(self):
+        if self.logged_in_at:
+            return
+        self.logged_in_at = time.monotonic()
+        self.logins += 1
+        self.requests = 0
+
+    async def get_batch_product_prices(self, products):
+        self.requests += 1
+        if self.requests > self.requests_per_session:
+            raise VendorAuthenticationFailed()
+        price_info = PriceInfo(price=Decimal("10.00"), product_vendor_status="Active")
+        return [ProductPriceUpdateResult(product=product, result=Ok(price_info)) for product in products]
+
+
+def test_reschedule_onto_a_full_queue():
+    async def run():
+        updater = Updater(vendor=Vendor(slug="henry_schein"))
+        updater.rate_limiter = FakeRateLimiter()
+        updater.batch_size = 1
+        updater.to_process = asyncio.Queue(maxsize=2)
+        updater.concurrency = asyncio.Semaphore(2)
+        consumer = asyncio.create_task(updater.consumer(FailingClient()))
+
+        async def produce():
+            for i in range(6):
+                await updater.to_process.put(ProcessTask(OfficeProduct(id=i, is_inventory=False)))
+            await updater.to_process.join()
+
+        try:
+            # the failed batches are rescheduled while the queue is full
+            await asyncio.wait_for(produce(), timeout=5)
+        finally:
+            consumer.cancel()
+        return updater
+
+    updater = asyncio.run(run())
+    rows = next(
+        rows for (model, key_field, fields), rows in updater.write_buffer.rows.items() if model is OfficeProduct
+    )
+    assert sorted(rows) == list(range(6))
+    assert {values[0] for values in rows.values()} == {STATUS_EXHAUSTED}
+
+
+def test_expired_session_is_renewed():
+    async def run():
+        updater = Updater(vendor=Vendor(slug="henry_schein"))
+        updater.rate_limiter = FakeRateLimiter()
+        updater.batch_size = 1
+        client = ExpiringSessionClient(requests_per_session=2)
+        consumer = asyncio.create_task(updater.consumer(client))
+        try:
+            for i in range(6):
+                await updater.to_process.put(ProcessTask(OfficeProduct(id=i, is_inventory=False)))
+            await asyncio.wait_for(updater.to_process.join(), timeout=5)
+        finally:
+            consumer.cancel()
+        return updater, client
+
+    updater, client = asyncio.run(run())
+    assert client.logins > 1
+    rows = next(
+        rows for (model, key_field, fields), rows in updater.write_buffer.rows.items() if model is OfficeProduct
+    )
+    # every product got its price, none of them was given up because of the expired session
+    assert sorted(rows) == list(range(6))
+    assert STATUS_EXHAUSTED not in {value for values in rows.values() for value in values}
+
+
+class BrokenRateLimiter(FakeRateLimiter):
+    async def acquire(self):
+        raise ValueError("Redis is down")
+
+
+def test_refresh_worker_fails_when_the_consumer_stops():
+    async def run():
+        worker = RefreshWorker(vendor=Vendor(slug="net_32"), office_id=1)
+        worker.rate_limiter = BrokenRateLimiter()
+        product = OfficeProduct(id=1, is_inventory=False, price_expiration=timezone.now())
+        product._priority = False
+        worker.get_products = mock.Mock(side_effect=[[product], []])
+        worker.get_client = mock.AsyncMock(return_value=FailingClient())
+        await asyncio.wait_for(worker.run(max_cycles=1), timeout=5)
+
+    with pytest.raises(RuntimeError, match="consumer") as exc_info:
+        asyncio.run(run())
+    assert isinstance(exc_info.value.__cause__, ValueError)
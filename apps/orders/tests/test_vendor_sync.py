@@ -0,0 +1,76 @@
+import asyncio
+import datetime
+from unittest import mock
+
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from apps.accounts.factories import OfficeFactory, OfficeVendorFactory, VendorFactory
+from apps.accounts.models import OfficeVendor, Subscription
+from apps.orders.tasks import sync_vendor_orders, sync_with_vendors
+from apps.scrapers.base import Scraper
+from apps.scrapers.errors import VendorAuthenticationFailed
+
+USERNAMES = {0: "locked", 1: "partial"}
+
+
+class FakeScraper(Scraper):
+    running = 0
+    max_running = 0
+
+    async def get_orders(self, office=None, **kwargs):
+        FakeScraper.running += 1
+        FakeScraper.max_running = max(FakeScraper.max_running, FakeScraper.running)
+        await asyncio.sleep(0.01)
+        FakeScraper.running -= 1
+        if self.username == "locked":
+            raise VendorAuthenticationFailed()
+        if self.username == "partial":
+            return self.collect_orders([ValueError("order page changed")])
+        return []
+
+
+class VendorSyncTests(TransactionTestCase):
+    def setUp(self) -> None:
+        self.henry_schein = VendorFactory(slug="henry_schein")
+        self.darby = VendorFactory(slug="darby")
+        self.office_vendors = []
+        for i in range(5):
+            office = OfficeFactory()
+            Subscription.objects.create(office=office, subscription_id=f"sub{i}", start_on=datetime.date(2023, 1, 1))
+            self.office_vendors.append(
+                OfficeVendorFactory(office=office, vendor=self.henry_schein, username=USERNAMES.get(i, f"u{i}"))
+            )
+            if i < 2:
+                OfficeVendorFactory(office=office, vendor=self.darby, username=f"u{i}")
+        FakeScraper.running = FakeScraper.max_running = 0
+
+    @mock.patch("apps.orders.tasks.sync_vendor_orders.delay")
+    def test_vendors_are_synced_in_separate_tasks(self, delay):
+        sync_with_vendors()
+
+        dispatched = {args[0]: sorted(args[1]) for args, _ in delay.call_args_list}
+        self.assertEqual(set(dispatched), {"henry_schein", "darby"})
+        self.assertEqual(dispatched["henry_schein"], sorted(ov.id for ov in self.office_vendors))
+        self.assertEqual(len(dispatched["darby"]), 2)
+
+    @mock.patch("apps.orders.tasks.ScraperFactory.create_scraper")
+    def test_sync_vendor_orders(self, create_scraper):
+        create_scraper.side_effect = lambda vendor, session, username, password: FakeScraper(
+            session, vendor, username, password
+        )
+
+        report = sync_vendor_orders("henry_schein", [ov.id for ov in self.office_vendors])
+
+        self.assertEqual(
+            {key: report[key] for key in ("vendor", "synced", "failed", "authentication_failed")},
+            {"vendor": "henry_schein", "synced": 4, "failed": 1, "authentication_failed": 1},
+        )
+        self.assertEqual(FakeScraper.max_running, 2)
+        synced_on = dict(
+            OfficeVendor.objects.filter(vendor=self.henry_schein).values_list("username", "order_history_synced_on")
+        )
+        self.assertIsNone(synced_on.pop("locked"))
+        # the failed order is requested again by the next sync
+        self.assertIsNone(synced_on.pop("partial"))
+        self.assertEqual(set(synced_on.values()), {timezone.localtime().date()})
@@ -0,0 +1,15 @@
+from django.db import connection
+
+# Tests run without migrations, so the triggers that keep these columns up to date are not installed
+UPDATE_PRODUCT_SEARCH_DATA_SQL = """
+UPDATE orders_product p
+SET search_vector = to_tsvector('english', name),
+    vendors = (SELECT coalesce(array_agg(c.vendor_id), '{}') FROM orders_product c WHERE c.parent_id = p.id),
+    child_count = (SELECT count(*) FROM orders_product c WHERE c.parent_id = p.id)
+"""
+
+
+def update_product_search_data():
+    """Fill the search vector, vendors and child count of all products"""
+    with connection.cursor() as cursor:
+        cursor.execute(UPDATE_PRODUCT_SEARCH_DATA_SQL)
@@ -10,6 +10,7 @@ class VendorParams(NamedTuple):
     request_rate: float
     batch_size: int = 1
     needs_login: bool = True
+    max_concurrency: int = 2
 
 
 class ProcessTask(NamedTuple):
@@ -17,6 +18,14 @@ class ProcessTask(NamedTuple):
     attempt: int = 0
 
 
+class ProductCursor(NamedTuple):
+    """Position of the last refreshed product, in the (priority desc, price_expiration, id) order"""
+
+    priority: bool
+    price_expiration: datetime.datetime
+    id: int
+
+
 class ProcessResult(NamedTuple):
     timestamp: datetime.datetime
     success: bool
@@ -1,20 +1,30 @@
 import asyncio
 import datetime
 import logging
-import random
 import time
 from asyncio import Queue
 from collections import deque
-from typing import Deque, Dict, List, Union
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple, Type, Union
 
 from aiohttp import ClientSession
 from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import BooleanField, F, Model, Q
+from django.db.models.expressions import RawSQL
 from django.db.models.functions import Now
 from django.utils import timezone
 
 from apps.accounts.models import OfficeVendor, Vendor
+from apps.common.utils import bulk_update_from_values
 from apps.orders.models import OfficeProduct, Product
-from apps.orders.types import ProcessResult, ProcessTask, Stats, VendorParams
+from apps.orders.rate_limiter import VendorRateLimiter
+from apps.orders.types import (
+    ProcessResult,
+    ProcessTask,
+    ProductCursor,
+    Stats,
+    VendorParams,
+)
 from apps.vendor_clients.async_clients import BaseClient
 from apps.vendor_clients.async_clients.base import (
     EmptyResults,
@@ -22,6 +32,7 @@ from apps.vendor_clients.async_clients.base import (
     ProductPriceUpdateResult,
     TooManyRequests,
 )
+from apps.vendor_clients.errors import VendorAuthenticationFailed
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +42,14 @@ STATUS_EXHAUSTED = "Exhausted"
 STATUS_ACTIVE = "Active"
 
 BULK_SIZE = 500
+# How long to wait for more products before sending an incomplete batch
+BATCH_FILL_TIMEOUT = 0.5
+# How often buffered price updates are written to the database
+FLUSH_INTERVAL = 5
+# How long the refresh worker waits when there is nothing to refresh
+IDLE_INTERVAL = 60
+# How often the refresh worker logs its stats
+STATS_INTERVAL = 60
 
 
 INVENTORY_AGE_DEFAULT = datetime.timedelta(days=1)
@@ -47,6 +66,7 @@ VENDOR_PARAMS: Dict[str, VendorParams] = {
         batch_size=1,
         request_rate=1.5,
         needs_login=False,
+        max_concurrency=3,
     ),
     "henry_schein": VendorParams(
         inventory_age=datetime.timedelta(days=7),
@@ -54,6 +74,7 @@ VENDOR_PARAMS: Dict[str, VendorParams] = {
         batch_size=20,
         request_rate=5,
         needs_login=True,
+        max_concurrency=4,
     ),
     "benco": VendorParams(
         inventory_age=datetime.timedelta(days=14),
@@ -61,6 +82,7 @@ VENDOR_PARAMS: Dict[str, VendorParams] = {
         batch_size=20,
         request_rate=5,
         needs_login=True,
+        max_concurrency=4,
     ),
     "darby": VendorParams(
         inventory_age=datetime.timedelta(days=14),
@@ -180,6 +202,59 @@ class StatBuffer:
         )
 
 
+class WriteBuffer:
+    """
+    Collects row updates in memory and writes them with a single UPDATE ... FROM (VALUES ...)
+    per table and set of fields. The latest values win when a row is updated several times.
+    """
+
+    def __init__(self):
+        self.rows: Dict[Tuple[Type[Model], str, Tuple[str, ...]], Dict[Any, tuple]] = {}
+
+    def __len__(self):
+        return sum(len(rows) for rows in self.rows.values())
+
+    def add(self, model_class: Type[Model], key_field: str, key: Any, **fields):
+        group = (model_class, key_field, tuple(fields))
+        for other_group, rows in self.rows.items():
+            if other_group != group and other_group[:2] == group[:2]:
+                rows.pop(key, None)
+        self.rows.setdefault(group, {})[key] = tuple(fields.values())
+
+    async def flush(self) -> int:
+        rows, self.rows = self.rows, {}
+        if not rows:
+            return 0
+        try:
+            return await sync_to_async(self._write)(rows)
+        except Exception:
+            self.restore(rows)
+            raise
+
+    def restore(self, rows):
+        """Put back rows that failed to be written, the rows added since then are newer and win"""
+        newer_rows, self.rows = self.rows, rows
+        for (model_class, key_field, fields), values in newer_rows.items():
+            for key, field_values in values.items():
+                self.add(model_class, key_field, key, **dict(zip(fields, field_values)))
+
+    @staticmethod
+    def _write(rows) -> int:
+        updated = 0
+        with transaction.atomic():
+            for (model_class, key_field, fields), values in rows.items():
+                updated += bulk_update_from_values(
+                    model_class,
+                    key_field,
+                    list(fields),
+                    [(key, *field_values) for key, field_values in values.items()],
+                    batch_size=BULK_SIZE,
+                    only_changed=False,
+                )
+        logger.debug("Flushed %s rows", updated)
+        return updated
+
+
 class Updater:
     attempt_threshold = 3
 
@@ -191,9 +266,10 @@ class Updater:
         self.to_process: Queue[ProcessTask] = Queue(maxsize=20)
         self._crendentials = None
         self.statbuffer = StatBuffer()
-        self.target_rate = self.vendor_params.request_rate
-        self.last_check: float = time.monotonic()
-        self.errors = 0
+        self.rate_limiter = VendorRateLimiter(vendor.slug, self.vendor_params.request_rate)
+        self.concurrency = asyncio.Semaphore(self.vendor_params.max_concurrency)
+        self.in_flight: Set[asyncio.Task] = set()
+        self.write_buffer = WriteBuffer()
         self.office_id = office_id
 
     async def get_credentials(self):
@@ -204,23 +280,32 @@ class Updater:
             self._crendentials = await qs.values("username", "password").afirst()
         return self._crendentials
 
-    def get_products(self):
+    def get_products(self, cursor: Optional[ProductCursor] = None, limit: int = BULK_SIZE):
+        """
+        Return the next expired products, inventory products first then the oldest price_expiration.
+        cursor is the position of the last product of the previous page (keyset pagination)
+        """
         if self.office_id:
             products = (
                 OfficeProduct.objects.select_related("product")
                 .filter(office_id=self.office_id, vendor=self.vendor, price_expiration__lt=Now())
-                .exclude(product_vendor_status__in=(STATUS_EXHAUSTED,))
-                .order_by("-is_inventory", "price_expiration")
+                .annotate(_priority=F("is_inventory"))
             )
         else:
             products = (
                 Product.objects.all()
                 .with_inventory_refs()
                 .filter(vendor=self.vendor, price_expiration__lt=Now())
-                .exclude(product_vendor_status__in=(STATUS_EXHAUSTED,))
-                .order_by("-_inventory_refs", "price_expiration")
+                .annotate(_priority=RawSQL("inventory_refs > 0", (), output_field=BooleanField()))
+            )
+        products = products.exclude(product_vendor_status__in=(STATUS_EXHAUSTED,))
+        if cursor:
+            products = products.filter(
+                Q(_priority__lt=cursor.priority)
+                | Q(_priority=cursor.priority, price_expiration__gt=cursor.price_expiration)
+                | Q(_priority=cursor.priority, price_expiration=cursor.price_expiration, id__gt=cursor.id)
             )
-        return list(products[:BULK_SIZE])
+        return list(products.order_by("-_priority", "price_expiration", "id")[:limit])
 
     async def producer(self):
         logger.debug("Started producer...")
@@ -233,7 +318,55 @@ class Updater:
             self.producer_started.set()
 
     async def process(self, client: BaseClient, tasks: List[ProcessTask]):
-        results: List[ProductPriceUpdateResult] = await client.get_batch_product_prices([pt.product for pt in tasks])
+        retries: List[ProcessTask] = []
+        try:
+            try:
+                retries = await self._process(client, tasks)
+            finally:
+                # the slot is released before rescheduling, the consumer needs it to make room in the queue
+                self.concurrency.release()
+            for pt in retries:
+                await self.reschedule(pt)
+        finally:
+            for _ in tasks:
+                self.to_process.task_done()
+
+    async def _process(self, client: BaseClient, tasks: List[ProcessTask]) -> List[ProcessTask]:
+        """Update the prices of the products and return the tasks to reschedule"""
+        retries = []
+        try:
+            results: List[ProductPriceUpdateResult] = await client.get_batch_product_prices(
+                [pt.product for pt in tasks]
+            )
+        except Exception as e:
+            logger.exception("Failed to fetch prices for %s products", len(tasks))
+            session_expired = await self.session_expired(client, [e])
+            for pt in tasks:
+                self.statbuffer.add_item(False)
+                # the products are not to blame for an expired session
+                retries.append(pt if session_expired else ProcessTask(pt.product, pt.attempt + 1))
+            return retries
+
+        errors = [
+            r.result.value
+            for r in results
+            if r.result.is_err() and not isinstance(r.result.value, (TooManyRequests, EmptyResults))
+        ]
+        if results and len(errors) == len(results) and await self.session_expired(client, errors):
+            for pt in tasks:
+                self.statbuffer.add_item(False)
+            return list(tasks)
+
+        too_many_requests = [
+            r.result.value for r in results if r.result.is_err() and isinstance(r.result.value, TooManyRequests)
+        ]
+        if too_many_requests:
+            await self.rate_limiter.on_too_many_requests(
+                max((exc.retry_after for exc in too_many_requests if exc.retry_after is not None), default=None)
+            )
+        elif results:
+            await self.rate_limiter.on_success()
+
         task_mapping = {pt.product.id: pt for pt in tasks}
         for process_result in results:
             product = process_result.product
@@ -245,7 +378,7 @@ class Updater:
                 if isinstance(exc, TooManyRequests):
                     attempt = task_mapping[product.id].attempt + 1
                     self.statbuffer.add_item(False)
-                    await self.reschedule(ProcessTask(product, attempt))
+                    retries.append(ProcessTask(product, attempt))
                 elif isinstance(exc, EmptyResults):
                     logger.debug("Marking product %s as empty", product.id)
                     self.statbuffer.add_item(True)
@@ -253,13 +386,32 @@ class Updater:
                 else:
                     attempt = task_mapping[product.id].attempt + 1
                     self.statbuffer.add_item(True)
-                    await self.reschedule(ProcessTask(product, attempt))
+                    retries.append(ProcessTask(product, attempt))
             task_mapping.pop(product.id)
 
         for _, pt in task_mapping.items():
             await self.mark_status(pt.product, pt.product.product_vendor_status)
-        for _ in tasks:
-            self.to_process.task_done()
+        return retries
+
+    async def session_expired(self, client: BaseClient, errors: List[Exception]) -> bool:
+        """
+        Check if the errors of a whole batch come from an expired vendor session,
+        the consumer then logs in again before the next batch
+        """
+        if not self.vendor_params.needs_login:
+            return False
+        if not any(isinstance(error, VendorAuthenticationFailed) for error in errors):
+            if not client.can_check_session():
+                return False
+            try:
+                if await client.check_session():
+                    return False
+            except Exception:
+                logger.exception("Failed to check the %s session", self.vendor.slug)
+                return False
+        logger.warning("The %s session expired, logging in again", self.vendor.slug)
+        client.logged_in_at = None
+        return True
 
     async def reschedule(self, pt: ProcessTask):
         if pt.attempt > self.attempt_threshold:
@@ -277,12 +429,11 @@ class Updater:
             "price_expiration": current_time + get_vendor_age(self.vendor, product),
         }
         if isinstance(product, Product):
-            await Product.objects.filter(
-                pk=product.pk,
-            ).aupdate(**update_fields)
-            await OfficeProduct.objects.filter(product_id=product.pk).aupdate(**update_fields)
+            self.write_buffer.add(Product, "id", product.pk, **update_fields)
+            self.write_buffer.add(OfficeProduct, "product", product.pk, **update_fields)
         else:
-            await OfficeProduct.objects.filter(id=product.pk).aupdate(**update_fields)
+            self.write_buffer.add(OfficeProduct, "id", product.pk, **update_fields)
+        await self.maybe_flush()
 
     async def update_price(self, product: Union[Product, OfficeProduct], price_info: PriceInfo):
         update_time = timezone.localtime()
@@ -297,24 +448,35 @@ class Updater:
             data = {"special_price": price_info.special_price, "is_special_offer": price_info.is_special_offer}
             if price_info.sku_code:
                 data["sku"] = price_info.sku_code
-            await Product.objects.filter(pk=product.pk).aupdate(**data, **update_fields)
-            await OfficeProduct.objects.filter(product_id=product.pk).aupdate(**update_fields)
+            self.write_buffer.add(Product, "id", product.pk, **data, **update_fields)
+            self.write_buffer.add(OfficeProduct, "product", product.pk, **update_fields)
         elif isinstance(product, OfficeProduct):
-            await OfficeProduct.objects.filter(id=product.pk).aupdate(**update_fields)
+            self.write_buffer.add(OfficeProduct, "id", product.pk, **update_fields)
+        await self.maybe_flush()
+
+    async def maybe_flush(self):
+        if len(self.write_buffer) >= BULK_SIZE:
+            await self.flush_write_buffer()
+
+    async def flush_write_buffer(self):
+        """Flush the write buffer, when writing fails the rows stay buffered for the next flush"""
+        try:
+            await self.write_buffer.flush()
+        except Exception:
+            logger.exception("Failed to flush %s buffered rows", len(self.write_buffer))
+
+    async def flusher(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self.flush_write_buffer()
 
     async def get_batch(self) -> List[ProcessTask]:
-        batch = []
-        sleeps = 0
+        batch = [await self.to_process.get()]
         while len(batch) < self.batch_size:
-            await asyncio.sleep(random.uniform(0.5, 1.5) / self.target_rate)
-            if sleeps > 3 and batch:
+            try:
+                batch.append(await asyncio.wait_for(self.to_process.get(), timeout=BATCH_FILL_TIMEOUT))
+            except asyncio.TimeoutError:
                 break
-            if not self.to_process.empty():
-                item = await self.to_process.get()
-                batch.append(item)
-                sleeps = 0
-            else:
-                sleeps += 1
         return batch
 
     async def get_client(self, session):
@@ -326,38 +488,152 @@ class Updater:
             username=credentials["username"],
             password=credentials["password"],
         )
+        await self.login(client)
+        return client
+
+    async def login(self, client: BaseClient):
         if self.vendor_params.needs_login:
+            # the session is reused for SESSION_TTL, then it is checked or logged in again
             await client.login()
-        return client
 
     async def consumer(self, client):
         logger.debug("Started consumer")
         while True:
             batch = await self.get_batch()
-            asyncio.create_task(self.process(client, batch))
-            stats = self.statbuffer.stats()
-            logger.debug("Stats: %s", stats)
-            if stats.total > 10 and time.monotonic() - self.last_check > 20:
-                if stats.error_rate > 0:
-                    self.errors += 1
-                    self.target_rate /= 1.05
-                else:
-                    self.target_rate *= 1 + 0.05 / (self.errors + 1)
-                self.last_check = time.monotonic()
-                logger.debug("New target rate: %s", self.target_rate)
+            await self.login(client)
+            await self.concurrency.acquire()
+            await self.rate_limiter.acquire()
+            task = asyncio.create_task(self.process(client, batch))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+            logger.debug("Stats: %s, rate: %.2f", self.statbuffer.stats(), self.rate_limiter.rate)
 
     async def complete(self):
         await self.producer_started.wait()
         await self.to_process.join()
 
+    async def watch(self, coro, tasks: List[asyncio.Task]):
+        """Run coro while the background tasks are running, fail if one of them stops"""
+        work = asyncio.ensure_future(coro)
+        await asyncio.wait([work, *tasks], return_when=asyncio.FIRST_COMPLETED)
+        if work.done():
+            return work.result()
+        work.cancel()
+        stopped = next(task for task in tasks if task.done())
+        error = None if stopped.cancelled() else stopped.exception()
+        raise RuntimeError(f"The {stopped.get_name()} of the {self.vendor.slug} updater stopped") from error
+
     async def fetch(self):
         logger.debug("Getting credentials")
         async with ClientSession() as session:
             client = await self.get_client(session)
-            worker_task = asyncio.create_task(self.consumer(client))
+            worker_task = asyncio.create_task(self.consumer(client), name="consumer")
+            flusher_task = asyncio.create_task(self.flusher(), name="flusher")
             asyncio.create_task(self.producer())
-            await self.complete()
-            worker_task.cancel()
+            try:
+                await self.watch(self.complete(), [worker_task, flusher_task])
+            finally:
+                worker_task.cancel()
+                flusher_task.cancel()
+                await self.write_buffer.flush()
+
+
+class RefreshWorker(Updater):
+    """
+    Long running version of Updater.
+
+    It keeps the same session for its whole life and logs in again when the session expires. Every cycle
+    walks through all the expired products with keyset pagination, in the same priority order as Updater,
+    so the backlog drains continuously instead of BULK_SIZE products per Celery task.
+    """
+
+    def __init__(self, vendor: Vendor, office_id: str = None, idle_interval: float = IDLE_INTERVAL):
+        super().__init__(vendor, office_id)
+        self.idle_interval = idle_interval
+        self.started_at = time.monotonic()
+        self.processed = 0
+        self.cycles = 0
+
+    async def process(self, client: BaseClient, tasks: List[ProcessTask]):
+        await super().process(client, tasks)
+        self.processed += len(tasks)
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        recent = self.statbuffer.stats()
+        return {
+            "vendor": self.vendor.slug,
+            "office": self.office_id,
+            "cycles": self.cycles,
+            "processed": self.processed,
+            "average_rate": self.processed / elapsed if elapsed else None,
+            "recent_rate": recent.rate,
+            "recent_error_rate": recent.error_rate,
+            "target_rate": self.rate_limiter.rate,
+            "queued": self.to_process.qsize(),
+            "in_flight": len(self.in_flight),
+        }
+
+    async def report_stats(self):
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            logger.info("Refresh stats: %s", self.stats())
+
+    async def refresh_cycle(self) -> int:
+        cursor = None
+        total = 0
+        while True:
+            products = await sync_to_async(self.get_products)(cursor)
+            if not products:
+                break
+            for product in products:
+                await self.to_process.put(ProcessTask(product))
+            total += len(products)
+            last = products[-1]
+            cursor = ProductCursor(last._priority, last.price_expiration, last.id)
+        await self.to_process.join()
+        await self.write_buffer.flush()
+        return total
+
+    async def run(self, max_cycles: Optional[int] = None):
+        async with ClientSession() as session:
+            client = await self.get_client(session)
+            tasks = [
+                asyncio.create_task(self.consumer(client), name="consumer"),
+                asyncio.create_task(self.flusher(), name="flusher"),
+                asyncio.create_task(self.report_stats(), name="stats reporter"),
+            ]
+            try:
+                while max_cycles is None or self.cycles < max_cycles:
+                    total = await self.watch(self.refresh_cycle(), tasks)
+                    self.cycles += 1
+                    logger.info("Refreshed %s products in cycle #%s: %s", total, self.cycles, self.stats())
+                    if not total and (max_cycles is None or self.cycles < max_cycles):
+                        await asyncio.sleep(self.idle_interval)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await self.write_buffer.flush()
+
+
+async def refresh_vendor(
+    slug: str, office_ids: Optional[List[str]] = None, max_cycles: Optional[int] = None, idle_interval=IDLE_INTERVAL
+):
+    """Run one refresh worker per office connected to the vendor"""
+    vendor = await Vendor.objects.aget(slug=slug)
+    if not office_ids:
+        office_ids = [
+            office_id
+            async for office_id in OfficeVendor.objects.filter(vendor=vendor).values_list("office_id", flat=True)
+        ]
+    workers = [
+        RefreshWorker(vendor=vendor, office_id=office_id, idle_interval=idle_interval) for office_id in office_ids
+    ]
+    results = await asyncio.gather(*(worker.run(max_cycles) for worker in workers), return_exceptions=True)
+    for worker, result in zip(workers, results):
+        if isinstance(result, Exception):
+            logger.error("Refresh worker for office %s failed: %r", worker.office_id, result)
+    return [worker.stats() for worker in workers]
 
 
 async def fetch_for_vendor(slug, office_id):
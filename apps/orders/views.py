@@ -6,6 +6,7 @@ import operator
 import os
 import tempfile
 import zipfile
+from collections import defaultdict
 from dataclasses import asdict
 from datetime import timedelta
 from decimal import Decimal
@@ -17,11 +18,11 @@ from asgiref.sync import sync_to_async
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.contrib.postgres.aggregates import ArrayAgg
-from django.core.paginator import Paginator
 from django.db import transaction
 from django.db.models import (
     Case,
     Count,
+    DecimalField,
     Exists,
     F,
     OuterRef,
@@ -70,15 +71,21 @@ from apps.common.pagination import (
     SearchProductPagination,
     SearchProductV2Pagination,
     StandardResultsSetPagination,
+    decode_cursor,
+    encode_cursor,
 )
 from apps.common.utils import (
+    estimate_count,
     get_date_range,
     get_week_count,
     group_products_from_search_result,
 )
 from apps.orders.helpers import OfficeProductHelper, ProcedureHelper, ProductHelper
 from apps.orders.services.order import OrderService
+from apps.orders.services.pricing import resolve_prices, to_product_prices
 from apps.orders.services.product import ProductService
+from apps.orders.services.product_suggestion import suggest_products
+from apps.orders.services.search_cache import ProductSearchCache
 from apps.scrapers.amazonsearch import AmazonSearchScraper
 from apps.scrapers.ebay_search import EbaySearch
 from apps.scrapers.errors import VendorNotSupported
@@ -94,7 +101,7 @@ from services.api_client import (
 )
 from services.opendental import OpenDentalClient
 
-from ..audit.models import SearchHistory
+from ..audit.search_history import record_search
 from . import filters as f
 from . import models as m
 from . import permissions as p
@@ -105,6 +112,8 @@ from .parsers import XMLParser
 from .tasks import notify_order_creation, perform_real_order, search_and_group_products
 
 logger = logging.getLogger(__name__)
+# Vendors that don't confirm an order in time are left out of it, so one slow vendor doesn't hold back checkout
+VENDOR_CONFIRM_TIMEOUT = 30
 
 
 class OrderViewSet(AsyncMixin, ModelViewSet):
@@ -215,6 +224,20 @@ class OrderViewSet(AsyncMixin, ModelViewSet):
             m.VendorOrder.objects.bulk_update(vendor_orders, fields=["nickname"])
         return super().update(request, *args, **kwargs)
 
+    @action(detail=True, methods=["get"], url_path="placement-status")
+    def placement_status(self, request, *args, **kwargs):
+        """Progress of placing the order on the vendor sites, polled by the client after confirming an order"""
+        order = get_object_or_404(m.Order, pk=kwargs["pk"], office_id=self.kwargs["office_pk"])
+        vendor_orders = order.vendor_orders.select_related("vendor").order_by("id")
+        in_progress = (m.VendorOrder.PlacementStatus.PENDING, m.VendorOrder.PlacementStatus.IN_PROGRESS)
+        return Response(
+            {
+                "order": order.id,
+                "complete": all(vendor_order.placement_status not in in_progress for vendor_order in vendor_orders),
+                "vendor_orders": s.VendorOrderPlacementSerializer(vendor_orders, many=True).data,
+            }
+        )
+
     @action(detail=True, methods=["post"], permission_classes=[p.OrderApprovalPermission])
     async def approve(self, request, *args, **kwargs):
         serializer = s.OrderApprovalSerializer(data=request.data)
@@ -758,12 +781,27 @@ def get_office_vendor(office_pk, vendor_pk):
 
 
 def get_cart(office_pk):
+    office_product_price = OfficeProduct.objects.filter(office_id=office_pk, product_id=OuterRef("pk")).values(
+        "price"
+    )
+    office_product_is_inventory = OfficeProduct.objects.filter(
+        office_id=office_pk, product_id=OuterRef("product_id")
+    ).values("is_inventory")
+    child_prefetch_queryset = (
+        Product.objects.annotate(office_product_price=Subquery(office_product_price[:1]))
+        .annotate(product_price=Coalesce(F("office_product_price"), F("price")))
+        .prefetch_related("images", "category", "vendor")
+    )
     cart_products = (
         m.Cart.objects.filter(office_id=office_pk, save_for_later=False, instant_checkout=True)
         .order_by("-updated_at")
+        .annotate(item_inventory=Subquery(office_product_is_inventory[:1]))
         .select_related("product")
         .select_related("product__vendor")
+        .select_related("product__category")
         .select_related("promotion")
+        .prefetch_related("product__images", Prefetch("product__parent__children", child_prefetch_queryset))
+        .with_updated_unit_price()
     )
     if not cart_products:
         return cart_products, []
@@ -1000,82 +1038,109 @@ class CartViewSet(AsyncMixin, AsyncCreateModelMixin, ModelViewSet):
     ):
         order_date = timezone.localtime().date()
         office = office_vendors[0].office
-        vendor_order_ids = []
-        office_vendor_ids = []
+        order_status = m.OrderStatus.PENDING_APPROVAL if approval_needed else m.OrderStatus.OPEN
+        product_status = m.ProductStatus.PENDING_APPROVAL if approval_needed else m.ProductStatus.PROCESSING
+        placement_status = None if approval_needed else m.VendorOrder.PlacementStatus.PENDING
+
+        vendor_cart_products = defaultdict(list)
+        for cart_product in cart_products:
+            vendor_cart_products[cart_product.product.vendor_id].append(cart_product)
+
+        ordered_vendors = []
+        failed_vendors = []
+        for office_vendor, vendor_order_result in zip(office_vendors, vendor_order_results):
+            if isinstance(vendor_order_result, dict):
+                ordered_vendors.append((office_vendor, vendor_order_result))
+                continue
+            logger.warning("Could not confirm order with %s: %r", office_vendor.vendor.slug, vendor_order_result)
+            failed_vendors.append(
+                {
+                    "vendor": office_vendor.vendor.slug,
+                    "reason": "timeout" if isinstance(vendor_order_result, asyncio.TimeoutError) else "error",
+                }
+            )
+        total_amount = sum(
+            float(vendor_order_result.get("total_amount", 0.0)) for _, vendor_order_result in ordered_vendors
+        )
+        total_items = sum(len(vendor_cart_products[office_vendor.vendor_id]) for office_vendor, _ in ordered_vendors)
+
+        dental_amount = {
+            BUDGET_SPEND_TYPE.DENTAL_SUPPLY_SPEND_BUDGET: 0.0,
+            BUDGET_SPEND_TYPE.FRONT_OFFICE_SUPPLY_SPEND_BUDGET: 0.0,
+            BUDGET_SPEND_TYPE.MISCELLANEOUS_SPEND_BUDGET: 0.0,
+        }
 
         with transaction.atomic():
             order = m.Order.objects.create(
                 office_id=self.kwargs["office_pk"],
                 created_by=self.request.user,
                 order_date=order_date,
-                status=m.OrderStatus.PENDING_APPROVAL if approval_needed else m.OrderStatus.OPEN,
+                status=order_status,
+                total_amount=total_amount,
+                total_items=total_items,
             )
-            total_amount = 0.0
-            total_items = 0.0
-
-            dental_amount = {
-                BUDGET_SPEND_TYPE.DENTAL_SUPPLY_SPEND_BUDGET: 0.0,
-                BUDGET_SPEND_TYPE.FRONT_OFFICE_SUPPLY_SPEND_BUDGET: 0.0,
-                BUDGET_SPEND_TYPE.MISCELLANEOUS_SPEND_BUDGET: 0.0,
-            }
 
-            for office_vendor, vendor_order_result in zip(office_vendors, vendor_order_results):
-                if not isinstance(vendor_order_result, dict):
-                    continue
-                office_vendor_ids.append(office_vendor.id)
-                vendor = office_vendor.vendor
-                shipping_option = shipping_options.get(vendor.slug)
+            # bulk_create skips the post_save signal, so the default shipping option is resolved here
+            vendor_orders = []
+            for office_vendor, vendor_order_result in ordered_vendors:
                 vendor_order_id = vendor_order_result.get("order_id", "")
                 if vendor_order_id is None:
                     vendor_order_id = "invalid"
-                vendor_total_amount = vendor_order_result.get("total_amount", 0.0)
-                total_amount += float(vendor_total_amount)
-                vendor_order_products = cart_products.filter(product__vendor=vendor)
-                total_items += (vendor_total_items := vendor_order_products.count())
-
-                vendor_order = m.VendorOrder.objects.create(
-                    order=order,
-                    vendor=office_vendor.vendor,
-                    vendor_order_id=vendor_order_id,
-                    total_amount=vendor_total_amount,
-                    total_items=vendor_total_items,
-                    currency="USD",
-                    order_date=order_date,
-                    status=m.OrderStatus.PENDING_APPROVAL if approval_needed else m.OrderStatus.OPEN,
-                    shipping_option=shipping_option,
+                shipping_option = shipping_options.get(office_vendor.vendor.slug)
+                vendor_orders.append(
+                    m.VendorOrder(
+                        order=order,
+                        vendor=office_vendor.vendor,
+                        vendor_order_id=vendor_order_id,
+                        total_amount=vendor_order_result.get("total_amount", 0.0),
+                        total_items=len(vendor_cart_products[office_vendor.vendor_id]),
+                        currency="USD",
+                        order_date=order_date,
+                        status=order_status,
+                        placement_status=placement_status,
+                        shipping_option_id=(
+                            shipping_option.pk if shipping_option else office_vendor.default_shipping_option_id
+                        ),
+                    )
                 )
-                vendor_order_ids.append(vendor_order.id)
-                objs = []
-                for vendor_order_product in vendor_order_products:
+            m.VendorOrder.objects.bulk_create(vendor_orders)
+            vendor_order_ids = [vendor_order.id for vendor_order in vendor_orders]
+
+            vendor_order_products = []
+            last_order_prices = {}
+            for vendor_order in vendor_orders:
+                for cart_product in vendor_cart_products[vendor_order.vendor_id]:
                     if not approval_needed:
-                        dental_amount[vendor_order_product.budget_spend_type] += float(
-                            vendor_order_product.quantity * vendor_order_product.unit_price
+                        dental_amount[cart_product.budget_spend_type] += float(
+                            cart_product.quantity * cart_product.unit_price
                         )
-
-                    product: Product = vendor_order_product.product
-                    objs.append(
+                    vendor_order_products.append(
                         m.VendorOrderProduct(
                             vendor_order=vendor_order,
-                            product=product,
-                            quantity=vendor_order_product.quantity,
-                            unit_price=vendor_order_product.unit_price,
-                            budget_spend_type=vendor_order_product.budget_spend_type,
-                            status=m.ProductStatus.PENDING_APPROVAL if approval_needed else m.ProductStatus.PROCESSING,
+                            product=cart_product.product,
+                            quantity=cart_product.quantity,
+                            unit_price=cart_product.unit_price,
+                            budget_spend_type=cart_product.budget_spend_type,
+                            status=product_status,
                         )
                     )
-                    OfficeProduct.objects.filter(office=office, product=product).update(
-                        last_order_price=vendor_order_product.unit_price,
+                    last_order_prices[cart_product.product_id] = cart_product.unit_price
+            m.VendorOrderProduct.objects.bulk_create(vendor_order_products)
+
+            if last_order_prices:
+                OfficeProduct.objects.filter(office=office, product_id__in=last_order_prices).update(
+                    last_order_price=Case(
+                        *[
+                            When(product_id=product_id, then=Value(price))
+                            for product_id, price in last_order_prices.items()
+                        ],
+                        output_field=DecimalField(max_digits=10, decimal_places=2),
                     )
-                m.VendorOrderProduct.objects.bulk_create(objs)
-
-                send_date = datetime.datetime.utcnow() + timedelta(days=1)
-                fetch_order_history.apply_async(
-                    [office_vendor.vendor.slug, office_vendor.office.id, False], eta=send_date
                 )
 
-            order.total_amount = total_amount
-            order.total_items = total_items
-            order.save()
+            send_date = datetime.datetime.utcnow() + timedelta(days=1)
+            for office_vendor, _ in ordered_vendors:
+                fetch_order_history.apply_async([office_vendor.vendor.slug, office.id, False], eta=send_date)
 
             update_cart_or_checkout_status(
                 office=office_vendors[0].office,
@@ -1100,13 +1165,16 @@ class CartViewSet(AsyncMixin, AsyncCreateModelMixin, ModelViewSet):
                 )
                 office_budget.save()
 
-            cart_products.delete()
+            # the products of the vendors that failed stay in the cart so they can be ordered again
+            cart_products.filter(
+                product__vendor_id__in=[office_vendor.vendor_id for office_vendor, _ in ordered_vendors]
+            ).delete()
 
         if not approval_needed:
             perform_real_order.delay(vendor_order_ids)
 
         notify_order_creation.delay(vendor_order_ids, approval_needed)
-        return s.OrderSerializer(order).data
+        return {**s.OrderSerializer(order).data, "failed_vendors": failed_vendors}
 
     @action(detail=False, url_path="checkout", methods=["get"], permission_classes=[p.OrderCheckoutPermission])
     async def checkout(self, request, *args, **kwargs):
@@ -1126,58 +1194,22 @@ class CartViewSet(AsyncMixin, AsyncCreateModelMixin, ModelViewSet):
             checkout_status=m.OfficeCheckoutStatus.CHECKOUT_STATUS.IN_PROGRESS,
         )
 
-        result = {}
-
         try:
-            for office_vendor in office_vendors:
-                vendor_cart_products = cart_products.filter(product__vendor=office_vendor.vendor).select_related(
-                    "promotion"
-                )
-                subtotal_amount = sum(
-                    [
-                        cart_product.quantity
-                        * (
-                            cart_product.unit_price
-                            if isinstance(cart_product.unit_price, (int, float, Decimal))
-                            else 0
-                        )
-                        async for cart_product in vendor_cart_products
-                    ]
-                )
-                reduction_amount = 0
-
-                async for cart_product in vendor_cart_products:
-                    if isinstance(cart_product.unit_price, (int, float, Decimal)):
-                        price = cart_product.unit_price
-                        if (
-                            cart_product.promotion is not None
-                            and cart_product.promotion.type == 1
-                            and cart_product.unit_price > cart_product.promotion.reduction_price
-                        ):
-                            price -= max(0, cart_product.promotion.reduction_price)
-                        reduction_amount += cart_product.quantity * price
-
-                result[office_vendor.vendor.slug] = {
-                    **office_vendor.vendor.to_dict(),
-                    "retail_amount": Decimal(0),
-                    "savings_amount": Decimal(0),
-                    "subtotal_amount": subtotal_amount,
-                    "shipping_amount": Decimal(0),
-                    "tax_amount": Decimal(0),
-                    "total_amount": subtotal_amount,
-                    "payment_method": "",
-                    "shipping_address": "",
-                    "reduction_amount": Decimal(reduction_amount),
-                }
+            result = OrderService.get_checkout_summary(cart_products, office_vendors)
         except Exception as e:
             return Response({"message": f"{e}"}, status=HTTP_400_BAD_REQUEST)
 
-        products = await sync_to_async(get_serializer_data)(s.CartSerializer, cart_products, many=True)
+        products = await sync_to_async(get_serializer_data)(s.CheckoutCartSerializer, cart_products, many=True)
         return Response({"products": products, "order_details": result})
 
     @action(detail=False, url_path="confirm-order", methods=["post"], permission_classes=[p.OrderCheckoutPermission])
     async def confirm_order(self, request, *args, **kwargs):
-        shipping_options = request.data.get("shipping_options")
+        try:
+            shipping_method_ids = {
+                vendor_slug: int(pk) for vendor_slug, pk in (request.data.get("shipping_options") or {}).items() if pk
+            }
+        except (AttributeError, TypeError, ValueError):
+            return Response({"message": msgs.PAYLOAD_ISSUE}, status=HTTP_400_BAD_REQUEST)
 
         cart_products, office_vendors = await sync_to_async(get_cart)(office_pk=self.kwargs["office_pk"])
 
@@ -1209,9 +1241,10 @@ class CartViewSet(AsyncMixin, AsyncCreateModelMixin, ModelViewSet):
 
         fake_order = debug or order_approval_needed
 
+        shipping_methods = await sync_to_async(ShippingMethod.objects.in_bulk)(shipping_method_ids.values())
+        shipping_options = {}
         for office_vendor in office_vendors:
-            shipping_method_pk = shipping_options.get(office_vendor.vendor.slug)
-            shipping_method = await ShippingMethod.objects.filter(pk=shipping_method_pk).afirst()
+            shipping_method = shipping_methods.get(shipping_method_ids.get(office_vendor.vendor.slug))
             shipping_options[office_vendor.vendor.slug] = shipping_method
             scraper = ScraperFactory.create_scraper(
                 vendor=office_vendor.vendor,
@@ -1221,23 +1254,28 @@ class CartViewSet(AsyncMixin, AsyncCreateModelMixin, ModelViewSet):
             )
 
             tasks.append(
-                scraper.redundancy_order(
-                    [
-                        CartProduct(
-                            product_id=cart_product.product.product_id,
-                            product_unit=cart_product.product.product_unit,
-                            product_url=cart_product.product.url,
-                            price=cart_product.unit_price
-                            if isinstance(cart_product.unit_price, (int, float, Decimal))
-                            else 0,
-                            quantity=int(cart_product.quantity),
-                        )
-                        for cart_product in cart_products
-                        if cart_product.product.vendor.id == office_vendor.vendor.id
-                    ],
-                    shipping_method=shipping_method,
-                    fake=fake_order,
-                    redundancy=redundancy,
+                asyncio.wait_for(
+                    scraper.redundancy_order(
+                        [
+                            CartProduct(
+                                product_id=cart_product.product.product_id,
+                                product_unit=cart_product.product.product_unit,
+                                product_url=cart_product.product.url,
+                                price=(
+                                    cart_product.unit_price
+                                    if isinstance(cart_product.unit_price, (int, float, Decimal))
+                                    else 0
+                                ),
+                                quantity=int(cart_product.quantity),
+                            )
+                            for cart_product in cart_products
+                            if cart_product.product.vendor.id == office_vendor.vendor.id
+                        ],
+                        shipping_method=shipping_method,
+                        fake=fake_order,
+                        redundancy=redundancy,
+                    ),
+                    timeout=VENDOR_CONFIRM_TIMEOUT,
                 )
             )
 
@@ -1370,19 +1408,16 @@ class OfficeProductViewSet(AsyncMixin, ModelViewSet):
             "images", Prefetch("office_products", office_products, to_attr="office_product")
         )
 
-        queryset = queryset.select_related("vendor", "office_product_category").annotate(
-            category_order=Case(
-                When(office_product_category__slug=category_ordering, then=Value(0)),
-                When(office_product_category__slug="other", then=Value(2)),
-                default=Value(1),
-            ),
-            last_quantity_ordered=Subquery(
-                VendorOrderProduct.objects.filter(
-                    product_id=OuterRef("product_id"), vendor_order__order__office_id=office_pk
-                )
-                .order_by("-updated_at")
-                .values("quantity")[:1]
-            ),
+        queryset = (
+            queryset.select_related("vendor", "office_product_category")
+            .annotate(
+                category_order=Case(
+                    When(office_product_category__slug=category_ordering, then=Value(0)),
+                    When(office_product_category__slug="other", then=Value(2)),
+                    default=Value(1),
+                ),
+            )
+            .with_last_quantity_ordered()
         )
 
         queryset = queryset.prefetch_related(
@@ -1467,15 +1502,10 @@ class OfficeProductViewSet(AsyncMixin, ModelViewSet):
     async def get_product_prices(self, request, *args, **kwargs):
         serializer = s.ProductPriceRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        product_ids = serializer.validated_data["products"]
-        products = {
-            product.id: product
-            async for product in m.Product.objects.select_related("vendor", "category").filter(id__in=product_ids)
-        }
-        response = await OfficeProductHelper.get_product_prices(
-            products=products, office=self.kwargs["office_pk"], from_api=True
-        )
-        return Response(response)
+        resolved_prices = await resolve_prices(self.kwargs["office_pk"], serializer.validated_data["products"])
+        if serializer.validated_data["columnar"]:
+            return Response(resolved_prices)
+        return Response(to_product_prices(resolved_prices))
 
 
 class SearchProductAPIView(AsyncMixin, APIView, SearchProductPagination):
@@ -1732,26 +1762,22 @@ class ProductV2ViewSet(AsyncMixin, ModelViewSet):
     # filterset_class = f.ProductV2Filter
     http_method_names = ["get"]
 
-    def get_queryset(self):
-        query = self.request.GET.get("search", "")
-        SearchHistory.objects.create(user=self.request.user, query=query)
-        office_pk = self.request.query_params.get("office_pk")
+    def get_search_params(self):
         selected_products = self.request.query_params.get("selected_products")
-        vendors = self.request.query_params.get("vendors")
         price_from = self.request.query_params.get("price_from", "")
-        price_from = Decimal(price_from) if price_from.strip() else -1
         price_to = self.request.query_params.get("price_to", "")
-        price_to = Decimal(price_to) if price_to.strip() else -1
+        return {
+            "query": self.request.GET.get("search", ""),
+            "office": self.request.query_params.get("office_pk"),
+            "selected_products": selected_products.split(",") if selected_products else [],
+            "vendors": self.request.query_params.get("vendors"),
+            "price_from": Decimal(price_from) if price_from.strip() else -1,
+            "price_to": Decimal(price_to) if price_to.strip() else -1,
+        }
 
-        selected_products = selected_products.split(",") if selected_products else []
+    def get_queryset(self, product_ids=None):
         products, available_vendors = ProductHelper.get_products_v3(
-            query=query,
-            office=office_pk,
-            fetch_parents=True,
-            selected_products=selected_products,
-            vendors=vendors,
-            price_from=price_from,
-            price_to=price_to,
+            fetch_parents=True, product_ids=product_ids, **self.get_search_params()
         )
         self.available_vendors = available_vendors
 
@@ -1795,18 +1821,45 @@ class ProductV2ViewSet(AsyncMixin, ModelViewSet):
             if products_fly["products"]:
                 ProductService.generate_products_from_data(products=products_fly["products"], vendor_slug="amazon")
 
+        record_search(self.request.user.id, query)
         queryset = self.get_queryset()
         count_per_page = int(self.request.query_params.get("per_page", 10))
         current_page = int(self.request.query_params.get("page", 1))
-        # TODO: return offset (db record based, some logic will be required here)
-        #       to frontend and ask frontend to pass db offset back so that we
-        #       fetch queryset[offset:offset + count_per_page]
+        cursor = self.request.query_params.get("cursor")
+        if current_page < 1:
+            return Response({"message": "The page number is incorrect!"}, status=HTTP_400_BAD_REQUEST)
 
-        # Fetching one more item to make sure if there is some more
-        queryset = queryset[: current_page * count_per_page + 1]
-        product_list = list(queryset)
+        total = -1
+        if self.request.query_params.get("with_total") == "true":
+            total = estimate_count(queryset)
 
-        if "ebay" in vendors:
+        position = None
+        if cursor:
+            # Keyset pagination, deep pages cost the same as the first one
+            try:
+                position = decode_cursor(cursor)
+                products = ProductHelper.filter_products_v3_after(queryset, position)
+            except (TypeError, ValueError):
+                return Response({"message": "The cursor is incorrect!"}, status=HTTP_400_BAD_REQUEST)
+        else:
+            # Clients that don't pass the cursor back yet
+            products = queryset[(current_page - 1) * count_per_page :]
+
+        product_list = None
+        if "amazon" not in vendors:
+            # amazon results are added to the catalog by every search, they can't be cached
+            product_list = self.get_cached_page(queryset, position, current_page, count_per_page)
+        if product_list is None:
+            # Fetching one more item to make sure if there is some more
+            product_list = list(products[: count_per_page + 1])
+        has_next = len(product_list) > count_per_page
+        product_list = product_list[:count_per_page]
+        if not product_list and current_page > 1 and not cursor:
+            return Response({"message": "The page number is incorrect!"}, status=HTTP_400_BAD_REQUEST)
+        next_cursor = encode_cursor(ProductHelper.get_products_v3_position(product_list[-1])) if has_next else None
+
+        # On the fly results go after the ones from our database
+        if "ebay" in vendors and not has_next:
             try:
                 ebay_products = EbaySearch().execute(keyword=query, from_price=price_from, to_price=price_to)
 
@@ -1816,50 +1869,63 @@ class ProductV2ViewSet(AsyncMixin, ModelViewSet):
             except Exception:  # noqa
                 print("Ebay search exception")
 
-        pagination_obj = Paginator(product_list, count_per_page)
-
-        ret = {
-            "vendor_slugs": getattr(self, "available_vendors", None),
-            "products": [],
-        }
+        product_data = []
+        for product in product_list:
+            if isinstance(product, m.Product):
+                serializer = self.get_serializer(product)
+                serialized_data = serializer.data
+                serialized_data["searched_data"] = False
+                product_data.append(serialized_data)
+            else:
+                product["searched_data"] = True
+                product_data.append(product)
 
-        if current_page < 1 or pagination_obj.num_pages < current_page:
-            return Response({"message": "The page number is incorrect!"}, status=HTTP_400_BAD_REQUEST)
+        bottom = (current_page - 1) * count_per_page
+        top = bottom + count_per_page
+        return Response(
+            {
+                "total": total,
+                "from": bottom + 1,
+                "to": top,
+                "per_page": count_per_page,
+                "current_page": current_page,
+                "next_page": current_page + 1 if has_next else None,
+                "prev_page": current_page - 1 if current_page > 1 else None,
+                "next_cursor": next_cursor,
+                "data": {
+                    "vendor_slugs": getattr(self, "available_vendors", None),
+                    "products": product_data,
+                },
+            }
+        )
 
-        page = pagination_obj.page(current_page)
-
-        if page is not None:
-            product_data = []
-            for page_item in page:
-                if isinstance(page_item, m.Product):
-                    serializer = self.get_serializer(page_item)
-                    serialized_data = serializer.data
-                    serialized_data["searched_data"] = False
-                    product_data.append(serialized_data)
-                else:
-                    page_item["searched_data"] = True
-                    product_data.append(page_item)
-            ret["products"] = product_data
-            bottom = (current_page - 1) * count_per_page
-            top = bottom + count_per_page
-
-            return Response(
-                {
-                    "total": -1,
-                    "from": bottom + 1,
-                    "to": top,
-                    "per_page": count_per_page,
-                    "current_page": page.number,
-                    "next_page": page.next_page_number() if page.has_next() else None,
-                    "prev_page": page.previous_page_number() if page.has_previous() else None,
-                    "data": ret,
-                    # "log": log,
-                }
-            )
+    def get_cached_page(self, queryset, position, current_page, count_per_page):
+        """
+        Products of the page, plus the next one to know if there are more, from the cached search result.
+        Return None when the page is not in the cached part of the result.
+        """
+        search_params = self.get_search_params()
+        office_id = search_params.pop("office")
+        search_cache = ProductSearchCache(office_id=office_id, **search_params)
+        result = search_cache.get()
+        if result is None:
+            result = search_cache.set_from_queryset(queryset)
+
+        product_ids = result["product_ids"]
+        if position:
+            try:
+                start = product_ids.index(int(position[-1])) + 1
+            except ValueError:
+                return None
+        else:
+            start = (current_page - 1) * count_per_page
+        end = start + count_per_page + 1
+        if end > len(product_ids) and not result["complete"]:
+            return None
 
-        serializer = self.get_serializer(product_list, many=True)
-        ret["products"] = serializer.data
-        return Response(ret)
+        page_product_ids = product_ids[start:end]
+        products = self.get_queryset(product_ids=page_product_ids)
+        return sorted(products, key=lambda product: page_product_ids.index(product.id))
 
     @action(detail=False, url_path="search/vendors")
     async def search_from_vendors(self, request, *args, **kwargs):
@@ -1876,9 +1942,12 @@ class ProductV2ViewSet(AsyncMixin, ModelViewSet):
 
     @action(detail=False, url_path="suggest", methods=["get"])
     def get_product_suggestion(self, request, *args, **kwargs):
-        suggested_products = ProductHelper.suggest_products(
-            search=request.query_params.get("search"), office=request.query_params.get("office_pk")
-        )[:5]
+        search = request.query_params.get("search")
+        office_id = request.query_params.get("office_pk")
+        suggestions = suggest_products(search=search, office_id=office_id)
+        if suggestions is not None:
+            return Response(suggestions)
+        suggested_products = ProductHelper.suggest_products(search=search, office=office_id)[:5]
         return Response(s.SimpleProductSerializer(suggested_products, many=True).data)
 
 
@@ -2093,15 +2162,7 @@ class ProcedureCategoryLink(ModelViewSet):
             m.OfficeProduct.objects.filter(
                 office_id=office_pk, is_inventory=True, office_product_category__slug__in=slugs
             )
-            .annotate(
-                last_quantity_ordered=Subquery(
-                    VendorOrderProduct.objects.filter(
-                        product_id=OuterRef("product_id"), vendor_order__order__office_id=office_pk
-                    )
-                    .order_by("-updated_at")
-                    .values("quantity")[:1]
-                )
-            )
+            .with_last_quantity_ordered()
             .prefetch_related(
                 "office_product_category",
                 "vendor",
@@ -1,8 +1,10 @@
 import asyncio
+import contextlib
 import datetime
 import logging
 import re
 import ssl
+import time
 import uuid
 from collections import defaultdict
 from decimal import Decimal
@@ -22,6 +24,7 @@ from slugify import slugify
 from apps.common import messages as msgs
 from apps.common.choices import OrderStatus, OrderType, ProductStatus
 from apps.common.month import Month
+from apps.common.session_cache import DEFAULT_SESSION_TTL, SessionCache
 from apps.orders.services.product import ProductService
 from apps.scrapers.errors import DownloadInvoiceError, VendorAuthenticationFailed
 from apps.scrapers.headers.base import HTTP_HEADERS
@@ -44,6 +47,8 @@ logger = logging.getLogger(__name__)
 
 class Scraper:
     aiohttp_mode = True
+    use_session_cache = True
+    session_ttl = DEFAULT_SESSION_TTL
 
     def __init__(
         self,
@@ -58,7 +63,11 @@ class Scraper:
         self.password = password
         self.orders = {}
         self.objs = {"product_categories": defaultdict(dict)}
+        self.order_batch: Optional[List[Order]] = None
+        # orders that could not be scraped or saved, the order history watermark is not moved past them
+        self.failed_order_count = 0
         self.logged_in = True
+        self.logged_in_at: Optional[float] = None
         self.ssl_context = ssl.create_default_context(cafile=certifi.where())
 
     @staticmethod
@@ -136,16 +145,38 @@ class Scraper:
     async def _get_check_login_state(self) -> Tuple[bool, dict]:
         return False, {}
 
+    def get_session_cache(self) -> Optional[SessionCache]:
+        if not (self.use_session_cache and self.aiohttp_mode and self.session is not None and self.username):
+            return None
+        if type(self)._get_check_login_state is Scraper._get_check_login_state:
+            # a restored session could not be checked
+            return None
+        return SessionCache(self.vendor.slug, self.username, self.password, ttl=self.session_ttl)
+
     @catch_network
     async def login(self, username: Optional[str] = None, password: Optional[str] = None) -> SimpleCookie:
         logger.debug("Logging in...")
+        if username or password:
+            self.logged_in_at = None
         if username:
             self.username = username
         if password:
             self.password = password
 
+        if self.logged_in_at and time.monotonic() - self.logged_in_at < self.session_ttl:
+            return None
+
+        session_cache = self.get_session_cache()
+        session_restored = bool(session_cache) and await session_cache.restore(self.session)
         is_already_login, kwargs = await self._get_check_login_state()
-        if not is_already_login:
+        if session_restored and not is_already_login:
+            logger.debug("Cached session is not authenticated anymore")
+            await session_cache.invalidate(self.session)
+            is_already_login, kwargs = await self._get_check_login_state()
+        if is_already_login:
+            self.logged_in_at = time.monotonic()
+        else:
+            session_headers = dict(self.session.headers)
             login_info = await self._get_login_data(**kwargs)
             logger.debug("Got login data: %s", login_info)
             async with self.session.post(
@@ -162,6 +193,9 @@ class Scraper:
                 logger.info("Login success!")
                 await self._after_login_hook(resp)
 
+            self.logged_in_at = time.monotonic()
+            if session_cache:
+                await session_cache.save(self.session, login_info["url"], session_headers)
             return resp.cookies
 
     async def _check_authenticated(self, response: Union[ClientResponse, Response]) -> bool:
@@ -274,41 +308,45 @@ class Scraper:
             cmd="xvfb-run -a -s '-screen 0 1024x768x24' wkhtmltopdf --quiet - - | cat", data=data
         )
 
-    def save_single_product_to_db(self, product_data, office=None, is_inventory=False, keyword=None, order_date=None):
-        """save product to product table"""
-        from django.db import transaction
+    def get_product_category(self, product_category_hierarchy):
+        """Find the category of the vendor category hierarchy, falling back to the other category"""
         from django.db.models import Q
 
-        from apps.orders.models import OfficeProduct as OfficeProductModel
-        from apps.orders.models import (
-            OfficeProductCategory as OfficeProductCategoryModel,
-        )
-        from apps.orders.models import Product as ProductModel
         from apps.orders.models import ProductCategory as ProductCategoryModel
-        from apps.orders.models import ProductImage as ProductImageModel
 
         other_category = self.objs["product_categories"].get("other_category", None)
         if other_category is None:
             other_category = ProductCategoryModel.objects.filter(slug="other").first()
             self.objs["product_categories"]["other_category"] = other_category
 
-        vendor_data = product_data.pop("vendor")
-        product_images = product_data.pop("images", [])
-        product_id = product_data.pop("product_id")
-        product_category_hierarchy = product_data.pop("category")
-
         if product_category_hierarchy:
             product_root_category = slugify(product_category_hierarchy[0])
             product_category = self.objs["product_categories"].get(product_root_category, None)
             if product_category is None:
-                q = {f"vendor_categories__{vendor_data['slug']}__contains": product_root_category}
+                q = {f"vendor_categories__{self.vendor.slug}__contains": product_root_category}
                 q = Q(**q)
                 product_category = ProductCategoryModel.objects.filter(q).first()
                 self.objs["product_categories"][product_root_category] = product_category
         else:
             product_category = None
 
-        product_data["category"] = product_category or other_category
+        return product_category or other_category
+
+    def save_single_product_to_db(self, product_data, office=None, is_inventory=False, keyword=None, order_date=None):
+        """save product to product table"""
+        from django.db import transaction
+
+        from apps.orders.models import OfficeProduct as OfficeProductModel
+        from apps.orders.models import (
+            OfficeProductCategory as OfficeProductCategoryModel,
+        )
+        from apps.orders.models import Product as ProductModel
+        from apps.orders.models import ProductImage as ProductImageModel
+
+        product_data.pop("vendor")
+        product_images = product_data.pop("images", [])
+        product_id = product_data.pop("product_id")
+        product_data["category"] = self.get_product_category(product_data.pop("category"))
         product_price = product_data.pop("price")
         with transaction.atomic():
             if "nickname" in product_data:
@@ -382,141 +420,370 @@ class Scraper:
 
         return product, office_product
 
+    def collect_orders(self, results: list) -> List[Order]:
+        """Orders of the results gathered with return_exceptions, the failed orders are counted"""
+        orders = []
+        for result in results:
+            if isinstance(result, dict):
+                orders.append(Order.from_dict(result))
+            elif isinstance(result, Exception):
+                logger.warning("Could not get an order of %s: %r", self.vendor.slug, result)
+                self.failed_order_count += 1
+        return orders
+
+    def to_order_data(self, order: Order) -> Tuple[dict, List[dict]]:
+        order_data = order.to_dict()
+        order_data.pop("shipping_address")
+        order_products = order_data.pop("products")
+        order_data["vendor_status"] = order_data["status"]
+        order_data["status"] = self.normalize_order_status(order_data["vendor_status"])
+        return order_data, order_products
+
+    @contextlib.asynccontextmanager
+    async def batch_order_saving(self, office):
+        """
+        Collect the orders scraped inside the block and save them to the office in one batch.
+        The orders scraped before a failure in the block are saved too.
+        """
+        self.order_batch = []
+        try:
+            yield
+        finally:
+            orders, self.order_batch = self.order_batch, None
+            await self.save_order_batch(office, orders)
+
+    async def save_order_batch(self, office, orders: List[Order]):
+        """Save the orders in one batch, if it fails they are saved one by one so a bad order only loses itself"""
+        try:
+            await self.save_orders_to_db(office, orders)
+            return
+        except Exception:
+            if len(orders) == 1:
+                logger.exception("Could not save order %s of %s", orders[0].order_id, self.vendor.slug)
+                self.failed_order_count += 1
+                return
+            logger.exception("Could not save the order batch of %s, saving the orders one by one", self.vendor.slug)
+
+        for order in orders:
+            try:
+                await self.save_orders_to_db(office, [order])
+            except Exception:
+                logger.exception("Could not save order %s of %s", order.order_id, self.vendor.slug)
+                self.failed_order_count += 1
+
+    async def save_order_to_db(self, office, order: Order):
+        if self.order_batch is not None:
+            self.order_batch.append(order)
+        else:
+            await self.save_orders_to_db(office, [order])
+
     @sync_to_async
-    def save_order_to_db(self, office, order: Order):
+    def save_orders_to_db(self, office, orders: List[Order]):
+        """
+        Save the orders scraped for an office in one batch.
+        Existing vendor orders, products and office products are loaded with a few IN queries,
+        matched in memory and written back with bulk operations.
+        """
         from django.db import transaction
+        from django.db.models import Q
 
-        from apps.orders.models import Order as OrderModel
         from apps.orders.models import VendorOrder as VendorOrderModel
         from apps.orders.models import VendorOrderProduct as VendorOrderProductModel
 
-        order_data = order.to_dict()
-        order_data.pop("shipping_address")
-        order_products = order_data.pop("products")
-        order_id = order_data["order_id"]
-        order_data["vendor_status"] = order_data["status"]
-        order_data["status"] = self.normalize_order_status(order_data["vendor_status"])
-        order_date = order_data["order_date"]
+        orders_data = [self.to_order_data(order) for order in orders]
+        if not orders_data:
+            return
 
         with transaction.atomic():
-            vendor_order_reference = order_data.get("vendor_order_reference", "")
-            if vendor_order_reference:
-                vendor_order = VendorOrderModel.objects.filter(
-                    vendor=self.vendor, vendor_order_reference=vendor_order_reference
-                ).first()
-            else:
-                vendor_order = VendorOrderModel.objects.filter(vendor=self.vendor, vendor_order_id=order_id).first()
-
-            if vendor_order:
+            vendor_order_references = {
+                order_data["vendor_order_reference"]
+                for order_data, _ in orders_data
+                if order_data.get("vendor_order_reference")
+            }
+            vendor_order_ids = {order_data["order_id"] for order_data, _ in orders_data}
+            vendor_orders_by_reference = {}
+            vendor_orders_by_id = {}
+            for vendor_order in VendorOrderModel.objects.filter(vendor=self.vendor).filter(
+                Q(vendor_order_reference__in=vendor_order_references) | Q(vendor_order_id__in=vendor_order_ids)
+            ):
+                if vendor_order.vendor_order_reference:
+                    vendor_orders_by_reference.setdefault(vendor_order.vendor_order_reference, vendor_order)
+                vendor_orders_by_id.setdefault(vendor_order.vendor_order_id, vendor_order)
+
+            matched_orders = []
+            unmatched_orders = []
+            for order_data, order_products in orders_data:
+                vendor_order_reference = order_data.get("vendor_order_reference", "")
+                if vendor_order_reference:
+                    vendor_order = vendor_orders_by_reference.get(vendor_order_reference)
+                else:
+                    vendor_order = vendor_orders_by_id.get(order_data["order_id"])
+                if vendor_order:
+                    matched_orders.append((order_data, order_products, vendor_order))
+                else:
+                    unmatched_orders.append((order_data, order_products))
+
+            # Orders placed through Ordo don't have vendor order ids yet,
+            # they are found by the order date and the products ordered
+            candidate_vendor_orders = defaultdict(list)
+            if unmatched_orders:
+                for vendor_order in VendorOrderModel.objects.filter(
+                    vendor=self.vendor,
+                    order_date__in={order_data["order_date"] for order_data, _ in unmatched_orders},
+                    status=OrderStatus.OPEN,
+                ).exclude(pk__in=[vendor_order.pk for _, _, vendor_order in matched_orders]):
+                    candidate_vendor_orders[vendor_order.order_date].append(vendor_order)
+
+            processing_order_products = defaultdict(list)
+            vendor_order_pks = [vendor_order.pk for _, _, vendor_order in matched_orders] + [
+                vendor_order.pk for vendor_orders in candidate_vendor_orders.values() for vendor_order in vendor_orders
+            ]
+            for vendor_order_product in VendorOrderProductModel.objects.select_related("product").filter(
+                vendor_order_id__in=vendor_order_pks, status=ProductStatus.PROCESSING
+            ):
+                processing_order_products[vendor_order_product.vendor_order_id].append(vendor_order_product)
+
+            new_orders = []
+            for order_data, order_products in unmatched_orders:
+                coming_product_ids = {o["product"]["product_id"] for o in order_products}
+                candidates = candidate_vendor_orders[order_data["order_date"]]
+                for vendor_order in candidates:
+                    vendor_order_products = processing_order_products[vendor_order.pk]
+                    if len(vendor_order_products) == len(order_products) and coming_product_ids.issuperset(
+                        vendor_order_product.product.product_id for vendor_order_product in vendor_order_products
+                    ):
+                        candidates.remove(vendor_order)
+                        vendor_order.vendor_order_reference = order_data.get("vendor_order_reference") or ""
+                        matched_orders.append((order_data, order_products, vendor_order))
+                        break
+                else:
+                    new_orders.append((order_data, order_products))
+
+            if matched_orders:
                 logger.debug("Update existing vendor order status")
-                vendor_order.vendor_order_id = order_id
-                vendor_order.status = order_data["status"]
-                vendor_order.total_amount = Decimal(order_data.get("total_amount", 0.0))
-                vendor_order.invoice_link = order_data.get("invoice_link", "")
-                vendor_order.save()
-
-                vendor_order_products = vendor_order.order_products.select_related("product").filter(
-                    status=ProductStatus.PROCESSING
+                self._update_vendor_orders(matched_orders, processing_order_products)
+            if new_orders:
+                logger.debug("Create new vendor order information")
+                self._create_vendor_orders(office, new_orders)
+
+    def _update_vendor_orders(self, matched_orders, processing_order_products):
+        from apps.orders.models import VendorOrder as VendorOrderModel
+        from apps.orders.models import VendorOrderProduct as VendorOrderProductModel
+
+        updated_vendor_order_products = []
+        for order_data, order_products, vendor_order in matched_orders:
+            vendor_order.vendor_order_id = order_data["order_id"]
+            vendor_order.status = order_data["status"]
+            vendor_order.total_amount = Decimal(order_data.get("total_amount", 0.0))
+            vendor_order.invoice_link = order_data.get("invoice_link", "")
+
+            vendor_order_products = {
+                vendor_order_product.product.product_id: vendor_order_product
+                for vendor_order_product in reversed(processing_order_products[vendor_order.pk])
+            }
+            for o in order_products:
+                vendor_order_product = vendor_order_products.get(o["product"]["product_id"])
+                if not vendor_order_product:
+                    continue
+                vendor_order_product.status = self.normalize_order_product_status(o["status"])
+                vendor_order_product.tracking_link = o.get("tracking_link")
+                updated_vendor_order_products.append(vendor_order_product)
+
+        VendorOrderModel.objects.bulk_update(
+            [vendor_order for _, _, vendor_order in matched_orders],
+            ["vendor_order_id", "vendor_order_reference", "status", "total_amount", "invoice_link"],
+        )
+        VendorOrderProductModel.objects.bulk_update(updated_vendor_order_products, ["status", "tracking_link"])
+
+    def _create_vendor_orders(self, office, new_orders):
+        from apps.accounts.models import OfficeVendor as OfficeVendorModel
+        from apps.orders.models import Order as OrderModel
+        from apps.orders.models import VendorOrder as VendorOrderModel
+        from apps.orders.models import VendorOrderProduct as VendorOrderProductModel
+
+        # bulk_create skips the post_save signal, so the default shipping option is resolved here
+        office_vendor = OfficeVendorModel.objects.filter(office=office, vendor=self.vendor).first()
+        orders = OrderModel.objects.bulk_create(
+            [
+                OrderModel(
+                    office=office,
+                    status=order_data["status"],
+                    order_date=order_data["order_date"],
+                    total_items=order_data["total_items"],
+                    total_amount=order_data["total_amount"],
+                    order_type=OrderType.VENDOR_DIRECT,
                 )
-                for o in order_products:
-                    vendor_order_product = vendor_order_products.filter(
-                        product__product_id=o["product"]["product_id"]
-                    ).first()
-                    if not vendor_order_product:
-                        continue
-                    vendor_order_product.status = self.normalize_order_product_status(o["status"])
-                    vendor_order_product.tracking_link = o.get("tracking_link")
-                    vendor_order_product.save()
-            else:
-                # Try to find the vendor order using products and order date
-                order_found = False
-                vendor_orders = VendorOrderModel.objects.filter(
-                    vendor=self.vendor, order_date=order_date, status=OrderStatus.OPEN
+                for order_data, _ in new_orders
+            ]
+        )
+        vendor_orders = VendorOrderModel.objects.bulk_create(
+            [
+                VendorOrderModel(
+                    vendor=self.vendor,
+                    order=order,
+                    vendor_order_id=order_data["order_id"],
+                    shipping_option_id=office_vendor.default_shipping_option_id if office_vendor else None,
+                    **{key: value for key, value in order_data.items() if key != "order_id"},
                 )
-                for v_order in vendor_orders:
-                    vendor_order_products = v_order.order_products.select_related("product").filter(
-                        status=ProductStatus.PROCESSING
-                    )
-                    product_count = vendor_order_products.count()
-                    if product_count == len(order_products):
-                        origin_product_ids = [i.product.product_id for i in vendor_order_products]
-                        coming_product_ids = [o["product"]["product_id"] for o in order_products]
-                        discrepancy = list(set(origin_product_ids) - set(coming_product_ids))
-                        if not discrepancy:
-                            for o in order_products:
-                                vendor_order_product = vendor_order_products.filter(
-                                    product__product_id=o["product"]["product_id"]
-                                ).first()
-                                if not vendor_order_product:
-                                    continue
-                                vendor_order_product.status = self.normalize_order_product_status(o["status"])
-                                vendor_order_product.tracking_link = o.get("tracking_link")
-                                vendor_order_product.save()
-
-                            v_order.vendor_order_id = order_id
-                            v_order.status = order_data["status"]
-                            v_order.vendor_order_reference = vendor_order_reference if vendor_order_reference else ""
-                            v_order.total_amount = Decimal(order_data.get("total_amount", 0.0))
-                            v_order.invoice_link = order_data.get("invoice_link", "")
-                            v_order.save()
-                            order_found = True
-                            break
-
-                if not order_found:
-                    # Create a new vendor order information
-                    logger.debug("Create new vendor order information")
-                    order = OrderModel.objects.create(
+                for order, (order_data, _) in zip(orders, new_orders)
+            ]
+        )
+
+        dental_spends = defaultdict(Decimal)
+        for order_data, _ in new_orders:
+            order_date = order_data["order_date"]
+            dental_spends[Month(year=order_date.year, month=order_date.month)] += order_data["total_amount"]
+        for month, dental_spend in dental_spends.items():
+            self._add_dental_spend(office, month, dental_spend)
+
+        order_lines = []
+        for vendor_order, (order_data, order_products) in zip(vendor_orders, new_orders):
+            for order_product in order_products:
+                product_data = order_product.pop("product")
+                order_product["vendor_status"] = order_product["status"]
+                order_product["status"] = self.normalize_order_product_status(order_product["vendor_status"])
+                order_lines.append((vendor_order, product_data, order_product))
+
+        products = self._save_ordered_products_to_db(office, order_lines)
+
+        # a product ordered twice in an order keeps the last line, like update_or_create did
+        vendor_order_products = {}
+        for vendor_order, product_data, order_product in order_lines:
+            product = products[product_data["product_id"]]
+            vendor_order_products[(vendor_order.pk, product.pk)] = VendorOrderProductModel(
+                vendor_order=vendor_order, product=product, **order_product
+            )
+        VendorOrderProductModel.objects.bulk_create(vendor_order_products.values())
+
+    def _add_dental_spend(self, office, month: Month, dental_spend: Decimal):
+        office_budget = office.budgets.filter(month__year=month.year).filter(month__month=month.month).first()
+        if office_budget:
+            office_budget.dental_spend = F("dental_spend") + dental_spend
+            office_budget.save()
+        else:
+            office_budget = (
+                office.budgets.filter(month__year=month.year)
+                .filter(month__month__gte=month.month)
+                .order_by("month")
+                .first()
+            )
+
+            logger.debug(f"office_budget is {office_budget}")
+
+            if office_budget:
+                office_budget.month = month
+                office_budget.dental_spend = dental_spend
+                office_budget.office_spend = 0
+                office_budget.miscellaneous_spend = 0
+                office_budget.save()
+
+    def _save_ordered_products_to_db(self, office, order_lines):
+        """
+        Bulk version of save_single_product_to_db for the products of new orders,
+        the products are saved as inventory products of the office. Returns the products by product id.
+        """
+        from apps.orders.models import OfficeProduct as OfficeProductModel
+        from apps.orders.models import (
+            OfficeProductCategory as OfficeProductCategoryModel,
+        )
+        from apps.orders.models import Product as ProductModel
+        from apps.orders.models import ProductImage as ProductImageModel
+
+        products_data = {}
+        for _, product_data, _ in order_lines:
+            products_data.setdefault(product_data["product_id"], product_data)
+
+        products = {
+            product.product_id: product
+            for product in ProductModel.objects.filter(vendor=self.vendor, product_id__in=products_data)
+        }
+        new_products = []
+        product_images = []
+        for product_id, product_data in products_data.items():
+            if product_id in products:
+                continue
+            product = ProductModel(
+                vendor=self.vendor,
+                product_id=product_id,
+                category=self.get_product_category(product_data["category"]),
+                **{
+                    key: value
+                    for key, value in product_data.items()
+                    if key not in ("vendor", "images", "product_id", "category", "price", "nickname")
+                },
+            )
+            products[product_id] = product
+            new_products.append(product)
+            product_images.extend(
+                ProductImageModel(product=product, image=product_image["image"])
+                for product_image in product_data["images"] or []
+            )
+        if new_products:
+            ProductModel.objects.bulk_create(new_products)
+            for product in new_products:
+                product.parent_id = ProductService.get_or_create_parent_id(product)
+            ProductModel.objects.bulk_update(new_products, ["parent_id"])
+            ProductImageModel.objects.bulk_create(product_images)
+
+        office_product_categories = {}
+        for office_product_category in OfficeProductCategoryModel.objects.filter(office=office):
+            office_product_categories.setdefault(office_product_category.slug, office_product_category)
+
+        office_products = {
+            office_product.product_id: office_product
+            for office_product in OfficeProductModel.objects.filter(
+                office=office,
+                product_id__in=[product.pk for product in products.values()]
+                + [product.parent_id for product in products.values() if product.parent_id],
+            )
+        }
+        new_office_products = []
+        updated_office_products = {}
+        for vendor_order, product_data, _ in order_lines:
+            product = products[product_data["product_id"]]
+            product_price = product_data["price"]
+            order_date = vendor_order.order_date
+            product_category = self.get_product_category(product_data["category"])
+            office_product_category = product_category and office_product_categories.get(product_category.slug)
+            office_product = office_products.get(product.pk)
+            if office_product is None:
+                office_product = OfficeProductModel(
+                    office=office,
+                    product=product,
+                    is_inventory=True,
+                    price=product_price,
+                    office_product_category=office_product_category,
+                    last_order_date=order_date,
+                    last_order_price=product_price,
+                )
+                office_products[product.pk] = office_product
+                new_office_products.append(office_product)
+                if product.parent_id and product.parent_id not in office_products:
+                    parent_office_product = OfficeProductModel(
                         office=office,
-                        status=order_data["status"],
-                        order_date=order_date,
-                        total_items=order_data["total_items"],
-                        total_amount=order_data["total_amount"],
-                        order_type=OrderType.VENDOR_DIRECT,
-                    )
-                    vendor_order = VendorOrderModel.from_dataclass(
-                        vendor=self.vendor, order=order, dict_data=order_data
-                    )
-                    office_budget = (
-                        office.budgets.filter(month__year=order_date.year)
-                        .filter(month__month=order_date.month)
-                        .first()
+                        product_id=product.parent_id,
+                        is_inventory=True,
+                        office_product_category=office_product_category,
                     )
-                    if office_budget:
-                        office_budget.dental_spend = F("dental_spend") + order_data["total_amount"]
-                        office_budget.save()
-                    else:
-                        office_budget = (
-                            office.budgets.filter(month__year=order_date.year)
-                            .filter(month__month__gte=order_date.month)
-                            .order_by("month")
-                            .first()
-                        )
-
-                        logger.debug(f"office_budget is {office_budget}")
-
-                        if office_budget:
-                            month = Month(year=order_date.year, month=order_date.month)
-                            # office_budget.id = None // I don't know why this is set as None...
-                            # let's see without this...
-                            office_budget.month = month
-                            office_budget.dental_spend = order_data["total_amount"]
-                            office_budget.office_spend = 0
-                            office_budget.miscellaneous_spend = 0
-                            office_budget.save()
-
-                    for order_product in order_products:
-                        product_data = order_product.pop("product")
-                        product, _ = self.save_single_product_to_db(
-                            product_data, office, is_inventory=True, order_date=order_date
-                        )
-                        order_product["vendor_status"] = order_product["status"]
-                        order_product["status"] = self.normalize_order_product_status(order_product["vendor_status"])
+                    office_products[product.parent_id] = parent_office_product
+                    new_office_products.append(parent_office_product)
+                continue
 
-                        VendorOrderProductModel.objects.update_or_create(
-                            vendor_order=vendor_order,
-                            product=product,
-                            defaults=order_product,
-                        )
+            office_product.price = product_price
+            office_product.office_product_category = office_product_category
+            office_product.is_inventory = True
+            if order_date and (office_product.last_order_date is None or office_product.last_order_date < order_date):
+                office_product.last_order_date = order_date
+                office_product.last_order_price = product_price
+            if office_product.pk:
+                updated_office_products[office_product.pk] = office_product
+
+        OfficeProductModel.objects.bulk_create(new_office_products)
+        OfficeProductModel.objects.bulk_update(
+            updated_office_products.values(),
+            ["price", "office_product_category", "is_inventory", "last_order_date", "last_order_price"],
+        )
+        return products
 
     async def get_missing_products_fields(self, order_products, fields=("description",)):
         sem = asyncio.Semaphore(value=2)
@@ -277,7 +277,7 @@ class BencoScraper(Scraper):
                     continue
                 tasks.append(self.get_order(sem, order_detail_link, url, office))
             orders = await asyncio.gather(*tasks, return_exceptions=True)
-            return [Order.from_dict(order) for order in orders if isinstance(order, dict)]
+            return self.collect_orders(orders)
 
     async def get_product_as_dict(self, product_id, product_url, perform_login=False) -> dict:
         if perform_login:
@@ -334,7 +334,7 @@ class DarbyScraper(Scraper):
             if tasks:
                 orders = await asyncio.gather(*tasks, return_exceptions=True)
 
-        return [Order.from_dict(order) for order in orders]
+        return self.collect_orders(orders)
 
     async def get_product_as_dict(self, product_id, product_url, perform_login=False) -> dict:
         if perform_login:
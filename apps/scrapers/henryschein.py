@@ -310,7 +310,7 @@ class HenryScheinScraper(Scraper):
             )
             orders = await asyncio.gather(*tasks, return_exceptions=True)
 
-        return [Order.from_dict(order) for order in orders if isinstance(order, dict)]
+        return self.collect_orders(orders)
 
     async def get_product_prices(self, product_ids, perform_login=False, **kwargs) -> Dict[str, Decimal]:
         print("henryschein/get_product_prices")
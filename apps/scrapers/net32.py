@@ -211,8 +211,7 @@ class Net32Scraper(Scraper):
         orders = [Order.from_dict(order) for order in orders]
 
         if office:
-            for order in orders:
-                await self.save_order_to_db(office, order=order)
+            await self.save_orders_to_db(office, orders)
 
         return orders
 
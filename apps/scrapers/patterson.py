@@ -360,7 +360,7 @@ class PattersonScraper(Scraper):
             tasks = (self.get_order(sem, order_dom, office, **{"account_id": account_id}) for order_dom in orders_dom)
             orders = await asyncio.gather(*tasks, return_exceptions=True)
 
-        return [Order.from_dict(order) for order in orders if isinstance(order, dict)]
+        return self.collect_orders(orders)
 
     async def get_product_as_dict(self, product_id, product_url, perform_login=False) -> dict:
         # if perform_login:
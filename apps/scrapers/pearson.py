@@ -129,7 +129,7 @@ class PearsonScraper(Scraper):
                 tasks.append(self.get_order(sem, order_dom, office))
             orders = await asyncio.gather(*tasks, return_exceptions=True)
 
-        return [Order.from_dict(order) for order in orders if isinstance(order, dict)]
+        return self.collect_orders(orders)
 
     async def get_order(self, sem, order_dom, office=None, **kwargs):
         order_id = clean_text("./td[1]/a//text()", order_dom)
@@ -360,7 +360,7 @@ class SafcoScraper(Scraper):
             tasks = (self.get_order(sem, order_dom, office) for order_dom in orders_doms)
             orders = await asyncio.gather(*tasks, return_exceptions=True)
 
-        return [Order.from_dict(order) for order in orders if isinstance(order, dict)]
+        return self.collect_orders(orders)
 
     @semaphore_coroutine
     async def get_order(self, sem, order_dom, office=None, **kwargs):
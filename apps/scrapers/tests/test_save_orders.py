@@ -0,0 +1,180 @@
+import datetime
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.accounts.factories import OfficeFactory, OfficeVendorFactory, VendorFactory
+from apps.common.choices import OrderStatus, ProductStatus
+from apps.orders.factories import (
+    OrderFactory,
+    ProductFactory,
+    VendorOrderFactory,
+    VendorOrderProductFactory,
+)
+from apps.orders.models import (
+    OfficeProduct,
+    OfficeProductCategory,
+    ProductCategory,
+    VendorOrder,
+    VendorOrderProduct,
+)
+from apps.scrapers.base import Scraper
+from apps.scrapers.schema import Order
+
+ORDER_DATE = datetime.date(2023, 5, 4)
+
+
+class SaveOrdersTests(TestCase):
+    def setUp(self) -> None:
+        self.vendor = VendorFactory(slug="henry_schein", name="Henry Schein")
+        self.office = OfficeFactory()
+        OfficeVendorFactory(office=self.office, vendor=self.vendor)
+        self.category = ProductCategory.objects.create(name="Other", slug="other")
+        self.office_category = OfficeProductCategory.objects.create(office=self.office, name="Other", slug="other")
+        self.scraper = Scraper(session=None, vendor=self.vendor)
+
+    def make_order(self, order_id, product_ids, status="Complete", order_date=ORDER_DATE):
+        return Order.from_dict(
+            {
+                "order_id": order_id,
+                "vendor_order_reference": "",
+                "total_amount": "30.00",
+                "currency": "USD",
+                "order_date": order_date,
+                "status": status,
+                "invoice_link": "https://example.com/invoice",
+                "products": [
+                    {
+                        "product": {
+                            "product_id": product_id,
+                            "name": f"Product {product_id}",
+                            "description": "",
+                            "url": "",
+                            "images": [{"image": "https://example.com/image.png"}],
+                            "price": "10.00",
+                            "vendor": {"id": str(self.vendor.id), "name": "", "slug": "", "url": "", "logo": ""},
+                            "category": [],
+                            "product_unit": "Box",
+                        },
+                        "quantity": 3,
+                        "unit_price": "10.00",
+                        "status": "Shipped",
+                        "tracking_link": "https://example.com/track",
+                    }
+                    for product_id in product_ids
+                ],
+            }
+        )
+
+    def save_orders(self, orders):
+        async_to_sync(self.scraper.save_orders_to_db)(self.office, orders)
+
+    def create_vendor_order(self, product_ids, **kwargs):
+        vendor_order = VendorOrderFactory(
+            order=OrderFactory(office=self.office), vendor=self.vendor, order_date=ORDER_DATE, **kwargs
+        )
+        for product_id in product_ids:
+            VendorOrderProductFactory(
+                vendor_order=vendor_order,
+                product=ProductFactory(vendor=self.vendor, product_id=product_id),
+                status=ProductStatus.PROCESSING,
+            )
+        return vendor_order
+
+    def test_existing_orders_are_updated(self):
+        scraped = self.create_vendor_order(["100"], vendor_order_id="A-1", status=OrderStatus.OPEN)
+        placed_by_ordo = self.create_vendor_order(["200", "201"], vendor_order_id="", status=OrderStatus.OPEN)
+
+        self.save_orders([self.make_order("A-1", ["100"]), self.make_order("B-2", ["201", "200"])])
+
+        placed_by_ordo.refresh_from_db()
+        self.assertEqual((placed_by_ordo.vendor_order_id, placed_by_ordo.status), ("B-2", OrderStatus.CLOSED))
+        scraped.refresh_from_db()
+        self.assertEqual(scraped.status, OrderStatus.CLOSED)
+        self.assertEqual(VendorOrder.objects.count(), 2)
+        self.assertEqual(
+            set(VendorOrderProduct.objects.values_list("status", "tracking_link")),
+            {(ProductStatus.SHIPPED, "https://example.com/track")},
+        )
+
+    def test_new_orders_are_created(self):
+        known_product = ProductFactory(vendor=self.vendor, product_id="100")
+        OfficeProduct.objects.create(
+            office=self.office, product=known_product, last_order_date=datetime.date(2023, 1, 1)
+        )
+
+        self.save_orders(
+            [
+                self.make_order("C-1", ["100", "300"]),
+                self.make_order("C-2", ["300"], order_date=datetime.date(2023, 4, 1)),
+            ]
+        )
+
+        vendor_orders = VendorOrder.objects.filter(order__office=self.office).order_by("vendor_order_id")
+        self.assertEqual([vendor_order.vendor_order_id for vendor_order in vendor_orders], ["C-1", "C-2"])
+        self.assertEqual(
+            sorted(VendorOrderProduct.objects.values_list("vendor_order__vendor_order_id", "product__product_id")),
+            [("C-1", "100"), ("C-1", "300"), ("C-2", "300")],
+        )
+        office_products = {
+            office_product.product.product_id: office_product
+            for office_product in OfficeProduct.objects.filter(office=self.office).select_related("product")
+        }
+        self.assertEqual(set(office_products), {"100", "300"})
+        for office_product in office_products.values():
+            self.assertTrue(office_product.is_inventory)
+            self.assertEqual(office_product.last_order_date, ORDER_DATE)
+            self.assertEqual(office_product.last_order_price, Decimal("10.00"))
+            self.assertEqual(office_product.office_product_category, self.office_category)
+        self.assertEqual(office_products["300"].product.images.count(), 1)
+
+    def test_queries_do_not_grow_with_orders(self):
+        def count_queries(order_ids):
+            orders = [self.make_order(order_id, [f"{order_id}-1", f"{order_id}-2"]) for order_id in order_ids]
+            with CaptureQueriesContext(connection) as queries:
+                self.save_orders(orders)
+            return len(queries)
+
+        # the first batch caches the product categories of the scraper
+        count_queries(["D-1"])
+        self.assertEqual(count_queries(["E-1", "E-2"]), count_queries(["G-1", "G-2", "G-3", "G-4", "G-5"]))
+
+    def test_batch_order_saving(self):
+        async def scrape():
+            async with self.scraper.batch_order_saving(self.office):
+                await self.scraper.save_order_to_db(self.office, self.make_order("F-1", ["400"]))
+                self.assertEqual(len(self.scraper.order_batch), 1)
+                await self.scraper.save_order_to_db(self.office, self.make_order("F-2", ["401"]))
+
+        async_to_sync(scrape)()
+        self.assertIsNone(self.scraper.order_batch)
+        self.assertEqual(VendorOrder.objects.filter(vendor_order_id__in=["F-1", "F-2"]).count(), 2)
+
+    def test_batch_is_saved_when_scraping_fails(self):
+        async def scrape():
+            async with self.scraper.batch_order_saving(self.office):
+                await self.scraper.save_order_to_db(self.office, self.make_order("H-1", ["500"]))
+                raise ValueError("order page changed")
+
+        with self.assertRaises(ValueError):
+            async_to_sync(scrape)()
+        self.assertIsNone(self.scraper.order_batch)
+        self.assertTrue(VendorOrder.objects.filter(vendor_order_id="H-1").exists())
+
+    def test_bad_order_does_not_roll_back_the_batch(self):
+        async def scrape():
+            async with self.scraper.batch_order_saving(self.office):
+                await self.scraper.save_order_to_db(self.office, self.make_order("I-1", ["600"]))
+                # longer than the vendor order id column
+                await self.scraper.save_order_to_db(self.office, self.make_order("I" * 101, ["601"]))
+                await self.scraper.save_order_to_db(self.office, self.make_order("I-3", ["602"]))
+
+        with self.assertLogs("apps.scrapers.base", level="ERROR"):
+            async_to_sync(scrape)()
+        self.assertEqual(
+            sorted(VendorOrder.objects.values_list("vendor_order_id", flat=True)),
+            ["I-1", "I-3"],
+        )
@@ -0,0 +1,97 @@
+import asyncio
+from argparse import Namespace
+from http.cookies import SimpleCookie
+
+from aiohttp import ClientSession
+from django.test import override_settings
+from yarl import URL
+
+from apps.common.session_cache import SessionCache
+from apps.scrapers.base import Scraper
+from apps.vendor_clients.async_clients import BaseClient
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+HENRY_SCHEIN_URL = URL("https://www.henryschein.com/")
+BENCO_URL = URL("https://shop.benco.com/")
+
+
+def set_cookie(session: ClientSession, name: str, value: str, url: URL):
+    cookies = SimpleCookie()
+    cookies[name] = value
+    session.cookie_jar.update_cookies(cookies, response_url=url)
+
+
+class FakeScraper(Scraper):
+    login_calls = 0
+
+    async def _get_check_login_state(self):
+        cookies = self.session.cookie_jar.filter_cookies(HENRY_SCHEIN_URL)
+        return "ASP.NET_SessionId" in cookies, {}
+
+    async def _get_login_data(self, *args, **kwargs):
+        FakeScraper.login_calls += 1
+        raise AssertionError("cached session should have been used")
+
+
+class UncheckedScraper(Scraper):
+    pass
+
+
+async def cache_session_and_login():
+    session_cache = SessionCache("henry_schein", "user", "password")
+    async with ClientSession(headers={"User-Agent": "ordo"}) as session:
+        session_headers = dict(session.headers)
+        set_cookie(session, "ASP.NET_SessionId", "abc", HENRY_SCHEIN_URL)
+        session.headers["n"] = "token"
+        await session_cache.save(session, "https://www.henryschein.com/login", session_headers)
+
+    async with ClientSession() as session:
+        scraper = FakeScraper(session, Namespace(slug="henry_schein"), username="user", password="password")
+        await scraper.login()
+        await scraper.login()
+        cookies = session.cookie_jar.filter_cookies(HENRY_SCHEIN_URL)
+        return cookies["ASP.NET_SessionId"].value, dict(session.headers)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+def test_login_uses_cached_session():
+    assert asyncio.run(cache_session_and_login()) == ("abc", {"n": "token"})
+    assert FakeScraper.login_calls == 0
+
+
+def test_cache_key_depends_on_password():
+    assert SessionCache("benco", "user", "password").key != SessionCache("benco", "user", "other").key
+
+
+def test_unchecked_sessions_are_not_cached():
+    namespace = Namespace(slug="henry_schein")
+    assert UncheckedScraper(object(), namespace, username="user", password="password").get_session_cache() is None
+    assert FakeScraper(object(), namespace, username="user", password="password").get_session_cache() is not None
+    client = BaseClient.make_handler("henry_schein", session=object(), username="user", password="password")
+    assert client.get_session_cache() is None
+    client = BaseClient.make_handler("midwest_dental", session=object(), username="user", password="password")
+    assert client.get_session_cache() is not None
+
+
+async def cache_vendor_session_of_shared_session():
+    session_cache = SessionCache("henry_schein", "user", "password")
+    async with ClientSession(headers={"User-Agent": "ordo"}) as session:
+        set_cookie(session, "benco_session", "benco", BENCO_URL)
+        session_headers = dict(session.headers)
+        set_cookie(session, "ASP.NET_SessionId", "abc", HENRY_SCHEIN_URL)
+        session.headers["n"] = "token"
+        await session_cache.save(session, "https://www.henryschein.com/login", session_headers)
+
+        data = SessionCache.dump_session(session, session_cache.domain, session_cache.headers)
+        await session_cache.invalidate(session)
+        return data, {morsel.key for morsel in session.cookie_jar}, dict(session.headers)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+def test_shared_session_keeps_other_vendors():
+    data, cookie_names, headers = asyncio.run(cache_vendor_session_of_shared_session())
+    assert data["domain"] == "henryschein.com"
+    assert [cookie["name"] for cookie in data["cookies"]] == ["ASP.NET_SessionId"]
+    assert data["headers"] == {"n": "token"}
+    assert cookie_names == {"benco_session"}
+    assert headers == {"User-Agent": "ordo"}
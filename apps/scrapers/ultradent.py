@@ -229,7 +229,7 @@ class UltraDentScraper(Scraper):
                 tasks.append(self.get_order(sem, order_data, office))
             if tasks:
                 orders = await asyncio.gather(*tasks, return_exceptions=True)
-                return [Order.from_dict(order) for order in orders if isinstance(order, dict)]
+                return self.collect_orders(orders)
             else:
                 return []
 
@@ -1,7 +1,9 @@
 import asyncio
 import datetime
 import decimal
+import email.utils
 import logging
+import time
 import traceback
 import uuid
 from asyncio import Semaphore
@@ -13,6 +15,7 @@ from aiohttp import ClientResponse, ClientSession
 from result import Err, Ok, Result
 from scrapy import Selector
 
+from apps.common.session_cache import DEFAULT_SESSION_TTL, SessionCache
 from apps.orders.models import OfficeProduct, Product
 from apps.scrapers.semaphore import fake_semaphore
 from apps.vendor_clients import errors, types
@@ -36,7 +39,26 @@ class ScrapingError(Exception):
 
 
 class TooManyRequests(ScrapingError):
-    pass
+    def __init__(self, *args, retry_after: Optional[float] = None):
+        super().__init__(*args)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header is either a number of seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
 
 
 class EmptyResults(ScrapingError):
@@ -59,8 +81,12 @@ class ProductPriceUpdateResult(NamedTuple):
 class BaseClient:
     VENDOR_SLUG = "base"
     MULTI_CONNECTIONS = 10
+    SESSION_TTL = DEFAULT_SESSION_TTL
+    # Page used to check with check_authenticated that a cached session is still logged in
+    SESSION_CHECK_URL: Optional[str] = None
     subclasses = []
     aiohttp_mode = True
+    use_session_cache = True
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__()
@@ -84,6 +110,23 @@ class BaseClient:
         self.username = username
         self.password = password
         self.orders = {}
+        self.logged_in_at: Optional[float] = None
+
+    def get_session_cache(self) -> Optional[SessionCache]:
+        if not (self.use_session_cache and self.aiohttp_mode and self.session is not None and self.username):
+            return None
+        if not self.can_check_session():
+            # a restored session could not be checked
+            return None
+        return SessionCache(self.VENDOR_SLUG, self.username, self.password, ttl=self.SESSION_TTL)
+
+    def can_check_session(self) -> bool:
+        return type(self).check_session is not BaseClient.check_session or bool(self.SESSION_CHECK_URL)
+
+    async def check_session(self) -> bool:
+        """Check if a restored session is still authenticated"""
+        async with self.session.get(self.SESSION_CHECK_URL) as resp:
+            return resp.status == 200 and await self.check_authenticated(resp)
 
     async def get_login_data(self, *args, **kwargs) -> Optional[types.LoginInformation]:
         """Provide login credentials and additional data along with headers"""
@@ -128,12 +171,26 @@ class BaseClient:
         raise NotImplementedError("Vendor client must implement `place_order`")
 
     async def login(self, username: Optional[str] = None, password: Optional[str] = None):
-        """Login session"""
+        """Login session, reusing the cached one when possible"""
+        if username or password:
+            self.logged_in_at = None
         if username:
             self.username = username
         if password:
             self.password = password
 
+        if self.logged_in_at and time.monotonic() - self.logged_in_at < self.SESSION_TTL:
+            return
+
+        session_cache = self.get_session_cache()
+        if session_cache and await session_cache.restore(self.session):
+            if await self.check_session():
+                self.logged_in_at = time.monotonic()
+                return
+            logger.debug("Cached session is not authenticated anymore")
+            await session_cache.invalidate(self.session)
+
+        session_headers = dict(self.session.headers) if session_cache else {}
         login_info = await self.get_login_data()
         logger.debug("Got logger data: %s", login_info)
         if login_info:
@@ -155,6 +212,9 @@ class BaseClient:
                     await self.after_login_hook(resp)
 
                 logger.info("Successfully logged in")
+        self.logged_in_at = time.monotonic()
+        if session_cache and login_info:
+            await session_cache.save(self.session, login_info["url"], session_headers)
 
     async def get_response_as_dom(
         self, url: str, headers: Optional[dict] = None, query_params: Optional[dict] = None, **kwargs
@@ -12,7 +12,7 @@ from typing import Dict, List, Optional, Union, cast
 
 from aiohttp import ClientResponse
 from scrapy import Selector
-from result import Ok
+from result import Err, Ok
 
 from apps.common.utils import convert_string_to_price, strip_whitespaces
 from apps.orders.updater import STATUS_ACTIVE, STATUS_UNAVAILABLE
@@ -21,6 +21,8 @@ from apps.vendor_clients.async_clients.base import (
     BaseClient,
     PriceInfo,
     ProductPriceUpdateResult,
+    TooManyRequests,
+    parse_retry_after,
 )
 from apps.orders.models import OfficeProduct, Product
 from apps.vendor_clients.headers.benco import (
@@ -225,6 +227,9 @@ class BencoClient(BaseClient):
             ssl=self._ssl_context,
         ) as resp:
             logger.debug("Response status is %s", resp.status)
+            if resp.status == 429:
+                exc = TooManyRequests(retry_after=parse_retry_after(resp.headers.get("Retry-After")))
+                return [ProductPriceUpdateResult(product=product, result=Err(exc)) for product in products]
             res = await resp.json()
             logger.debug("Response: %s", res)
             for product_id, row in res.items():
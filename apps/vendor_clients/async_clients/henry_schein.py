@@ -5,7 +5,7 @@ from collections import defaultdict
 from typing import Dict, List, Optional, Union, cast
 
 from aiohttp import ClientResponse
-from result import Ok
+from result import Err, Ok
 from scrapy import Selector
 
 from apps.common.utils import (
@@ -19,6 +19,8 @@ from apps.vendor_clients.async_clients.base import (
     BaseClient,
     PriceInfo,
     ProductPriceUpdateResult,
+    TooManyRequests,
+    parse_retry_after,
 )
 from apps.vendor_clients.headers.henry_schein import (
     ADD_PRODUCTS_TO_CART_HEADERS,
@@ -381,6 +383,9 @@ class HenryScheinClient(BaseClient):
             headers=headers,
         ) as resp:
             logger.info("Response status is %s", resp.status)
+            if resp.status == 429:
+                exc = TooManyRequests(retry_after=parse_retry_after(resp.headers.get("Retry-After")))
+                return [ProductPriceUpdateResult(product=product, result=Err(exc)) for product in products]
             res = await resp.json()
             logger.debug("Response: %s", res)
             for product_price in res["ItemDataToPrice"]:
@@ -20,6 +20,7 @@ logger = logging.getLogger(__name__)
 
 class MidwestDentalClient(BaseClient):
     VENDOR_SLUG = "midwest_dental"
+    SESSION_CHECK_URL = "https://www.mwdental.com/customer/account/"
 
     async def get_login_data(self, *args, **kwargs) -> Optional[types.LoginInformation]:
         async with self.session.get(
@@ -16,6 +16,7 @@ from apps.vendor_clients.async_clients.base import (
     EmptyResults,
     PriceInfo,
     TooManyRequests,
+    parse_retry_after,
 )
 from apps.vendor_clients.headers.net_32 import (
     ADD_PRODUCT_TO_CART_HEADERS,
@@ -115,7 +116,7 @@ class Net32Client(BaseClient):
                 async with self.session.get(f"https://www.net32.com/rest/neo/pdp/{product_id}/vendor-options") as resp:
                     logger.debug(f"Status code for {product_id} is {resp.status}")
                     if resp.status == 429:
-                        raise TooManyRequests()
+                        raise TooManyRequests(retry_after=parse_retry_after(resp.headers.get("Retry-After")))
                     vendor_options = await resp.json()
                     vendor_options = sorted(
                         # vendor_options, key=lambda x: (x["promisedHandlingTime"], x["priceBreaks"][0]["unitPrice"])
@@ -146,7 +147,7 @@ class Net32Client(BaseClient):
             async with self.session.get(f"https://www.net32.com/rest/neo/pdp/{product_id}/vendor-options") as resp:
                 logger.debug(f"Status code for {product_id} is {resp.status}")
                 if resp.status == 429:
-                    raise TooManyRequests()
+                    raise TooManyRequests(retry_after=parse_retry_after(resp.headers.get("Retry-After")))
                 vendor_options = await resp.json()
                 if len(vendor_options) == 0:
                     raise EmptyResults()
@@ -38,6 +38,10 @@ beat_schedule = {
         "task": "apps.orders.tasks.sync_with_vendors",
         "schedule": crontab(minute=0, hour=0),
     },
+    "rebuild_product_suggestion_index": {
+        "task": "apps.orders.tasks.rebuild_product_suggestion_index",
+        "schedule": crontab(minute=30, hour="*/6"),
+    },
     "update_net32_vendor_products": {
         "task": "apps.accounts.tasks.task_update_net32_products",
         "schedule": crontab(minute=0, hour=0),
@@ -161,6 +165,10 @@ beat_schedule = {
         "task": "apps.orders.tasks.update_promotions",
         "schedule": crontab(minute="0", hour="0", day_of_week="1,3,5"),  # Mon, Wed, Fri
     },
+    "flush_search_history": {
+        "task": "apps.audit.tasks.flush_search_history",
+        "schedule": crontab(minute="*"),
+    },
     "stream_salesforce_csv_into_ipfs": {
         "task": "apps.accounts.tasks.generate_csv_for_salesforce",
         "schedule": crontab(hour=10, minute=0),
@@ -1,12 +1,14 @@
 import asyncio
 import logging
 import os
-from typing import List
+from typing import AsyncIterator, List
 from urllib.parse import urlencode
 
 import oauthlib.oauth1
 from aiohttp.client import ClientSession
 
+from services.api_client.errors import APIClientError
+from services.api_client.paging import PageFetcher
 from services.api_client.vendor_api_types import DCDentalProduct
 from services.utils.secrets import get_secret_value
 
@@ -51,7 +53,7 @@ class DCDentalAPIClient:
         url, headers, body = self.oauthclient.sign(params=params, http_method="GET", headers=self.headers)
         async with self.session.get(url, headers=headers) as resp:
             if resp.status != 200:
-                return None
+                raise APIClientError(f"DC Dental product page {page_number} failed with status {resp.status}")
 
             result = await resp.json()
             if result["success"]:
@@ -121,21 +123,12 @@ class DCDentalAPIClient:
             return []
         return [DCDentalProduct.from_dict(product) for product in products]
 
+    def iter_products(self) -> AsyncIterator[List[DCDentalProduct]]:
+        """Yield the products page by page, as soon as each page arrives"""
+        return PageFetcher(self.get_page_products, self.page_size).iter_pages()
+
     async def get_products(self) -> List[DCDentalProduct]:
-        products: List[DCDentalProduct] = []
-        start_page = 1
-        while True:
-            end_page = start_page + 10
-            tasks = (self.get_page_products(page) for page in range(start_page, end_page))
-            results = await asyncio.gather(*tasks)
-            for result in results:
-                if result is None:
-                    continue
-                products.extend(result)
-            if len(products) < self.page_size * (end_page - 1):
-                break
-            start_page = end_page
-        return products
+        return [product async for page in self.iter_products() for product in page]
 
     async def create_order_request(self, order_info):
         params = {
@@ -1,15 +1,16 @@
 import asyncio
 import logging
 import os
-import time
 from decimal import Decimal
 from enum import Enum
-from typing import List, Union
+from typing import AsyncIterator, List, Union
 
 import xmltodict
 from aiohttp.client import ClientSession
 from lxml import etree
 
+from services.api_client.errors import APIClientError
+from services.api_client.paging import PageFetcher
 from services.api_client.vendor_api_types import (
     DentalCityInvoiceDetail,
     DentalCityInvoiceProduct,
@@ -217,28 +218,17 @@ class DentalCityAPIClient:
             "page_number": page_number,
         }
         async with self.session.get(url, params=params) as resp:
-            if resp.status == 200:
-                products = await resp.json()
-                if products:
-                    return [DentalCityProduct.from_dict(product) for product in products]
+            if resp.status != 200:
+                raise APIClientError(f"Dental City products page {page_number} failed with status {resp.status}")
+            products = await resp.json()
+        return [DentalCityProduct.from_dict(product) for product in products or []]
+
+    def iter_products(self) -> AsyncIterator[List[DentalCityProduct]]:
+        """Yield the products page by page, as soon as each page arrives"""
+        return PageFetcher(self.get_page_products, self.page_size).iter_pages()
 
     async def get_products(self) -> List[DentalCityProduct]:
-        products: List[DentalCityProduct] = []
-        start_page = 1
-        while True:
-            end_page = start_page + 10
-            tasks = (self.get_page_products(page) for page in range(start_page, end_page))
-            results = await asyncio.gather(*tasks)
-            for result in results:
-                if result is None:
-                    continue
-                products.extend(result)
-            if len(products) < self.page_size * (end_page - 1):
-                break
-            start_page = end_page
-            # TODO: asyncio.sleep(10)
-            time.sleep(10)
-        return products
+        return [product async for page in self.iter_products() for product in page]
 
     async def create_order_request(self, partner_info: DentalCityPartnerInfo, order_info: DentalCityOrderInfo) -> bool:
         url = f"{self.stage.value}/api/OrderRequest"
@@ -1,13 +1,18 @@
 import asyncio
 import re
 from decimal import Decimal
-from typing import List
+from typing import AsyncIterator, Callable, Iterator, List, TypeVar
 
-from aiohttp.client import ClientSession
+from aiohttp.client import ClientResponse, ClientSession
 from lxml import etree
 
 from services.api_client.vendor_api_types import Net32Product, Net32ProductInfo
 
+T = TypeVar("T")
+
+# Size of the response chunks fed to the XML parser
+CHUNK_SIZE = 64 * 1024
+
 
 def convert_string_to_price(price_string: str) -> Decimal:
     try:
@@ -18,50 +23,82 @@ def convert_string_to_price(price_string: str) -> Decimal:
         return Decimal("0")
 
 
+def parse_product(element) -> Net32Product:
+    return Net32Product(
+        mp_id=element.findtext("mp_id"),
+        price=convert_string_to_price(element.findtext("price")),
+        inventory_quantity=int(element.findtext("inventory_quantity")),
+    )
+
+
+def parse_product_info(element) -> Net32ProductInfo:
+    return Net32ProductInfo(
+        mp_id=element.findtext(".//mp_id"),
+        price=convert_string_to_price(element.findtext(".//price")),
+        inventory_quantity=int(element.findtext(".//inventory_quantity")),
+        name=element.findtext(".//title"),
+        manufacturer_number=element.findtext(".//mp_code"),
+        category=element.findtext(".//category"),
+        url=element.findtext(".//link"),
+        retail_price=convert_string_to_price(element.findtext(".//retail_price")),
+        availability=element.findtext(".//availability"),
+    )
+
+
+def read_entries(parser: etree.XMLPullParser, parse_entry: Callable[[etree._Element], T]) -> Iterator[T]:
+    """Parse the entries completed so far and drop them from the tree, so that it never holds the whole feed"""
+    for _, element in parser.read_events():
+        yield parse_entry(element)
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
+async def iter_feed(
+    resp: ClientResponse, parse_entry: Callable[[etree._Element], T], batch_size: int
+) -> AsyncIterator[List[T]]:
+    """Parse the entries of an XML feed while it is downloaded and yield them in batches"""
+    parser = etree.XMLPullParser(events=("end",), tag="entry")
+    batch = []
+    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+        parser.feed(chunk)
+        batch.extend(read_entries(parser, parse_entry))
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    parser.close()
+    batch.extend(read_entries(parser, parse_entry))
+    if batch:
+        yield batch
+
+
 class Net32APIClient:
     def __init__(self, session: ClientSession):
         self.session = session
 
-    async def get_products(self) -> List[Net32Product]:
+    async def iter_products(self, batch_size: int = 5000) -> AsyncIterator[List[Net32Product]]:
         url = "https://www.net32.com/feeds/feedonomics/dental_delta_products.xml"
-        products = []
         async with self.session.get(url) as resp:
-            content = await resp.read()
-            tree = etree.fromstring(content)
-            product_list = tree.findall(".//entry")
-            for product_element in product_list:
-                products.append(
-                    Net32Product(
-                        mp_id=product_element.findtext("mp_id"),
-                        price=convert_string_to_price(product_element.findtext("price")),
-                        inventory_quantity=int(product_element.findtext("inventory_quantity")),
-                    )
-                )
-            return products
-
-    def parse_content(self, content: bytes):
-        tree = etree.fromstring(content)
-        product_elements = tree.findall(".//entry")
-        return [
-            Net32ProductInfo(
-                mp_id=product_element.findtext(".//mp_id"),
-                price=convert_string_to_price(product_element.findtext(".//price")),
-                inventory_quantity=int(product_element.findtext(".//inventory_quantity")),
-                name=product_element.findtext(".//title"),
-                manufacturer_number=product_element.findtext(".//mp_code"),
-                category=product_element.findtext(".//category"),
-                url=product_element.findtext(".//link"),
-                retail_price=convert_string_to_price(product_element.findtext(".//retail_price")),
-                availability=product_element.findtext(".//availability"),
-            )
-            for product_element in product_elements
-        ]
+            async for products in iter_feed(resp, parse_product, batch_size):
+                yield products
 
-    async def get_full_products(self) -> List[Net32ProductInfo]:
+    async def get_products(self) -> List[Net32Product]:
+        return [product async for products in self.iter_products() for product in products]
+
+    def parse_content(self, content: bytes) -> List[Net32ProductInfo]:
+        parser = etree.XMLPullParser(events=("end",), tag="entry")
+        parser.feed(content)
+        parser.close()
+        return list(read_entries(parser, parse_product_info))
+
+    async def iter_full_products(self, batch_size: int = 5000) -> AsyncIterator[List[Net32ProductInfo]]:
         url = "https://www.net32.com/feeds/searchspring_windfall/dental_products.xml"
         async with self.session.get(url) as resp:
-            content = await resp.read()
-        return self.parse_content(content)
+            async for products in iter_feed(resp, parse_product_info, batch_size):
+                yield products
+
+    async def get_full_products(self) -> List[Net32ProductInfo]:
+        return [product async for products in self.iter_full_products() for product in products]
 
 
 async def main():
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from collections import deque
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from aiohttp import ClientError
+
+from services.api_client.errors import APIClientError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Errors after which a page request is retried
+RETRIED_ERRORS = (APIClientError, ClientError, asyncio.TimeoutError)
+
+
+class PageFetcher(Generic[T]):
+    """
+    Request numbered pages concurrently and yield every page as soon as it arrives, in arrival order.
+    At most `max_window` requests are in flight. When a request fails the window is halved and the page
+    is requested again after an exponential backoff, each successful request grows the window back by one.
+    The first page with less than `page_size` items is the last one.
+    """
+
+    def __init__(
+        self,
+        fetch_page: Callable[[int], Awaitable[List[T]]],
+        page_size: int,
+        max_window: int = 10,
+        max_retries: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.max_window = max_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    async def _fetch(self, page_number: int, delay: float) -> List[T]:
+        if delay:
+            await asyncio.sleep(delay)
+        return await self.fetch_page(page_number)
+
+    async def iter_pages(self) -> AsyncIterator[List[T]]:
+        window = self.max_window
+        next_page_number = 1
+        last_page_number: Optional[int] = None
+        attempts: Dict[int, int] = {}
+        retries: Deque[Tuple[int, float]] = deque()
+        in_flight: Dict[asyncio.Future, int] = {}
+        try:
+            while True:
+                while len(in_flight) < window:
+                    if retries:
+                        page_number, delay = retries.popleft()
+                    elif last_page_number is None:
+                        page_number, delay = next_page_number, 0
+                        next_page_number += 1
+                    else:
+                        break
+                    in_flight[asyncio.ensure_future(self._fetch(page_number, delay))] = page_number
+                if not in_flight:
+                    return
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                # pages that arrived together are handled in page order
+                for task in sorted(done, key=in_flight.get):
+                    page_number = in_flight.pop(task)
+                    try:
+                        items = task.result()
+                    except RETRIED_ERRORS as e:
+                        attempts[page_number] = attempts.get(page_number, 0) + 1
+                        if attempts[page_number] > self.max_retries:
+                            raise
+                        window = max(1, window // 2)
+                        delay = min(self.max_backoff, self.backoff * 2 ** (attempts[page_number] - 1))
+                        logger.warning("Retrying page %s in %s seconds: %r", page_number, delay, e)
+                        retries.append((page_number, delay))
+                        continue
+
+                    window = min(self.max_window, window + 1)
+                    if len(items) < self.page_size and (last_page_number is None or page_number < last_page_number):
+                        last_page_number = page_number
+                    if items and (last_page_number is None or page_number <= last_page_number):
+                        yield items
+
+                if last_page_number is not None:
+                    # the pages after the last page are empty, they don't need to be waited for
+                    for task, page_number in list(in_flight.items()):
+                        if page_number > last_page_number:
+                            task.cancel()
+                            del in_flight[task]
+                    retries = deque(
+                        (page_number, delay) for page_number, delay in retries if page_number <= last_page_number
+                    )
+        finally:
+            for task in in_flight:
+                task.cancel()